@@ -1,18 +1,23 @@
+import functools
 import logging
 from typing import Dict, List
 
+import pandas as pd
 import streamlit as st
 from builders.interfaces import Constructor
 from components.actions.actions import BuildPromptAction
 from components.actions.callback_actions import (
-    EnableGenerateParamPopUpCallBackAction,
+    BatchEvaluationCallBackAction, EnableGenerateParamPopUpCallBackAction,
     GenerateParamDescriptionCallBackAction, InferenceCallBackAction,
-    SavePromptCallBackAction)
+    SavePromptCallBackAction, SweepCallBackAction)
 from components.data.base import PromptItem
-from components.layouts.layouts import GenerateParamLayout
-from components.templates.templates import (ResponseTemplate,
+from components.layouts.layouts import GenerateParamLayout, SweepParamLayout
+from components.templates.templates import (BatchResultsTemplate,
+                                            ResponseTemplate,
                                             SelectBarTemplate,
+                                            SweepResultsTemplate,
                                             TextPromptTemplate)
+from utils.description import questions_answer_description
 
 
 class PromptLabConstructor(Constructor):
@@ -24,6 +29,9 @@ class PromptLabConstructor(Constructor):
         self.query_template = TextPromptTemplate()
         self.inference_action = InferenceCallBackAction()
         self.response_template = ResponseTemplate()
+        self.sweep_param_layout = SweepParamLayout()
+        self.sweep_action = SweepCallBackAction()
+        self.sweep_results_template = SweepResultsTemplate()
         
     def __call__(
         self, 
@@ -32,13 +40,17 @@ class PromptLabConstructor(Constructor):
         generate_param_action_config,
         generate_param_layout_config, 
         query_template_config,
-        response_template_config
+        response_template_config,
+        sweep_action_config,
+        sweep_results_template_config,
+        sweep_prompt_variants_config
     ):
         """
         Render the block for the prompt lab.
         """
 
         response_key = "response"
+        sweep_key = "sweep_results"
 
         self.setup_title_and_description(
             "提示詞實驗室",
@@ -46,13 +58,47 @@ class PromptLabConstructor(Constructor):
         )
 
         self.setup_key(session_name, response_key, "")
+        self.setup_key(session_name, sweep_key, [])
 
         with st.sidebar:
             st.markdown("#### 選擇模型參數")
             self.generate_param_action(**generate_param_action_config)
-            params = self.generate_param_layout(
-                **generate_param_layout_config
+            sweep = st.toggle(
+                "參數掃描模式",
+                help="每個參數可輸入多個值 (以逗號分隔)，一次比較所有組合",
+            )
+            if sweep:
+                try:
+                    grid = self.sweep_param_layout(
+                        **generate_param_layout_config
+                    )
+                except ValueError as exc:
+                    st.error(f"參數格式錯誤：{exc}")
+                    grid = None
+            else:
+                params = self.generate_param_layout(
+                    **generate_param_layout_config
+                )
+
+        if sweep:
+            variants = st.number_input(**sweep_prompt_variants_config)
+            prompts = [self.query_template(**query_template_config)]
+            for i in range(1, int(variants)):
+                prompts.append(self.query_template(**{
+                    **query_template_config,
+                    "label": f"{query_template_config['label']} #{i + 1}",
+                }))
+            if grid is not None:
+                results = self.sweep_action(
+                    **sweep_action_config, prompts=prompts, grid=grid
+                )
+                if results is not None:
+                    self.update_key(session_name, sweep_key, results)
+            self.sweep_results_template(
+                self.get_key_value(session_name, sweep_key),
+                **sweep_results_template_config
             )
+            return
 
         query = self.query_template(**query_template_config)
         
@@ -62,7 +108,9 @@ class PromptLabConstructor(Constructor):
         })
         
         response = self.inference_action(**kwargs)
-        self.update_key(session_name, response_key, response)
+        # 沒按按鈕時 action 回傳 None，保留上次的回覆
+        if response is not None:
+            self.update_key(session_name, response_key, response)
 
         response_template_config.update({
             "key": self.get_key_name(session_name, response_key)
@@ -77,6 +125,9 @@ class AskPromptConstructor(Constructor):
         "問題答案",
         "引導規則"
     ]
+    # 批次評估問題集的欄位，見 questions_answer_description
+    question_column = "問題"
+    answer_column = "答案"
 
     def __init__(self):
         super().__init__()
@@ -92,6 +143,11 @@ class AskPromptConstructor(Constructor):
         self.response_template = ResponseTemplate()
         self.save_prompt_action = SavePromptCallBackAction()
         self.total_prompt_template = ResponseTemplate()
+        self.sweep_param_layout = SweepParamLayout()
+        self.sweep_action = SweepCallBackAction()
+        self.sweep_results_template = SweepResultsTemplate()
+        self.batch_action = BatchEvaluationCallBackAction()
+        self.batch_results_template = BatchResultsTemplate()
 
     def _update_disable_key(self, data: Dict[str, Dict[str, str]]):
         # disable the template 
@@ -114,6 +170,50 @@ class AskPromptConstructor(Constructor):
             )
             for i, option in enumerate(options)
         ]
+
+    def _build_batch_prompts(
+        self,
+        rows: List[Dict[str, str]],
+        selection: List[str],
+        instructions: str,
+        build_prompt_api: str,
+        mode: str = "local",
+    ) -> List[str]:
+        return [
+            self.build_prompt_action(
+                build_prompt_api=build_prompt_api,
+                ordered_prompt_list=self._prepare_prompt_items(
+                    selection, {
+                        self.prompt_tags[0]: row[self.question_column],
+                        self.prompt_tags[1]: row[self.answer_column],
+                        self.prompt_tags[2]: instructions
+                    }
+                ),
+                mode=mode,
+            )["prompt"]
+            for row in rows
+        ]
+
+    def _read_question_set(self, uploaded) -> List[Dict[str, str]] | None:
+        try:
+            df = pd.read_csv(uploaded)
+        except ValueError as exc:
+            # 編碼錯誤 (例如 Big5) 或格式錯誤的 CSV
+            st.error(f"無法讀取問題集，請上傳 UTF-8 編碼的 CSV：{exc}")
+            return None
+        missing = [
+            column for column in (self.question_column, self.answer_column)
+            if column not in df.columns
+        ]
+        if missing:
+            st.error(f"問題集缺少欄位：{', '.join(missing)}")
+            return None
+        return (
+            df[[self.question_column, self.answer_column]]
+            .fillna("")
+            .astype(str)
+            .to_dict("records")
+        )
             
     def __call__(
         self, 
@@ -129,7 +229,12 @@ class AskPromptConstructor(Constructor):
         instructions_template_config,
         response_template_config,
         save_prompt_action_config,
-        total_prompt_template_config
+        total_prompt_template_config,
+        sweep_action_config,
+        sweep_results_template_config,
+        batch_evaluation_action_config,
+        batch_file_uploader_config,
+        batch_results_template_config
     ):
         """
         Render the block for the ask prompt.
@@ -138,6 +243,8 @@ class AskPromptConstructor(Constructor):
         response_key = "response"
         enable_param_key = "enable_params_adjustment"
         ask_total_prompt = "ask_total_prompt"
+        sweep_key = "sweep_results"
+        batch_key = "batch_results"
 
         self.setup_title_and_description(
             "猜你想問 Prompt 測試",
@@ -147,6 +254,8 @@ class AskPromptConstructor(Constructor):
         self.setup_key(session_name, response_key, "")
         self.setup_key(session_name, enable_param_key, False)
         self.setup_key(session_name, ask_total_prompt, "")
+        self.setup_key(session_name, sweep_key, [])
+        self.setup_key(session_name, batch_key, [])
 
         with st.sidebar:
             st.markdown("#### 選擇模型參數")
@@ -157,7 +266,22 @@ class AskPromptConstructor(Constructor):
             })
             self.enable_param_action(**enable_param_action_config)
 
+            # 參數掃描需先確認調整參數
+            sweep = False
             if self.get_key_value(session_name, enable_param_key):
+                sweep = st.toggle(
+                    "參數掃描模式",
+                    help="每個參數可輸入多個值 (以逗號分隔)，一次比較所有組合",
+                )
+            if sweep:
+                try:
+                    grid = self.sweep_param_layout(
+                        **generate_param_layout_config
+                    )
+                except ValueError as exc:
+                    st.error(f"參數格式錯誤：{exc}")
+                    grid = None
+            elif self.get_key_value(session_name, enable_param_key):
                 params = self.generate_param_layout(
                     **generate_param_layout_config
                 )
@@ -197,38 +321,87 @@ class AskPromptConstructor(Constructor):
             )
         })
 
-        prompts = self.build_prompt_action(
+        # 只有在模板內容改變時才重新組 prompt，一般 rerun 直接用上次結果
+        prompts = self.cached_call(
+            session_name, "built_prompt", self.build_prompt_action,
             **build_prompt_action_config
         )
         logging.info(prompts)
         prompt = prompts["prompt"]
         prompt_with_placehold = prompts["prompt_with_placeholder"]
 
-        kwargs = inference_action_config
-        kwargs.update({
-            "prompt": prompt, **params
-        })
-        
-        response = self.inference_action(**kwargs)
-        self.update_key(session_name, response_key, response)
+        if sweep:
+            if grid is not None:
+                results = self.sweep_action(
+                    **sweep_action_config, prompts=[prompt], grid=grid
+                )
+                if results is not None:
+                    self.update_key(session_name, sweep_key, results)
+            self.sweep_results_template(
+                self.get_key_value(session_name, sweep_key),
+                **sweep_results_template_config
+            )
+        else:
+            kwargs = inference_action_config
+            kwargs.update({
+                "prompt": prompt, **params
+            })
 
-        response_template_config.update({
-            "key": self.get_key_name(session_name, response_key)
-        })
+            response = self.inference_action(**kwargs)
+            # 沒按按鈕時 action 回傳 None，保留上次的回覆
+            if response is not None:
+                self.update_key(session_name, response_key, response)
 
-        self.update_key(session_name, ask_total_prompt, prompt)
-        total_prompt_template_config.update({
-            "key": self.get_key_name(session_name, ask_total_prompt)
-        })
+            response_template_config.update({
+                "key": self.get_key_name(session_name, response_key)
+            })
 
-        col3, col4 = st.columns(2)
-        with col3:
-            self.response_template(**response_template_config)
+            self.update_key(session_name, ask_total_prompt, prompt)
+            total_prompt_template_config.update({
+                "key": self.get_key_name(session_name, ask_total_prompt)
+            })
 
-        with col4:
-            if self.get_key_value(session_name, response_key):
-                self.total_prompt_template(
-                    **total_prompt_template_config
+            col3, col4 = st.columns(2)
+            with col3:
+                self.response_template(**response_template_config)
+
+            with col4:
+                if self.get_key_value(session_name, response_key):
+                    self.total_prompt_template(
+                        **total_prompt_template_config
+                    )
+
+            with st.expander("批次評估"):
+                if st.button("問題集檔案說明"):
+                    questions_answer_description()
+                uploaded = st.file_uploader(**batch_file_uploader_config)
+                rows = (
+                    self._read_question_set(uploaded) if uploaded else None
+                )
+                if rows:
+                    # 按下按鈕且筆數未超過上限時，才用目前選擇的模板順序與
+                    # 指示組出每一筆的 prompt
+                    results = self.batch_action(
+                        **batch_evaluation_action_config,
+                        rows=rows,
+                        build_prompts=functools.partial(
+                            self._build_batch_prompts,
+                            selection=selection,
+                            instructions=instructions,
+                            build_prompt_api=build_prompt_action_config[
+                                "build_prompt_api"
+                            ],
+                            mode=build_prompt_action_config.get(
+                                "mode", "local"
+                            ),
+                        ),
+                        params=params,
+                    )
+                    if results is not None:
+                        self.update_key(session_name, batch_key, results)
+                self.batch_results_template(
+                    self.get_key_value(session_name, batch_key),
+                    **batch_results_template_config
                 )
 
         col5, _, _, _ = st.columns(4)
@@ -1,9 +1,27 @@
-from typing import Any
+import hashlib
+import json
+from typing import Any, Callable
 import streamlit as st
 
 from abc import ABC, abstractmethod
 
 
+def _fingerprint_default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return repr(value)
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Stable digest of action inputs, pydantic models are compared by content.
+    """
+    data = json.dumps(
+        value, sort_keys=True, ensure_ascii=False, default=_fingerprint_default
+    )
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
 class Constructor(ABC):
     
     def __init__(self):
@@ -23,6 +41,25 @@ class Constructor(ABC):
     def update_key(self, session_name: str, name: str, value: Any):
         self.session_state[f"{session_name}_{name}"] = value
 
+    def cached_call(
+        self, session_name: str, name: str, action: Callable, **kwargs
+    ) -> Any:
+        """
+        Call ``action`` only when its inputs changed since the last rerun,
+        otherwise return the result kept in session state. A failed call
+        is retried on the next rerun.
+        """
+        result_key = self.get_key_name(session_name, name)
+        fingerprint_key = self.get_key_name(session_name, f"{name}_fingerprint")
+        digest = fingerprint(kwargs)
+        if (
+            self.session_state.get(fingerprint_key) != digest
+            or result_key not in self.session_state
+        ):
+            self.session_state[result_key] = action(**kwargs)
+            self.session_state[fingerprint_key] = digest
+        return self.session_state[result_key]
+
     def setup_title_and_description(self, title: str, description: str):
         st.title(title)
         st.markdown(description)
@@ -1,4 +1,6 @@
-from typing import Dict, List
+import functools
+import logging
+from typing import Dict, List, Tuple
 
 import requests
 from components.actions.interfaces import Action
@@ -26,32 +28,52 @@ class QueryAction(Action):
         return self.resonpse_parser(response)
 
 
+# (name, content, order, placehold)
+_PromptKey = Tuple[Tuple[str, str, int, bool], ...]
+
+
+@functools.lru_cache(maxsize=256)
+def _assemble_prompt(items: _PromptKey, separator: str) -> Tuple[str, str]:
+    """
+    Join the prompt items in ``order``, returns the prompt and the prompt
+    with placeholders. Every item is preceded by the separator, as the
+    prompt saved with placeholders always has been.
+    """
+    items = tuple(sorted(items, key=lambda item: item[2]))
+    prompt = "".join(
+        separator + content for _, content, _, _ in items
+    )
+    prompt_with_placeholder = "".join(
+        separator + (prompt_placeholder[name] if placehold else content)
+        for name, content, _, placehold in items
+    )
+    return prompt, prompt_with_placeholder
+
+
 class BuildPromptAction(Action):
 
+    def _prompt_key(self, ordered_prompt_list: List[PromptItem]) -> _PromptKey:
+        return tuple(
+            (item.name, item.content, item.order, item.placehold)
+            for item in ordered_prompt_list
+        )
+
     def _prompt_with_placeholder(
         self, 
         ordered_prompt_list: List[PromptItem],
         separator: str = "\n\n"
     ) -> str:
-        prompt_ = ""
-        for item in ordered_prompt_list:
-            if item.placehold:
-                placehold = prompt_placeholder[item.name]
-                prompt_ = prompt_ + separator + placehold
-            else:
-                prompt_ = prompt_ + separator + item.content
-
-        return prompt_
+        return _assemble_prompt(
+            self._prompt_key(ordered_prompt_list), separator
+        )[1]
 
     def _prompt(
         self, ordered_prompt_list: List[PromptItem]
     ) -> List[Dict[str, int | str]]:
         prompt_items = []
         for item in ordered_prompt_list:
-            if item.need_parse:
-                item.name = "document"
             prompt_items.append({
-                "name": item.name,
+                "name": "document" if item.need_parse else item.name,
                 "content": item.content,
                 "order": item.order,
             })
@@ -60,22 +82,15 @@ class BuildPromptAction(Action):
             raise ValueError('No prompt items selected...')
         
         return prompt_items
-    
-    def function(
-        self, 
-        build_prompt_api: str, 
-        ordered_prompt_list: List[PromptItem], 
-    ) -> Dict[str, str]:
-        
+
+    def _remote_prompt(
+        self, build_prompt_api: str, ordered_prompt_list: List[PromptItem]
+    ) -> str:
         if build_prompt_api is None:
             raise ValueError(
                 "build_prompt_api cannot be set to None "
                 "if if_parse_search_output is True"
             ) 
-       
-        prompt_with_placeholder = self._prompt_with_placeholder(
-            ordered_prompt_list
-        )
 
         response = requests.post(
             url=build_prompt_api,
@@ -88,11 +103,43 @@ class BuildPromptAction(Action):
         if response.status_code != 200:
             response.raise_for_status()
 
-        prompt = response.json().get('prompt', '')
+        return response.json().get('prompt', '')
+    
+    def function(
+        self, 
+        build_prompt_api: str, 
+        ordered_prompt_list: List[PromptItem], 
+        mode: str = "local",
+    ) -> Dict[str, str]:
+        """
+        Assemble the prompt of the ordered prompt items.
+
+        :param mode: ``local`` joins the items in process (memoized on the
+        item contents), ``remote`` asks ``build_prompt_api``, ``validate``
+        does both, logs a warning when they differ and returns the remote
+        prompt.
+        """
+        if not ordered_prompt_list:
+            raise ValueError('No prompt items selected...')
+
+        prompt, prompt_with_placeholder = _assemble_prompt(
+            self._prompt_key(ordered_prompt_list), "\n\n"
+        )
+
+        if mode in ("remote", "validate"):
+            remote_prompt = self._remote_prompt(
+                build_prompt_api, ordered_prompt_list
+            )
+            if mode == "validate" and remote_prompt != prompt:
+                logging.warning(
+                    "Local prompt differs from %s: local=%r remote=%r",
+                    build_prompt_api, prompt, remote_prompt
+                )
+            prompt = remote_prompt
+        elif mode != "local":
+            raise ValueError(f"Unknown build prompt mode: {mode}")
 
         return {
             "prompt": prompt, 
             "prompt_with_placeholder": prompt_with_placeholder
         }
-
-        
\ No newline at end of file
@@ -1,15 +1,60 @@
+import time
+
 import requests
 import streamlit as st
 from components.actions.interfaces import CallBackAction
 from components.templates.templates import (TextInputTemplate,
                                             TextPromptTemplate)
+from utils.client.streaming import StreamMetrics, iter_stream_text
+from utils.client.sweep import SweepRun, expand_grid, run_sweep
 
 
 class InferenceCallBackAction(CallBackAction):
+
+    # 串流時重繪畫面的最短間隔 (秒)，避免每個 token 都送到前端
+    render_interval = 0.05
+
+    def __init__(self):
+        self.last_metrics: StreamMetrics | None = None
     
     def resonpse_parser(self, response):
         return response.json().get('results', '').get('text', '')
 
+    def _stream(self, llm_api_path: str, payload: dict, timeout: int) -> str:
+        """
+        Render the generation while it streams in and record time to first
+        token and tokens/s of the run.
+        """
+        placeholder = st.empty()
+        metrics = StreamMetrics()
+        pieces = []
+        last_render = 0.0
+        with requests.post(
+            url=llm_api_path,
+            json={**payload, "stream": True},
+            stream=True,
+            timeout=timeout
+        ) as response:
+            if response.status_code != 200:
+                response.raise_for_status()
+
+            for text in iter_stream_text(response, metrics):
+                pieces.append(text)
+                now = time.perf_counter()
+                if now - last_render >= self.render_interval:
+                    placeholder.markdown("".join(pieces) + "▌")
+                    last_render = now
+
+        metrics.finish().log()
+        self.last_metrics = metrics
+        placeholder.caption(
+            f"TTFT: {metrics.first_token_seconds or 0:.2f}s · "
+            f"total: {metrics.total_seconds:.2f}s · "
+            f"{metrics.tokens} tokens · "
+            f"{metrics.tokens_per_second or 0:.1f} tokens/s"
+        )
+        return "".join(pieces)
+
     def function(
         self, 
         llm_api_path,
@@ -17,21 +62,30 @@ class InferenceCallBackAction(CallBackAction):
         top_p,
         top_k,
         temperature,
-        max_token
+        max_token,
+        stream=False,
+        timeout=600,
     ):
         """
         Construct a text area with the given label and key for response.
+
+        :param stream: Ask the API for a streamed generation (SSE or chunked)
+        and render it incrementally, a plain JSON reply is handled as well.
         """
+        payload = {
+            "query": prompt,
+            "top_p": top_p,
+            "top_k": top_k,
+            "temperature": temperature,
+            "max_token": max_token
+        }
+        if stream:
+            return self._stream(llm_api_path, payload, timeout)
+
         response = requests.post(
             url=llm_api_path,
-            json={
-                "query": prompt,
-                "top_p": top_p,
-                "top_k": top_k,
-                "temperature": temperature,
-                "max_token": max_token
-            },
-            timeout=600
+            json=payload,
+            timeout=timeout
         )
 
         if response.status_code != 200:
@@ -40,6 +94,118 @@ class InferenceCallBackAction(CallBackAction):
         return self.resonpse_parser(response)
 
 
+class SweepCallBackAction(CallBackAction):
+
+    def function(
+        self,
+        llm_api_path,
+        prompts,
+        grid,
+        max_workers=4,
+        max_runs=64,
+        timeout=600,
+    ):
+        """
+        Run every combination of prompt variant and parameter values against
+        the LLM API concurrently and return one result row per run.
+
+        :param grid: Values to try for each generating parameter, e.g.
+        ``{"temperature": [0.2, 0.8], "top_p": [0.5]}``.
+        :param max_workers: Maximum number of requests in flight.
+        :param max_runs: Refuse sweeps larger than this, the grid grows as
+        the product of the value lists.
+        """
+        runs = expand_grid(prompts, grid)
+        if len(runs) > max_runs:
+            st.error(
+                f"掃描組合數 {len(runs)} 超過上限 {max_runs}，請減少參數值或 prompt。"
+            )
+            return None
+
+        progress = st.progress(0.0, text=f"0 / {len(runs)}")
+        table = st.empty()
+        done = []
+        for run in run_sweep(llm_api_path, runs, max_workers, timeout):
+            done.append(run)
+            progress.progress(
+                len(done) / len(runs), text=f"{len(done)} / {len(runs)}"
+            )
+            table.dataframe(
+                [
+                    finished.to_row()
+                    for finished in sorted(done, key=lambda r: r.index)
+                ],
+                hide_index=True,
+            )
+        progress.empty()
+        table.empty()
+        return [run.to_row() for run in sorted(done, key=lambda r: r.index)]
+
+
+class BatchEvaluationCallBackAction(CallBackAction):
+
+    # 重繪結果表格的最短間隔 (秒)，數百筆時每筆都重繪會拖慢頁面
+    render_interval = 0.5
+
+    def function(
+        self,
+        llm_api_path,
+        rows,
+        build_prompts,
+        params,
+        max_workers=4,
+        max_rows=500,
+        timeout=600,
+    ):
+        """
+        Generate a response for every row of a question set with at most
+        ``max_workers`` requests in flight, the table fills in as rows
+        finish.
+
+        :param rows: The uploaded rows with ``問題`` and ``答案``.
+        :param build_prompts: Called with ``rows`` to build the prompt of
+        each row, only once the button is pressed and the rows are within
+        ``max_rows``.
+        :param params: Generating parameters shared by all rows.
+        """
+        if len(rows) > max_rows:
+            st.error(f"問題集筆數 {len(rows)} 超過上限 {max_rows}。")
+            return None
+
+        prompts = build_prompts(rows)
+        runs = [
+            SweepRun(index=i, variant=i, prompt=prompt, params=params)
+            for i, prompt in enumerate(prompts)
+        ]
+        results = [
+            {**row, "回覆": None, "latency_s": None, "tokens": None,
+             "error": None}
+            for row in rows
+        ]
+        progress = st.progress(0.0, text=f"0 / {len(runs)}")
+        table = st.empty()
+        finished = 0
+        last_render = 0.0
+        for run in run_sweep(llm_api_path, runs, max_workers, timeout):
+            results[run.index].update({
+                "回覆": run.text,
+                "latency_s": round(run.latency_seconds, 3),
+                "tokens": run.tokens,
+                "error": run.error,
+            })
+            finished += 1
+            now = time.perf_counter()
+            if now - last_render >= self.render_interval:
+                progress.progress(
+                    finished / len(runs), text=f"{finished} / {len(runs)}"
+                )
+                table.dataframe(results, hide_index=True)
+                last_render = now
+        progress.empty()
+        table.empty()
+        return results
+
+
 class GenerateParamDescriptionCallBackAction(CallBackAction):
 
     def function(self, title: str, markdown: str) -> None:
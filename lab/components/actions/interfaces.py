@@ -1,6 +1,6 @@
 import streamlit as st
 from abc import ABC, abstractmethod
-from settings.loggers import log_io
+from settings.loggers import traced_call
 
 
 class Action(ABC):
@@ -9,9 +9,10 @@ class Action(ABC):
     def function(self, *args, **kwargs):
         raise NotImplementedError
     
-    @log_io
     def _function(self, *args, **kwargs):
-        return self.function(*args, **kwargs)
+        return traced_call(
+            f"{type(self).__name__}.function", self.function, args, kwargs
+        )
 
     def __call__(self, *args, **kwargs):
         """define the function to be executed"""
@@ -1,5 +1,7 @@
-from components.templates.templates import NumberParameterTemplate
+from components.templates.templates import (NumberParameterTemplate,
+                                            TextInputTemplate)
 from components.layouts.interfaces import Layout
+from utils.client.sweep import parse_values
 
 
 class GenerateParamLayout(Layout):
@@ -27,9 +29,48 @@ class GenerateParamLayout(Layout):
             "temperature": temperature,
             "max_token": max_token
         }
-        
-        
 
 
-        
-        
+class SweepParamLayout(Layout):
+
+    def __init__(self):
+        self.top_p_template = TextInputTemplate()
+        self.top_k_template = TextInputTemplate()
+        self.temperature_template = TextInputTemplate()
+        self.max_token_template = TextInputTemplate()
+
+    def _values(self, template, config, cast):
+        # 初始值沿用單次生成的參數設定，placeholder 只是輸入格式的提示
+        low, high = config["min_value"], config["max_value"]
+        text = template(
+            label=config["label"],
+            placeholder=f"以逗號分隔，例如 {low}, {config['value']}, {high}",
+            value=str(config["value"]),
+            disabled=config.get("disabled", False),
+        )
+        values = parse_values(text, cast)
+        out_of_range = [value for value in values if not low <= value <= high]
+        if out_of_range:
+            raise ValueError(
+                f"{config['label']} must be in [{low}, {high}]: "
+                f"{out_of_range}"
+            )
+        return values
+
+    def __call__(
+        self, top_p_config, top_k_config, temperature_config, max_token_config
+    ):
+        """
+        Render comma separated value lists for a parameter sweep, one input
+        per generating parameter.
+        """
+        return {
+            "top_p": self._values(self.top_p_template, top_p_config, float),
+            "top_k": self._values(self.top_k_template, top_k_config, int),
+            "temperature": self._values(
+                self.temperature_template, temperature_config, float
+            ),
+            "max_token": self._values(
+                self.max_token_template, max_token_config, int
+            ),
+        }
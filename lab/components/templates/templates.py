@@ -1,14 +1,19 @@
-from typing import List
+from typing import Any, Dict, List
+import pandas as pd
 import streamlit as st
 from components.templates.interfaces import Template
+from utils.benchmark import summarize
 
 
 class TextInputTemplate(Template):
-    def __call__(self, label, placeholder, **kwargs) -> str:
+    def __call__(self, label, placeholder, value=None, **kwargs) -> str:
         """
-        Construct a text input with the given label and value.
+        Construct a text input with the given label and value, without
+        ``value`` the placeholder is used as the initial value.
         """
-        return st.text_input(label, placeholder, **kwargs)
+        if value is None:
+            return st.text_input(label, placeholder, **kwargs)
+        return st.text_input(label, value, placeholder=placeholder, **kwargs)
 
 
 class TextPromptTemplate(Template):
@@ -73,4 +78,121 @@ class SelectBarTemplate(Template):
         """
         return st.multiselect(
             label, options, value, **kwargs
-        )
\ No newline at end of file
+        )
+
+
+class RequestMetricsTemplate(Template):
+
+    def __call__(self, metrics: Dict[str, Any] | None, **kwargs) -> None:
+        """
+        Construct a timing breakdown of a graph request from
+        ``RequestMetrics.to_dict()``.
+        """
+        if not metrics:
+            return
+        st.markdown("#### 請求耗時分析")
+        st.metric("總耗時 (s)", f"{metrics['total_seconds'] or 0:.2f}")
+        st.dataframe(
+            {
+                "stage": list(metrics["stage_latencies"]),
+                "seconds": [
+                    round(seconds, 3)
+                    for seconds in metrics["stage_latencies"].values()
+                ],
+            },
+            hide_index=True,
+            **kwargs
+        )
+        st.caption(
+            f"LLM calls: {metrics['llm_calls']} · "
+            f"grader calls: {metrics['grader_calls']} · "
+            f"prompt tokens: {metrics['prompt_tokens']} · "
+            f"completion tokens: {metrics['completion_tokens']}"
+        )
+        for client, seconds in metrics["client_latencies"].items():
+            st.caption(
+                f"{client}: {metrics['client_calls'][client]} calls, "
+                f"{seconds:.3f}s"
+            )
+        for key, sizes in metrics["retrieval_sizes"].items():
+            st.caption(f"retrieved {key}: {sizes}")
+
+
+class SweepResultsTemplate(Template):
+
+    def __call__(
+        self, results: List[Dict[str, Any]] | None, columns: int = 3, **kwargs
+    ) -> None:
+        """
+        Construct the results of a prompt sweep, a summary table followed
+        by the responses side by side.
+        """
+        if not results:
+            return
+        st.markdown("#### 參數掃描結果")
+        st.dataframe(
+            [
+                {key: val for key, val in row.items() if key != "response"}
+                for row in results
+            ],
+            hide_index=True,
+            **kwargs
+        )
+        for start in range(0, len(results), columns):
+            for column, row in zip(
+                st.columns(columns), results[start:start + columns]
+            ):
+                with column:
+                    params = " · ".join(
+                        f"{key}={row[key]}"
+                        for key in ("top_p", "top_k", "temperature", "max_token")
+                        if key in row
+                    )
+                    st.markdown(f"**#{row['run']}** (prompt {row['variant']})")
+                    st.caption(
+                        f"{params}  \n{row['latency_s']}s · "
+                        f"{row['tokens']} tokens · {row['tokens/s']} tokens/s"
+                    )
+                    st.text_area(
+                        label=f"sweep_response_{row['run']}",
+                        value=row["response"],
+                        height=240,
+                        label_visibility="collapsed",
+                    )
+
+
+class BatchResultsTemplate(Template):
+
+    def __call__(
+        self,
+        results: List[Dict[str, Any]] | None,
+        download_label: str,
+        file_name: str,
+        **kwargs
+    ) -> None:
+        """
+        Construct the results of a batch evaluation with latency summary
+        and a CSV download.
+        """
+        if not results:
+            return
+        latencies = [
+            row["latency_s"] for row in results
+            if row["latency_s"] is not None and not row["error"]
+        ]
+        summary = summarize(latencies)
+        errors = sum(1 for row in results if row["error"])
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("筆數", len(results))
+        col2.metric("失敗", errors)
+        col3.metric("p50 (s)", f"{summary.get('p50', 0):.2f}")
+        col4.metric("p95 (s)", f"{summary.get('p95', 0):.2f}")
+        df = pd.DataFrame(results)
+        st.dataframe(df, hide_index=True, **kwargs)
+        # utf-8-sig 讓 Excel 正確顯示中文
+        st.download_button(
+            label=download_label,
+            data=df.to_csv(index=False).encode("utf-8-sig"),
+            file_name=file_name,
+            mime="text/csv",
+        )
@@ -1,8 +1,10 @@
 import os
 import logging
+from typing import Dict, List
 from openai import OpenAI
 
 import streamlit as st
+from utils.chat_history import ChatHistoryManager
 
 st.title("Simple chat")
 
@@ -45,34 +47,69 @@ with st.sidebar:
         min_value=10,
         max_value=8000
     ))
+    max_history_token = int(st.slider(
+        label="History token",
+        value=4000,
+        min_value=500,
+        max_value=16000,
+        step=100,
+        help="對話紀錄超過此上限時，較早的對話會在背景整理成摘要"
+    ))
+
+if "openai_model" not in st.session_state:
+    st.session_state["openai_model"] = os.getenv("MODEL_NAME", "")
+
+summary_model = st.session_state["openai_model"]
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
 
-# Add system prompt and greeting
-if not st.session_state.messages:
+def summarize(summary: str, messages: List[Dict[str, str]]) -> str:
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    completion = client.chat.completions.create(
+        model=summary_model,
+        messages=[
+            {
+                "role": "system",
+                "content": "請將對話內容整理成精簡的摘要，保留使用者的需求、"
+                           "重要事實與結論，不要加入新的資訊。"
+            },
+            {
+                "role": "user",
+                "content": f"既有摘要：\n{summary or '無'}\n\n"
+                           f"新增對話：\n{transcript}"
+            },
+        ],
+        max_tokens=512,
+        temperature=0.2,
+    )
+    return completion.choices[0].message.content or summary
+
+
+# Initialize chat history, the system prompt and greeting are kept unchanged
+# for the whole session so they stay a stable prefix for vLLM prefix caching
+if "history" not in st.session_state:
     system_prompt = "你是一位專業的企業助理，回答任何使用者的問題。"
     greeting = "早安，請問您需要什麼協助?"
-    st.session_state.messages.append({
-        "role": "system", "content": system_prompt + "\n\n" + greeting})
+    st.session_state.history = ChatHistoryManager(
+        system_message={
+            "role": "system", "content": system_prompt + "\n\n" + greeting
+        },
+        summarize_fn=summarize,
+    )
 
-if "openai_model" not in st.session_state:
-    st.session_state["openai_model"] = os.getenv("MODEL_NAME", "")
+history: ChatHistoryManager = st.session_state.history
+history.max_history_tokens = max_history_token
 
 # Display chat messages from history on app rerun
-for message in st.session_state.messages:
-    if message["role"] == "system":
-        with st.chat_message("assistant"):
-            st.markdown(message["content"].split("\n\n")[1])
-    else:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+with st.chat_message("assistant"):
+    st.markdown(history.system_message["content"].split("\n\n")[1])
+for message in history.messages:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
 
 # Accept user input
 if prompt := st.chat_input("What is up?"):
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append("user", prompt)
     # Display user message in chat message container
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -81,15 +118,11 @@ if prompt := st.chat_input("What is up?"):
     with st.chat_message("assistant"):
         stream = client.chat.completions.create(
             model=st.session_state["openai_model"],
-            messages=[
-                {"role": m["role"], "content": m["content"]}
-                for m in st.session_state.messages
-            ],
+            messages=history.build_messages(),
             max_tokens=max_token,
             temperature=temperature,
             top_p=top_p,
             stream=True,
         )
         response = st.write_stream(stream)
-    st.session_state.messages.append({
-        "role": "assistant", "content": response})
\ No newline at end of file
+    history.append("assistant", response)
@@ -1,328 +1,18 @@
-import operator
-import os
 from openai import BadRequestError
-from typing import Annotated, List, TypedDict
 
 import streamlit as st
-from langchain_community.vectorstores import OpenSearchVectorSearch
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from langgraph.graph import END, START, StateGraph
-from utils.client.embedding import EmbeddingClient
+from components.templates.templates import RequestMetricsTemplate
+from utils.graphs.clients import get_llm, get_retriever
+from utils.graphs.crag import build_graph
+from utils.graphs.instrumentation import request_config
+from utils.metrics import RequestMetrics
 
 st.title("Corrective RAG")
 
 
-# setup environment variable
-base_url = os.getenv("VLLM_HOST", "")
-api_key = os.getenv("VLLM_API_KEY", "")
-vector_db_host = os.getenv("VECTORDB_HOST", "")
-embedding_host = os.getenv("EMBEDDING_HOST", "")
-vector_db_index = os.getenv("VECTORDB_INDEX", "")
-model_name = os.getenv("MODEL_NAME", "")
-
-
-# ========================================
-#                   Data Model
-# ========================================
-class GradeDocuments(BaseModel):
-    """Binary score for relevance check on retrieved documents."""
-    binary_score: str = Field(
-        description="Documents are relevant to the question, 'yes' or 'no'"
-    )
-
-
-# ========================================
-#                   Clients
-# ========================================
-llm = ChatOpenAI(
-    openai_api_base=base_url, openai_api_key=api_key, model_name=model_name
-)
-structured_llm_grader = llm.with_structured_output(GradeDocuments)
-embedding_client = EmbeddingClient(
-    embedding_api_path=embedding_host,
-    request_timeout=600
-)
-vector_store = OpenSearchVectorSearch(
-    index_name=vector_db_index,
-    embedding_function=embedding_client,
-    opensearch_url=vector_db_host,
-)
-
-retriever = vector_store.as_retriever()
-
-# ========================================
-#                   Grader
-# ========================================
-# Prompt
-system = """You are a grader assessing relevance of a retrieved document to a user question. \n 
-    If the document contains keyword(s) or semantic meaning related to the question, grade it as relevant. \n
-    Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question."""
-grade_prompt = ChatPromptTemplate.from_messages(
-    [
-        ("system", system),
-        ("human", "Retrieved document: \n\n {document} \n\n User question: {question}"),
-    ]
-)
-
-retrieval_grader = grade_prompt | structured_llm_grader
-
-# ========================================
-#                   Generate
-# ========================================
-
-
-# Prompt
-template = """You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise.
-Question: {question} 
-Context: {context} 
-Answer:"""
-prompt = ChatPromptTemplate.from_template(template)
-
-
-# Chain
-rag_chain = prompt | llm | StrOutputParser()
-
-
-# ========================================
-#                 Query Re-write
-# ========================================
-# Prompt
-system = """You a question re-writer that converts an input question to a better version that is optimized \n 
-     for retrival. Look at the input and try to reason about the underlying semantic intent / meaning."""
-re_write_prompt = ChatPromptTemplate.from_messages(
-    [
-        ("system", system),
-        (
-            "human",
-            "Here is the initial question: \n\n {question} \n Formulate an improved question.",
-        ),
-    ]
-)
-
-question_rewriter = re_write_prompt | llm | StrOutputParser()
-
-
-# ========================================
-#                   Graph state
-# ========================================
-class GraphState(TypedDict):
-    """
-    Represents the state of our graph.
-
-    Attributes:
-        question: question
-        generation: LLM generation
-        web_search: whether to add search
-        documents: list of documents
-        rewrite_question: rephrased question
-        rewrite_generation: LLM generation
-        rewrite_documents: list of documents
-    """
-
-    question: str
-    generation: str
-    transformed_question: str
-    documents: list[str]
-    rewrite_question: str
-    rewrite_generation: str
-    rewrite_documents: list[str]
-
-
-# ========================================
-#                   Nodes
-# ========================================
-
-
-def retrieve(state):
-    """
-    Retrieve documents
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        state (dict): New key added to state, documents, that contains retrieved documents
-    """
-    question = state["question"]
-
-    # Retrieval
-    documents = retriever.get_relevant_documents(question)
-    return {"documents": documents, "question": question}
-
-
-def extra_retrieve(state):
-    """
-    Retrieve documents
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        state (dict): New key added to state, documents, that contains retrieved documents
-    """
-    question = state["rewrite_question"]
-
-    # Retrieval
-    documents = retriever.get_relevant_documents(question)
-    return {"rewrite_documents": documents, "rewrite_question": question}
-
-
-def generate(state):
-    """
-    Generate answer
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        state (dict): New key added to state, generation, that contains LLM generation
-    """
-    question = state["question"]
-    documents = state["documents"]
-
-    # RAG generation
-    generation = rag_chain.invoke({"context": documents, "question": question})
-    return {
-        "documents": documents, "question": question, "generation": generation
-    }
-
-
-def extra_generate(state):
-    """
-    Generate answer
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        state (dict): New key added to state, generation, that contains LLM generation
-    """
-    question = state["rewrite_question"]
-    documents = state["rewrite_documents"]
-
-    # RAG generation
-    generation = rag_chain.invoke({"context": documents, "question": question})
-    return {
-        "rewrite_documents": documents, 
-        "rewrite_question": question, 
-        "rewrite_generation": generation
-    }
-
-
-def grade_documents(state):
-    """
-    Determines whether the retrieved documents are relevant to the question.
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        state (dict): Updates documents key with only filtered relevant documents
-    """
-
-    question = state["question"]
-    documents = state["documents"]
-
-    # Score each doc
-    filtered_docs = []
-    transformed_question = "Yes"
-    for d in documents:
-        score = retrieval_grader.invoke(
-            {"question": question, "document": d.page_content}
-        )
-        grade = score.binary_score
-        if grade == "yes":
-            transformed_question = "No"
-            filtered_docs.append(d)
-        else:
-            continue
-    return {
-        "documents": filtered_docs, 
-        "question": question, 
-        "transformed_question": transformed_question
-    }
-
-
-def transform_query(state):
-    """
-    Transform the query to produce a better question.
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        state (dict): Updates question key with a re-phrased question
-    """
-
-    question = state["question"]
-    documents = state["documents"]
-
-    # Re-write question
-    better_question = question_rewriter.invoke({"question": question})
-    return {"documents": documents, "rewrite_question": better_question}
-
-
-# ========================================
-#                   Edges
-# ========================================
-def decide_to_generate(state):
-    """
-    Determines whether to generate an answer, or re-generate a question.
-
-    Args:
-        state (dict): The current graph state
-
-    Returns:
-        str: Binary decision for next node to call
-    """
-
-    transformed_question = state["transformed_question"]
-
-    if transformed_question == "Yes":
-        # All documents have been filtered check_relevance
-        # We will re-generate a new query
-
-        return "transform_query"
-    else:
-        # We have relevant documents, so generate answer
-        return "generate"
-
-
-# ========================================
-#                   Graph Init
-# ========================================
-
-# Compile application and test
-workflow = StateGraph(GraphState)
-
-# Define the nodes
-workflow.add_node("retrieve", retrieve)  # retrieve
-workflow.add_node("grade_documents", grade_documents)  # grade documents
-workflow.add_node("generate", generate)  # generatae
-workflow.add_node("transform_query", transform_query)  # transform_query
-workflow.add_node("extra_retrieve", extra_retrieve)
-workflow.add_node("extra_generate", extra_generate)
-
-# Buikd Graph
-workflow.add_edge(START, "retrieve")
-workflow.add_edge("retrieve", "grade_documents")
-workflow.add_conditional_edges(
-    "grade_documents",
-    decide_to_generate,
-    {
-        "transform_query": "transform_query",
-        "generate": "generate",
-    },
-)
-workflow.add_edge("transform_query", "extra_retrieve")
-workflow.add_edge("extra_retrieve", "extra_generate")
-workflow.add_edge("extra_generate", END)
-
 # Compile
-app = workflow.compile()
+app = build_graph(get_llm(), get_retriever())
+metrics_template = RequestMetricsTemplate()
 
 # ========================================
 #                   Streamlit
@@ -345,7 +35,15 @@ if prompt := st.chat_input("What is up?"):
         # except BadRequestError:
         #     st.error("Oops, it seems like the question is too complex or too long for me to answer. Please refresh the page abd try another question.")
         #     st.stop()
+        metrics = RequestMetrics("crag")
         for message, metadata in app.stream(
-            {"question": prompt}, stream_mode="messages"
+            {"question": prompt},
+            request_config(metrics),
+            stream_mode="messages"
         ):
             response = st.write(message.content)
+        metrics.finish().log()
+        st.session_state["crag_request_metrics"] = metrics.to_dict()
+
+with st.sidebar:
+    metrics_template(st.session_state.get("crag_request_metrics"))
@@ -1,72 +1,16 @@
-import os
-from typing import List, TypedDict
-from langchain_openai import ChatOpenAI
-from langchain_core.documents import Document
-from langchain_community.vectorstores import OpenSearchVectorSearch
 import streamlit as st
-from utils.client.embedding import EmbeddingClient
-from langgraph.graph import START, StateGraph
-
-from langchain_core.prompts import PromptTemplate
+from components.templates.templates import RequestMetricsTemplate
+from utils.graphs.clients import get_llm, get_retriever
+from utils.graphs.instrumentation import request_config
+from utils.graphs.simple_rag import build_graph
+from utils.metrics import RequestMetrics
 
 st.title("Simple RAG")
 
 
-# setup environment variable
-base_url = os.getenv("VLLM_HOST", "")
-api_key = os.getenv("VLLM_API_KEY", "")
-vector_db_host = os.getenv("VECTORDB_HOST", "")
-embedding_host = os.getenv("EMBEDDING_HOST", "")
-vector_db_index = os.getenv("VECTORDB_INDEX", "")
-model_name = os.getenv("MODEL_NAME", "")
-
-
-llm = ChatOpenAI(
-    openai_api_base=base_url, openai_api_key=api_key, model_name=model_name
-)
-
-embedding_client = EmbeddingClient(
-    embedding_api_path=embedding_host,
-    request_timeout=600
-)
-
-vector_store = OpenSearchVectorSearch(
-    index_name=vector_db_index,
-    embedding_function=embedding_client,
-    opensearch_url=vector_db_host,
-)
-
-template = """You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise.
-Question: {question} 
-Context: {context} 
-Answer:"""
-prompt_template = PromptTemplate.from_template(template)
-
-
-# Define state for application
-class State(TypedDict):
-    question: str
-    context: List[Document]
-    answer: str
-
-
-# Define application steps
-def retrieve(state: State):
-    retrieved_docs = vector_store.similarity_search(state["question"])
-    return {"context": retrieved_docs}
-
-
-def generate(state: State):
-    docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-    messages = prompt_template.invoke({"question": state["question"], "context": docs_content})
-    response = llm.invoke(messages)
-    return {"answer": response.content}
-
-
 # Compile application and test
-graph_builder = StateGraph(State).add_sequence([retrieve, generate])
-graph_builder.add_edge(START, "retrieve")
-graph = graph_builder.compile()
+graph = build_graph(get_llm(), get_retriever())
+metrics_template = RequestMetricsTemplate()
 
 
 if prompt := st.chat_input("What is up?"):
@@ -77,11 +21,20 @@ if prompt := st.chat_input("What is up?"):
 
     # Display assistant response in chat message container
     with st.chat_message("assistant"):
-
+        metrics = RequestMetrics("rag")
         st.write_stream(
-            graph.stream({"question": prompt}, stream_mode="updates")
+            graph.stream(
+                {"question": prompt},
+                request_config(metrics),
+                stream_mode="updates"
+            )
         )
         # for message, metadata in graph.stream(
         #     {"question": prompt}, stream_mode="messages"
         # ):
         #     response = st.write(message.content)
+        metrics.finish().log()
+        st.session_state["rag_request_metrics"] = metrics.to_dict()
+
+with st.sidebar:
+    metrics_template(st.session_state.get("rag_request_metrics"))
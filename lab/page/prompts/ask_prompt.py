@@ -1,5 +1,8 @@
 from builders.constructors import AskPromptConstructor
 from settings.configs.components import (answer_template_config,
+                                         batch_evaluation_action_config,
+                                         batch_file_uploader_config,
+                                         batch_results_template_config,
                                          build_prompt_action_config,
                                          enable_param_action_config,
                                          generate_param_action_config,
@@ -10,6 +13,8 @@ from settings.configs.components import (answer_template_config,
                                          response_template_config,
                                          save_prompt_action_config,
                                          selectbar_template_config,
+                                         sweep_action_config,
+                                         sweep_results_template_config,
                                          total_prompt_template_config)
 
 
@@ -82,7 +87,12 @@ def get_config():
         "build_prompt_action_config": build_prompt_action_config,
         "response_template_config": response_template_config,
         "save_prompt_action_config": save_prompt_action_config,
-        "total_prompt_template_config": total_prompt_template_config
+        "total_prompt_template_config": total_prompt_template_config,
+        "sweep_action_config": sweep_action_config,
+        "sweep_results_template_config": sweep_results_template_config,
+        "batch_evaluation_action_config": batch_evaluation_action_config,
+        "batch_file_uploader_config": batch_file_uploader_config,
+        "batch_results_template_config": batch_results_template_config
     }
 
 
@@ -3,7 +3,10 @@ from settings.configs.components import (generate_param_action_config,
                                          generate_param_layout_config,
                                          inference_action_config,
                                          query_template_config,
-                                         response_template_config)
+                                         response_template_config,
+                                         sweep_action_config,
+                                         sweep_prompt_variants_config,
+                                         sweep_results_template_config)
 
 
 def get_config():
@@ -13,7 +16,10 @@ def get_config():
         'generate_param_action_config': generate_param_action_config,
         'generate_param_layout_config': generate_param_layout_config,
         'query_template_config': query_template_config,
-        'response_template_config': response_template_config
+        'response_template_config': response_template_config,
+        'sweep_action_config': sweep_action_config,
+        'sweep_results_template_config': sweep_results_template_config,
+        'sweep_prompt_variants_config': sweep_prompt_variants_config
     }
 
 
@@ -0,0 +1,219 @@
+"""
+Run a question set through the simple RAG or Corrective RAG graph.
+
+The question CSV follows ``utils.description.questions_description`` (a
+``問題`` column, ``答案`` is kept as reference when present). Answers,
+retrieved chunk ids, token usage and per-stage latencies are appended to the
+output after every batch, so an interrupted run continues where it stopped
+when started again with the same output path.
+
+    $ python -m scripts.batch_eval questions.csv results.parquet --graph crag
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from utils.graphs import crag, simple_rag
+from utils.graphs.clients import get_llm, get_retriever
+from utils.graphs.instrumentation import request_config
+from utils.metrics import RequestMetrics
+
+QUESTION_COLUMN = "問題"
+ANSWER_COLUMN = "答案"
+
+graph_builders = {
+    "rag": simple_rag.build_graph,
+    "crag": crag.build_graph,
+}
+
+
+def _chunk_ids(documents: List[Any]) -> List[str]:
+    return [
+        doc.id or doc.metadata.get("_id", "")
+        for doc in documents or []
+    ]
+
+
+def parse_result(graph_name: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pick the answer and the documents it was generated from out of the final
+    graph state.
+    """
+    if graph_name == "rag":
+        return {
+            "answer": state.get("answer", ""),
+            "chunk_ids": _chunk_ids(state.get("context")),
+        }
+    if state.get("rewrite_generation"):
+        return {
+            "answer": state["rewrite_generation"],
+            "chunk_ids": _chunk_ids(state.get("rewrite_documents")),
+            "rewrite_question": state.get("rewrite_question", ""),
+        }
+    return {
+        "answer": state.get("generation", ""),
+        "chunk_ids": _chunk_ids(state.get("documents")),
+    }
+
+
+def _checkpoint_path(output: str) -> str:
+    if output.endswith(".parquet"):
+        return output + ".partial.csv"
+    return output
+
+
+def load_done_rows(output: str) -> set:
+    path = _checkpoint_path(output)
+    if not os.path.exists(path):
+        return set()
+    done = pd.read_csv(path, usecols=["row", "error"])
+    return set(done.loc[done["error"].isna(), "row"])
+
+
+def run(
+    questions: pd.DataFrame,
+    output: str,
+    graph_name: str,
+    concurrency: int,
+    batch_size: int,
+    index: str | None = None,
+    prompt_version: str | None = None,
+) -> None:
+    graph = graph_builders[graph_name](
+        get_llm(), get_retriever(index), prompt_version
+    )
+    stages = [name for name in graph.nodes if not name.startswith("__")]
+    columns = ["row", QUESTION_COLUMN]
+    if ANSWER_COLUMN in questions.columns:
+        columns.append(ANSWER_COLUMN)
+    columns += ["answer", "chunk_ids", "rewrite_question", "error"]
+    columns += [
+        "llm_calls", "grader_calls", "prompt_tokens", "completion_tokens",
+        "latency_total",
+    ]
+    columns += [f"latency_{stage}" for stage in stages]
+
+    checkpoint = _checkpoint_path(output)
+    done = load_done_rows(output)
+    pending = questions[~questions.index.isin(done)]
+    logging.info(
+        "%d questions, %d already answered", len(questions), len(done)
+    )
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending.iloc[start:start + batch_size]
+        request_metrics = [
+            RequestMetrics(graph_name, request_id=str(row))
+            for row in batch.index
+        ]
+        configs = [
+            request_config(metrics, max_concurrency=concurrency)
+            for metrics in request_metrics
+        ]
+        batch_start = time.perf_counter()
+        states = graph.batch(
+            [{"question": q} for q in batch[QUESTION_COLUMN]],
+            configs,
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - batch_start
+
+        records = []
+        for (row, item), state, metrics in zip(
+            batch.iterrows(), states, request_metrics
+        ):
+            record: Dict[str, Any] = {
+                "row": row,
+                QUESTION_COLUMN: item[QUESTION_COLUMN],
+            }
+            if ANSWER_COLUMN in batch.columns:
+                record[ANSWER_COLUMN] = item[ANSWER_COLUMN]
+            if isinstance(state, Exception):
+                record["error"] = repr(state)
+            else:
+                result = parse_result(graph_name, state)
+                result["chunk_ids"] = json.dumps(result["chunk_ids"])
+                record.update(result)
+                record["error"] = None
+            record.update({
+                "llm_calls": metrics.llm_calls,
+                "grader_calls": metrics.grader_calls,
+                "prompt_tokens": metrics.prompt_tokens,
+                "completion_tokens": metrics.completion_tokens,
+                "latency_total": sum(metrics.stage_latencies.values()),
+            })
+            record.update({
+                f"latency_{stage}": metrics.stage_latencies.get(stage, 0.0)
+                for stage in stages
+            })
+            records.append(record)
+
+        pd.DataFrame(records, columns=columns).to_csv(
+            checkpoint,
+            mode="a",
+            header=not os.path.exists(checkpoint),
+            index=False,
+        )
+        logging.info(
+            "Answered %d/%d questions (%.1f questions/s)",
+            min(start + batch_size, len(pending)), len(pending),
+            len(batch) / elapsed if elapsed else 0.0,
+        )
+
+    if not os.path.exists(checkpoint):
+        return
+    results = pd.read_csv(checkpoint)
+    # 重跑失敗的問題時只保留最後一次的結果
+    results = results.drop_duplicates("row", keep="last").sort_values("row")
+    if checkpoint != output:
+        results.to_parquet(output, index=False)
+        os.remove(checkpoint)
+    else:
+        results.to_csv(output, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", help="CSV file with a 問題 column.")
+    parser.add_argument("output", help="Result file, .csv or .parquet.")
+    parser.add_argument(
+        "--graph", choices=sorted(graph_builders), default="rag"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--batch-size", type=int, default=64,
+        help="Questions per graph.batch call and per checkpoint."
+    )
+    parser.add_argument(
+        "--index", default=None,
+        help="Index to search, defaults to VECTORDB_INDEX."
+    )
+    parser.add_argument(
+        "--prompt-version", default=None,
+        help="RAG prompt version, defaults to RAG_PROMPT_VERSION."
+    )
+    args = parser.parse_args()
+
+    questions = pd.read_csv(args.questions)
+    if QUESTION_COLUMN not in questions.columns:
+        raise ValueError(f"Column '{QUESTION_COLUMN}' is required.")
+
+    run(
+        questions,
+        args.output,
+        args.graph,
+        args.concurrency,
+        args.batch_size,
+        args.index,
+        args.prompt_version,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,183 @@
+"""
+Measure ``PdfLoader`` throughput for different process pool sizes.
+
+Every configuration streams all pages of the given PDF, use a document of a
+few hundred pages so the pool start-up cost is amortized. With
+``--generate-pages`` a synthetic sample is written to the path first: pages
+of text lines with a ruled table on every fourth page, built without any PDF
+library so the numbers are reproducible. An existing file is only replaced
+with ``--force``.
+
+    $ python -m scripts.benchmark_pdf_loader sample.pdf \
+          --generate-pages 400 --processes 1 2 4 8
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import time
+from typing import Dict, List
+
+from utils.benchmark import summarize
+from utils.data.loader.pdf_loader import PdfLoader
+
+
+_WORDS = [
+    "leave", "annual", "policy", "employee", "manager", "approval", "salary",
+    "overtime", "insurance", "travel", "expense", "review", "training",
+    "form", "system", "days", "process", "rule", "bonus", "contract",
+]
+
+
+def _page_content(rng: random.Random, with_table: bool) -> bytes:
+    commands = ["BT /F1 10 Tf 12 TL 56 780 Td"]
+    for _ in range(28 if with_table else 56):
+        line = " ".join(rng.choice(_WORDS) for _ in range(12))
+        commands.append(f"({line}) Tj T*")
+    commands.append("ET")
+    if with_table:
+        # 5 x 4 的格線表格，pdfplumber 以線條偵測表格
+        left, top, width, height = 56, 400, 120, 24
+        commands.append("0.5 w")
+        for row in range(6):
+            y = top - row * height
+            commands.append(f"{left} {y} m {left + 4 * width} {y} l S")
+        for column in range(5):
+            x = left + column * width
+            commands.append(f"{x} {top} m {x} {top - 5 * height} l S")
+        for row in range(5):
+            for column in range(4):
+                commands.append(
+                    f"BT /F1 9 Tf {left + column * width + 4} "
+                    f"{top - (row + 1) * height + 8} Td "
+                    f"({rng.choice(_WORDS)} {rng.randint(1, 99)}) Tj ET"
+                )
+    return "\n".join(commands).encode("latin-1")
+
+
+def write_sample_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """
+    Write a synthetic ``pages`` page PDF to ``path``.
+    """
+    rng = random.Random(seed)
+    # 物件編號：1 catalog、2 pages、3 font，之後每頁一個 page 與一個 content
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages
+        )).encode("latin-1"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        content = _page_content(rng, with_table=i % 4 == 3)
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            "/Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {5 + 2 * i} 0 R >>"
+        ).encode("latin-1"))
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(content)
+            + content + b"\nendstream"
+        )
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+
+
+def run(file_path: str, processes: int, pages_per_task: int) -> Dict:
+    loader = PdfLoader(processes=processes, pages_per_task=pages_per_task)
+    gaps: List[float] = []
+    pages = tables = images = 0
+    start = last = time.perf_counter()
+    first_page = None
+    try:
+        for page in loader.iter_pages(file_path):
+            now = time.perf_counter()
+            if first_page is None:
+                first_page = now - start
+            gaps.append(now - last)
+            last = now
+            pages += 1
+            tables += len(page.metadata["tables"])
+            images += len(page.metadata["images"])
+    finally:
+        loader.close()
+    total = time.perf_counter() - start
+    return {
+        "processes": processes,
+        "pages": pages,
+        "tables": tables,
+        "images": images,
+        "seconds": total,
+        "pages_per_second": pages / total if total else 0.0,
+        "first_page_seconds": first_page,
+        "page_gap_seconds": summarize(gaps),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("file_path")
+    parser.add_argument(
+        "--processes", type=int, nargs="+",
+        default=sorted({1, os.cpu_count() or 1})
+    )
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument(
+        "--generate-pages", type=int, default=0,
+        help="Write a synthetic sample with this many pages to file_path."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Overwrite file_path with --generate-pages."
+    )
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    if args.generate_pages:
+        if os.path.exists(args.file_path) and not args.force:
+            parser.error(
+                f"{args.file_path} exists, pass --force to overwrite it"
+            )
+        write_sample_pdf(args.file_path, args.generate_pages)
+    report = [
+        run(args.file_path, processes, args.pages_per_task)
+        for processes in args.processes
+    ]
+    baseline = report[0]["seconds"]
+    for result in report:
+        seconds = result["seconds"]
+        result["speedup"] = baseline / seconds if seconds else 0.0
+    # 包含已結束的子行程，單位依平台為 KB (Linux)
+    report_dict = {
+        "file_path": args.file_path,
+        "results": report,
+        "max_rss_children_kb": resource.getrusage(
+            resource.RUSAGE_CHILDREN
+        ).ru_maxrss,
+    }
+
+    output = json.dumps(report_dict, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,214 @@
+"""
+Compare time-to-first-token of the RAG prompt versions in
+``settings.configs.prompts.rag_prompts``.
+
+Each question runs the CRAG request pattern: one grader call per retrieved
+document followed by one generation call with all documents as context.
+Questions come in groups of ``--variants`` phrasings of the same need, which
+retrieve the same documents in a different score order, as follow-up and
+reworded questions do. The context is ordered as the graphs order it for
+each version (``rag_context_order``). Time to first token and the share of
+prompt tokens served from the prefix cache are reported per call type.
+Without ``--base-url`` a local mock server with simulated prefix caching is
+started for each version, otherwise the given OpenAI compatible server (e.g.
+vLLM with ``--enable-prefix-caching``) is used.
+
+    $ python -m scripts.benchmark_prompt_prefix --output prefix.json
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Dict, List, Tuple
+
+import requests
+from langchain_core.documents import Document
+from openai import OpenAI
+
+from scripts.mock_server import MockConfig, serve_in_background
+from settings.configs.prompts import rag_prompts
+from utils.benchmark import summarize
+from utils.graphs.retrievers import order_documents
+
+_VOCAB = [
+    "特休", "病假", "加班", "薪資", "福利", "保險", "考核", "出差", "報帳",
+    "公司", "員工", "主管", "申請", "系統", "規定", "天數", "流程", "核准",
+]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return "".join(rng.choice(_VOCAB) for _ in range(words)) + "。"
+
+
+def build_workload(
+    questions: int, docs_per_question: int, doc_pool: int, doc_chars: int,
+    seed: int, variants: int = 1
+) -> List[Tuple[str, List[str]]]:
+    """
+    Synthetic questions, each with documents drawn from a shared pool the
+    same way popular chunks are retrieved again and again. Every
+    ``variants`` consecutive questions retrieve the same documents, each in
+    its own order.
+    """
+    rng = random.Random(seed)
+    pool = [
+        "".join(
+            _sentence(rng, 10) for _ in range(max(1, doc_chars // 21))
+        )
+        for _ in range(doc_pool)
+    ]
+    workload = []
+    for i in range(questions):
+        if i % variants == 0:
+            documents = rng.sample(pool, docs_per_question)
+        workload.append((
+            "請問" + _sentence(rng, 6),
+            rng.sample(documents, len(documents))
+        ))
+    return workload
+
+
+def render(messages: List[Tuple[str, str]], **values) -> List[Dict]:
+    return [
+        {
+            "role": "user" if role == "human" else role,
+            "content": template.format(**values)
+        }
+        for role, template in messages
+    ]
+
+
+def time_to_first_token(
+    client: OpenAI, model: str, messages: List[Dict]
+) -> Tuple[float, int, int]:
+    """
+    Milliseconds to the first chunk, prompt tokens and cached prompt tokens.
+    """
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=model, messages=messages, max_tokens=1, stream=True,
+        stream_options={"include_usage": True},
+    )
+    elapsed = None
+    prompt_tokens = cached_tokens = 0
+    for chunk in stream:
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+        if chunk.usage is not None:
+            prompt_tokens = chunk.usage.prompt_tokens
+            details = chunk.usage.prompt_tokens_details
+            cached_tokens = (details.cached_tokens or 0) if details else 0
+    return elapsed * 1000, prompt_tokens, cached_tokens
+
+
+def run_version(
+    version: str,
+    workload: List[Tuple[str, List[str]]],
+    base_url: str,
+    api_key: str,
+    model: str,
+) -> Dict[str, List[float]]:
+    prompts = rag_prompts[version]
+    client = OpenAI(base_url=f"{base_url}/v1", api_key=api_key)
+    latencies: Dict[str, List[float]] = {"grade": [], "generate": []}
+    tokens = {stage: [0, 0] for stage in latencies}
+    for question, documents in workload:
+        calls = [
+            ("grade", render(
+                prompts["grade"], question=question, document=document
+            ))
+            for document in documents
+        ]
+        context = order_documents(
+            [Document(page_content=document) for document in documents],
+            version,
+        )
+        calls.append(("generate", render(
+            prompts["generate"],
+            question=question,
+            context="\n\n".join(doc.page_content for doc in context)
+        )))
+        for stage, messages in calls:
+            ttft, prompt_tokens, cached_tokens = time_to_first_token(
+                client, model, messages
+            )
+            latencies[stage].append(ttft)
+            tokens[stage][0] += prompt_tokens
+            tokens[stage][1] += cached_tokens
+    return latencies, {
+        stage: cached / prompt if prompt else 0.0
+        for stage, (prompt, cached) in tokens.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--base-url", default="",
+        help="Server root without /v1, a mock server is used when empty."
+    )
+    parser.add_argument("--api-key", default="12345")
+    parser.add_argument("--model", default=MockConfig.model_name)
+    parser.add_argument("--versions", nargs="+", default=["v1", "v2"])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--docs-per-question", type=int, default=4)
+    parser.add_argument("--doc-pool", type=int, default=40)
+    parser.add_argument("--doc-chars", type=int, default=600)
+    parser.add_argument(
+        "--variants", type=int, default=3,
+        help="Consecutive questions retrieving the same documents."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    workload = build_workload(
+        args.questions, args.docs_per_question, args.doc_pool,
+        args.doc_chars, args.seed, args.variants
+    )
+
+    report: Dict[str, Dict] = {}
+    for version in args.versions:
+        if args.base_url:
+            base_url = args.base_url.rstrip("/")
+            # vLLM 需開啟 dev mode 才有此 endpoint，失敗時僅記錄
+            try:
+                requests.post(f"{base_url}/reset_prefix_cache", timeout=10)
+            except requests.exceptions.RequestException as exc:
+                logging.warning("Could not reset prefix cache: %s", exc)
+            latencies, cached = run_version(
+                version, workload, base_url, args.api_key, args.model
+            )
+        else:
+            server = serve_in_background(MockConfig(model_name=args.model))
+            try:
+                latencies, cached = run_version(
+                    version, workload, server.base_url, args.api_key,
+                    args.model
+                )
+            finally:
+                server.shutdown()
+        report[version] = {
+            stage: summarize(values) for stage, values in latencies.items()
+        }
+        report[version]["cached_token_ratio"] = cached
+
+    baseline = args.versions[0]
+    for version in args.versions[1:]:
+        report[version]["reduction_vs_" + baseline] = {
+            stage: 1 - stats["mean"] / report[baseline][stage]["mean"]
+            for stage, stats in report[version].items()
+            if stage in latencies and report[baseline][stage]["mean"]
+        }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,449 @@
+"""
+Latency and throughput benchmarks of the retrieval and RAG paths.
+
+Sections:
+
++ ``embedding``: ``EmbeddingClient`` at several batch sizes.
++ ``bulk``: ``OpenSearchClient.add_documents`` throughput.
++ ``knn``: k-NN search latency and recall for each ``m`` and ``ef_search``
+  of ``get_mapping``, against a brute-force numpy ground truth.
++ ``get_data``: ``export_data.get_data`` of the loaded index.
++ ``graphs``: end-to-end latency of the simple RAG and CRAG graphs.
+
+Embeddings and the LLM are served by ``scripts.mock_server`` started in
+process unless ``--embedding-url``/``--llm-url`` are given, and the graphs
+retrieve from an in-memory vector store. The OpenSearch sections need
+``--opensearch-url`` (e.g. a local docker node) and are skipped without it.
+Temporary indices are deleted afterwards.
+
+    $ python -m scripts.benchmark_suite --output bench.json
+    $ python -m scripts.benchmark_suite --opensearch-url http://localhost:9200 --sections bulk knn
+"""
+import argparse
+import json
+import logging
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from scripts.mock_server import MockConfig, serve_in_background
+from utils.benchmark import summarize
+
+SECTIONS = ("embedding", "bulk", "knn", "get_data", "graphs")
+
+_VOCAB = [
+    "特休", "病假", "加班", "薪資", "福利", "保險", "考核", "出差", "報帳",
+    "公司", "員工", "主管", "申請", "系統", "規定", "天數", "流程", "核准",
+    "訓練", "績效", "獎金", "請假", "年資", "離職", "報到", "文件", "表單",
+]
+
+
+def build_corpus(size: int, chars: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(_VOCAB) for _ in range(max(1, chars // 2))) + "。"
+        for _ in range(size)
+    ]
+
+
+def build_questions(size: int, seed: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    return [
+        "請問" + "".join(rng.choice(_VOCAB) for _ in range(4)) + "？"
+        for _ in range(size)
+    ]
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_embedding(
+    embedding_url: str, corpus: List[str], batch_sizes: List[int]
+) -> Dict[str, Any]:
+    from utils.client.embedding import EmbeddingClient
+
+    client = EmbeddingClient(embedding_url)
+    results = {}
+    for batch_size in batch_sizes:
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(corpus), batch_size):
+            batch = corpus[i:i + batch_size]
+            latencies.append(_timed(lambda: client.embed_documents(batch)))
+        seconds = time.perf_counter() - start
+        results[str(batch_size)] = {
+            "request_seconds": summarize(latencies),
+            "documents_per_second": len(corpus) / seconds,
+        }
+        logging.info(
+            "embedding batch=%d: %.1f documents/s",
+            batch_size, len(corpus) / seconds
+        )
+    return results
+
+
+def embed_corpus(
+    embedding_url: str, corpus: List[str], batch_size: int = 64
+) -> np.ndarray:
+    from utils.client.embedding import EmbeddingClient
+
+    client = EmbeddingClient(embedding_url)
+    vectors = []
+    for i in range(0, len(corpus), batch_size):
+        vectors.extend(client.embed_documents(corpus[i:i + batch_size]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _documents(
+    corpus: List[str], vectors: np.ndarray
+) -> List[Dict[str, Any]]:
+    return [
+        {
+            "vector_field": vector.tolist(),
+            "text": text,
+            "metadata": {"source_file": "benchmark", "row": i},
+        }
+        for i, (text, vector) in enumerate(zip(corpus, vectors))
+    ]
+
+
+def _create_index(opensearch, dim: int, m: int, ef_construction: int) -> str:
+    from utils.opensearch_client import get_mapping
+
+    index = f"benchmark-{uuid.uuid4().hex[:12]}"
+    mapping = get_mapping(
+        dim, index, "benchmark", 0, 0, tags=["benchmark"],
+        ef_construction=ef_construction, m=m
+    )
+    opensearch.client.indices.create(index=index, body=mapping)
+    return index
+
+
+def bench_bulk(
+    opensearch,
+    corpus: List[str],
+    vectors: np.ndarray,
+    bulk_sizes: List[int],
+) -> Dict[str, Any]:
+    documents = _documents(corpus, vectors)
+    results = {}
+    for bulk_size in bulk_sizes:
+        index = _create_index(opensearch, vectors.shape[1], 16, 512)
+        try:
+            latencies = []
+            start = time.perf_counter()
+            for i in range(0, len(documents), bulk_size):
+                batch = documents[i:i + bulk_size]
+                latencies.append(_timed(
+                    lambda: opensearch.add_documents(
+                        index, batch, refresh=False
+                    )
+                ))
+            refresh_seconds = _timed(lambda: opensearch.refresh(index))
+            seconds = time.perf_counter() - start
+        finally:
+            opensearch.delete_index(index)
+        results[str(bulk_size)] = {
+            "request_seconds": summarize(latencies),
+            "refresh_seconds": refresh_seconds,
+            "documents_per_second": len(documents) / seconds,
+        }
+        logging.info(
+            "bulk size=%d: %.1f documents/s",
+            bulk_size, len(documents) / seconds
+        )
+    return results
+
+
+def _knn_query(vector: np.ndarray, k: int) -> Dict[str, Any]:
+    return {
+        "size": k,
+        "_source": ["metadata.row"],
+        "query": {
+            "knn": {"vector_field": {"vector": vector.tolist(), "k": k}}
+        },
+    }
+
+
+def bench_knn(
+    opensearch,
+    corpus: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    ms: List[int],
+    ef_searches: List[int],
+    ef_construction: int,
+    k: int,
+) -> Dict[str, Any]:
+    # cosinesimil 的 ground truth：正規化後的內積
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = np.argsort(-(queries @ normalized.T), axis=1)[:, :k]
+    documents = _documents(corpus, vectors)
+
+    runs = []
+    for m in ms:
+        index = _create_index(opensearch, vectors.shape[1], m, ef_construction)
+        try:
+            build_seconds = _timed(lambda: (
+                opensearch.add_documents(index, documents, refresh=False),
+                opensearch.refresh(index),
+            ))
+            for ef_search in ef_searches:
+                opensearch.client.indices.put_settings(
+                    index=index,
+                    body={"index": {"knn.algo_param.ef_search": ef_search}},
+                )
+                # 第一次查詢會把 graph 載入記憶體，不計入延遲
+                opensearch.search(index, _knn_query(queries[0], k))
+                latencies, recalls = [], []
+                start = time.perf_counter()
+                for query, expected in zip(queries, truth):
+                    query_start = time.perf_counter()
+                    response = opensearch.search(index, _knn_query(query, k))
+                    latencies.append(time.perf_counter() - query_start)
+                    found = {
+                        hit["_source"]["metadata"]["row"]
+                        for hit in response["hits"]["hits"]
+                    }
+                    recalls.append(len(found & set(expected.tolist())) / k)
+                seconds = time.perf_counter() - start
+                runs.append({
+                    "m": m,
+                    "ef_construction": ef_construction,
+                    "ef_search": ef_search,
+                    "build_seconds": build_seconds,
+                    "search_seconds": summarize(latencies),
+                    "queries_per_second": len(queries) / seconds,
+                    "recall": float(np.mean(recalls)),
+                })
+                logging.info(
+                    "knn m=%d ef_search=%d: p50 %.4fs, recall@%d %.3f",
+                    m, ef_search, np.median(latencies), k, np.mean(recalls)
+                )
+        finally:
+            opensearch.delete_index(index)
+    return {"k": k, "documents": len(corpus), "runs": runs}
+
+
+def bench_get_data(
+    opensearch,
+    corpus: List[str],
+    vectors: np.ndarray,
+    repeats: int,
+) -> Dict[str, Any]:
+    from utils.data.export_data import get_data
+
+    index = _create_index(opensearch, vectors.shape[1], 16, 512)
+    try:
+        opensearch.add_documents(index, _documents(corpus, vectors))
+        results = {}
+        for include_embeddings in (False, True):
+            latencies = [
+                _timed(lambda: get_data(
+                    opensearch, index, include_embeddings=include_embeddings
+                ))
+                for _ in range(repeats)
+            ]
+            results[
+                "with_embeddings" if include_embeddings else "text_only"
+            ] = {
+                "seconds": summarize(latencies),
+                "documents_per_second": len(corpus) / np.median(latencies),
+            }
+    finally:
+        opensearch.delete_index(index)
+    return {"documents": len(corpus), **results}
+
+
+def bench_graphs(
+    llm_url: str,
+    model_name: str,
+    embedding_url: str,
+    corpus: List[str],
+    questions: List[str],
+    concurrency: int,
+    k: int,
+) -> Dict[str, Any]:
+    from langchain_core.vectorstores import InMemoryVectorStore
+    from langchain_openai import ChatOpenAI
+
+    from utils.client.embedding import EmbeddingClient
+    from utils.graphs import crag, simple_rag
+    from utils.graphs.instrumentation import request_config
+    from utils.metrics import RequestMetrics
+
+    llm = ChatOpenAI(
+        openai_api_base=llm_url,
+        openai_api_key="benchmark",
+        model_name=model_name,
+        stream_usage=True,
+    )
+    store = InMemoryVectorStore(EmbeddingClient(embedding_url))
+    store.add_texts(corpus, metadatas=[
+        {"source_file": "benchmark", "row": i} for i in range(len(corpus))
+    ])
+    retriever = store.as_retriever(search_kwargs={"k": k})
+
+    results = {}
+    for name, build_graph in (("rag", simple_rag.build_graph),
+                              ("crag", crag.build_graph)):
+        graph = build_graph(llm, retriever)
+
+        def ask(question: str) -> RequestMetrics:
+            metrics = RequestMetrics(name)
+            graph.invoke({"question": question}, request_config(metrics))
+            return metrics.finish()
+
+        ask(questions[0])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            request_metrics = list(executor.map(ask, questions))
+        seconds = time.perf_counter() - start
+
+        stages = sorted({
+            stage for metrics in request_metrics
+            for stage in metrics.stage_latencies
+        })
+        results[name] = {
+            "requests": len(questions),
+            "concurrency": concurrency,
+            "seconds": summarize(
+                [metrics.total_seconds for metrics in request_metrics]
+            ),
+            "requests_per_second": len(questions) / seconds,
+            "stage_seconds": {
+                stage: summarize([
+                    metrics.stage_latencies[stage]
+                    for metrics in request_metrics
+                    if stage in metrics.stage_latencies
+                ])
+                for stage in stages
+            },
+            "llm_calls": sum(m.llm_calls for m in request_metrics),
+        }
+        logging.info(
+            "%s: %.2f requests/s at concurrency %d",
+            name, len(questions) / seconds, concurrency
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS)
+    )
+    parser.add_argument("--output", default=None, help="JSON report path.")
+    parser.add_argument("--opensearch-url", default="")
+    parser.add_argument(
+        "--embedding-url", default="",
+        help="Embedding endpoint, the mock server when empty."
+    )
+    parser.add_argument(
+        "--llm-url", default="",
+        help="OpenAI compatible base URL, the mock server when empty."
+    )
+    parser.add_argument("--model-name", default=MockConfig.model_name)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--document-chars", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument(
+        "--embedding-batch-sizes", type=int, nargs="+",
+        default=[1, 8, 32, 64, 128]
+    )
+    parser.add_argument(
+        "--bulk-sizes", type=int, nargs="+", default=[100, 500, 2000]
+    )
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument(
+        "--ef-search", type=int, nargs="+", default=[16, 64, 256, 512]
+    )
+    parser.add_argument("--ef-construction", type=int, default=512)
+    parser.add_argument("--get-data-repeats", type=int, default=5)
+    parser.add_argument("--graph-questions", type=int, default=50)
+    parser.add_argument("--graph-concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = None
+    if not args.embedding_url or not args.llm_url:
+        mock = serve_in_background(MockConfig(model_name=args.model_name))
+    embedding_url = (
+        args.embedding_url or f"{mock.base_url}/api/v0/embedding/doc"
+    )
+    llm_url = args.llm_url or f"{mock.base_url}/v1"
+
+    corpus = build_corpus(args.documents, args.document_chars, args.seed)
+    questions = build_questions(args.queries, args.seed)
+    report: Dict[str, Any] = {
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key != "output"
+        },
+        "mock_server": mock is not None,
+        "sections": {},
+    }
+    sections = report["sections"]
+
+    try:
+        if "embedding" in args.sections:
+            sections["embedding"] = bench_embedding(
+                embedding_url, corpus, args.embedding_batch_sizes
+            )
+
+        opensearch_sections = [
+            name for name in ("bulk", "knn", "get_data")
+            if name in args.sections
+        ]
+        if opensearch_sections and not args.opensearch_url:
+            for name in opensearch_sections:
+                sections[name] = {"skipped": "--opensearch-url is not set"}
+        elif opensearch_sections:
+            from utils.opensearch_client import OpenSearchClient
+
+            opensearch = OpenSearchClient.from_url(args.opensearch_url)
+            vectors = embed_corpus(embedding_url, corpus)
+            if "bulk" in args.sections:
+                sections["bulk"] = bench_bulk(
+                    opensearch, corpus, vectors, args.bulk_sizes
+                )
+            if "knn" in args.sections:
+                sections["knn"] = bench_knn(
+                    opensearch, corpus, vectors,
+                    embed_corpus(embedding_url, questions),
+                    args.m, args.ef_search, args.ef_construction, args.k,
+                )
+            if "get_data" in args.sections:
+                sections["get_data"] = bench_get_data(
+                    opensearch, corpus, vectors, args.get_data_repeats
+                )
+
+        if "graphs" in args.sections:
+            sections["graphs"] = bench_graphs(
+                llm_url, args.model_name, embedding_url, corpus,
+                questions[:args.graph_questions], args.graph_concurrency,
+                args.k,
+            )
+    finally:
+        if mock is not None:
+            mock.shutdown()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    main()
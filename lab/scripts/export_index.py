@@ -0,0 +1,48 @@
+"""
+Export the chunks of an index as CSV, Parquet or Arrow.
+
+Parquet and Arrow exports keep ``Metadata`` as a struct column and the index
+``_meta`` in the file, with ``--embeddings`` the vectors are included so
+``rebuild_index_with_csv`` can load them without embedding again.
+
+    $ python -m scripts.export_index kb.parquet --index <index> --embeddings
+"""
+import argparse
+import logging
+import os
+
+from utils.data.export_data import get_data, write_chunks
+from utils.opensearch_client import OpenSearchClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("output", help=".csv, .parquet, .arrow or .feather")
+    parser.add_argument("--index", default=os.getenv("VECTORDB_INDEX", ""))
+    parser.add_argument(
+        "--opensearch-url", default=os.getenv("VECTORDB_HOST", "")
+    )
+    parser.add_argument(
+        "--size", type=int, default=None,
+        help="Export only this many chunks, all of them by default."
+    )
+    parser.add_argument("--embeddings", action="store_true")
+    args = parser.parse_args()
+
+    if not args.index or not args.opensearch_url:
+        parser.error("--index and --opensearch-url are required")
+    opensearch = OpenSearchClient.from_url(args.opensearch_url)
+    records = get_data(
+        opensearch, args.index, args.size,
+        include_embeddings=args.embeddings
+    )
+    index_meta = opensearch.get_mapping_info(args.index).get(
+        "mappings", {}
+    ).get("_meta", {})
+    write_chunks(records, args.output, index_meta)
+    logging.info("Exported %d chunks to %s", len(records), args.output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
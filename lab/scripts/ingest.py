@@ -0,0 +1,326 @@
+"""
+Build or extend a knowledge base index from a directory of TXT/PDF files.
+
+Files are chunked with the ``chunk_size``/``overlap`` of the index, near
+duplicate chunks are dropped, then the remaining chunks are embedded and bulk
+indexed in batches, every stage running concurrently. Settings default to
+the same environment variables as the lab (``VECTORDB_HOST``,
+``EMBEDDING_HOST``). Without ``--index`` a new index is created, pass the
+index explicitly to extend an existing knowledge base. With ``--cache-dir``
+the chunks of each file are kept on disk, keyed by path, mtime and size, and
+unchanged files are not loaded and chunked again on the next run.
+
+    $ python -m scripts.ingest docs/ --db-name hr_rules --output report.json
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import fields
+from typing import Any, Callable, Dict, List
+
+from utils.client.embedding import EmbeddingClient
+from utils.data.base_pipe import Pipeline, PipelineStep
+from utils.data.cache import DiskStepCache
+from utils.data.chunker.sentence_chunker import SentenceChunker
+from utils.data.dedup import (DedupStats, MinHashDeduplicator,
+                              VectorDeduplicator)
+from utils.data.pipelines.ingest import (BulkIndexer, Embedder, FileLoader,
+                                         iter_batches, iter_files)
+from utils.opensearch_client import OpenSearchClient
+
+
+class StageMeter:
+    """
+    Busy time and item counts per stage, shared by the metered steps.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def add(self, stage: str, seconds: float, items: int) -> None:
+        with self._lock:
+            stats = self.stages.setdefault(
+                stage, {"calls": 0, "items": 0, "busy_seconds": 0.0}
+            )
+            stats["calls"] += 1
+            stats["items"] += items
+            stats["busy_seconds"] += seconds
+
+    def report(self, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for stage, stats in self.stages.items():
+            busy = stats["busy_seconds"]
+            report[stage] = {
+                **stats,
+                # 單一 worker 的處理速度與整體實際速度
+                "items_per_busy_second": stats["items"] / busy if busy else 0,
+                "items_per_second": (
+                    stats["items"] / wall_seconds if wall_seconds else 0
+                ),
+            }
+        return report
+
+
+class MeteredStep(PipelineStep):
+    """
+    Record the busy time and item count of a step in ``meter``.
+
+    Without ``count`` the step is treated as a streaming step: its iterator
+    outputs are wrapped, and the time spent producing each item is recorded
+    once the iterator is exhausted. Pulling an item also runs the upstream
+    generators it reads from, so the busy time of a streaming step includes
+    that of the streaming steps before it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        step: PipelineStep,
+        meter: StageMeter,
+        count: Callable[[Any], int] | None = None,
+    ) -> None:
+        super().__init__()
+        self.name = name
+        self.step = step
+        self.meter = meter
+        self.count = count
+        self.version = step.version
+
+    @property
+    def input_class(self):
+        return self.step.input_class
+
+    @property
+    def output_class(self):
+        return self.step.output_class
+
+    def _metered(self, items: Iterator, seconds: float) -> Iterator:
+        count = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - start
+            count += 1
+            yield item
+        self.meter.add(self.name, seconds, count)
+
+    def execute(self, inputs: Any) -> Any:
+        start = time.perf_counter()
+        outputs = self.step.execute(inputs)
+        seconds = time.perf_counter() - start
+        if self.count is not None:
+            self.meter.add(self.name, seconds, self.count(outputs))
+            return outputs
+        for field in fields(outputs):
+            value = getattr(outputs, field.name)
+            if isinstance(value, Iterator):
+                setattr(outputs, field.name, self._metered(value, seconds))
+        return outputs
+
+
+def prepare_index(
+    opensearch: OpenSearchClient,
+    embedding_client: EmbeddingClient,
+    args: argparse.Namespace,
+) -> SentenceChunker:
+    """
+    Create the index when needed and return a chunker matching its ``_meta``.
+    """
+    if opensearch.is_index_exists(args.index):
+        chunker = SentenceChunker.from_index(opensearch, args.index)
+        for name in ("chunk_size", "overlap"):
+            requested = getattr(args, name)
+            if requested is not None and requested != getattr(chunker, name):
+                logging.warning(
+                    "Ignoring --%s %d, index '%s' uses %d",
+                    name.replace("_", "-"), requested, args.index,
+                    getattr(chunker, name)
+                )
+        return chunker
+
+    if not args.db_name:
+        raise ValueError("--db-name is required to create a new index")
+    chunker = SentenceChunker(
+        600 if args.chunk_size is None else args.chunk_size,
+        180 if args.overlap is None else args.overlap,
+    )
+    dim = len(embedding_client.embed_query("test"))
+    opensearch.create_index(
+        args.index,
+        args.db_name,
+        args.embedding_model,
+        chunker.chunk_size,
+        chunker.overlap,
+        dim,
+        tags=args.tags,
+    )
+    logging.info("Created index %s (dim=%d)", args.index, dim)
+    return chunker
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    opensearch = OpenSearchClient.from_url(args.opensearch_url)
+    embedding_client = EmbeddingClient(
+        args.embedding_url, request_timeout=args.timeout
+    )
+    chunker = prepare_index(opensearch, embedding_client, args)
+    files: List[str] = list(iter_files(args.inputs))
+    logging.info("Ingesting %d files into %s", len(files), args.index)
+
+    meter = StageMeter()
+    loader = FileLoader(pdf_processes=args.pdf_processes)
+    # 頁面與 chunk 都是 generator，邊解析邊切，單一檔案不會整份留在記憶體
+    chunk_pipeline = Pipeline(
+        load=MeteredStep("load", loader, meter),
+        chunk=MeteredStep("chunk", chunker, meter),
+    )
+    if args.cache_dir:
+        chunk_pipeline.use_cache(DiskStepCache(args.cache_dir))
+    dedup_stats = DedupStats()
+    index_steps: Dict[str, PipelineStep] = {}
+    if args.dedup_threshold:
+        index_steps["dedup"] = MeteredStep(
+            "dedup",
+            MinHashDeduplicator(args.dedup_threshold, stats=dedup_stats),
+            meter,
+            lambda outputs: len(outputs.chunks),
+        )
+    index_steps["embed"] = MeteredStep(
+        "embed", Embedder(embedding_client), meter,
+        lambda outputs: len(outputs.embeddings),
+    )
+    if args.vector_dedup_threshold:
+        index_steps["vector_dedup"] = MeteredStep(
+            "vector_dedup",
+            VectorDeduplicator(
+                args.vector_dedup_threshold, stats=dedup_stats
+            ),
+            meter,
+            lambda outputs: len(outputs.chunks),
+        )
+    index_steps["index"] = MeteredStep(
+        "index", BulkIndexer(opensearch, args.index), meter,
+        lambda outputs: outputs.indexed,
+    )
+    index_pipeline = Pipeline(**index_steps)
+
+    start = time.perf_counter()
+
+    def chunks():
+        results = chunk_pipeline.stream(
+            {"file_path": file_path} for file_path in files
+        )
+        for i, result in enumerate(results, 1):
+            count = 0
+            for chunk in result["chunks"]:
+                count += 1
+                yield chunk
+            logging.info(
+                "[%d/%d] %s: %d chunks", i, len(files), result["file_path"],
+                count
+            )
+
+    indexed = 0
+    try:
+        for result in index_pipeline.stream(
+            iter_batches(chunks(), args.batch_size),
+            # 去重的步驟有狀態，維持單一 worker
+            workers={"embed": args.embed_workers, "index": args.index_workers},
+        ):
+            indexed += result["indexed"]
+    finally:
+        loader.close()
+    opensearch.refresh(args.index)
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "index": args.index,
+        "files": len(files),
+        "chunks": indexed,
+        "wall_seconds": wall_seconds,
+        "chunks_per_second": indexed / wall_seconds if wall_seconds else 0,
+        "stages": meter.report(wall_seconds),
+        "dedup": dedup_stats.to_dict(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "inputs", nargs="+", help="TXT/PDF files or directories."
+    )
+    parser.add_argument(
+        "--index", default="",
+        help="Index to create or extend, a new UUID is used when omitted."
+    )
+    parser.add_argument(
+        "--opensearch-url", default=os.getenv("VECTORDB_HOST", "")
+    )
+    parser.add_argument(
+        "--embedding-url", default=os.getenv("EMBEDDING_HOST", ""),
+        help="Embedding endpoint, e.g. http://llm:8001/api/v0/embedding/doc"
+    )
+    parser.add_argument(
+        "--db-name", default="", help="Required when creating the index."
+    )
+    parser.add_argument(
+        "--embedding-model",
+        default=os.getenv("EMBEDDING_MODEL", "MULTILINGUAL-E5")
+    )
+    parser.add_argument("--tags", nargs="*", default=None)
+    parser.add_argument(
+        "--chunk-size", type=int, default=None,
+        help="Only used for new indices, defaults to 600."
+    )
+    parser.add_argument(
+        "--overlap", type=int, default=None,
+        help="Only used for new indices, defaults to 180."
+    )
+    parser.add_argument(
+        "--dedup-threshold", type=float, default=0.8,
+        help="MinHash similarity of near-duplicate chunks, 0 disables."
+    )
+    parser.add_argument(
+        "--vector-dedup-threshold", type=float, default=0.0,
+        help="Cosine similarity of duplicate embeddings, 0 disables."
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--pdf-processes", type=int, default=None,
+        help="Processes extracting PDF pages, defaults to the CPU count."
+    )
+    parser.add_argument(
+        "--cache-dir", default="",
+        help="Keep the chunks of each file here to skip unchanged files."
+    )
+    parser.add_argument("--embed-workers", type=int, default=4)
+    parser.add_argument("--index-workers", type=int, default=2)
+    parser.add_argument("--timeout", type=int, default=600)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    if not args.opensearch_url or not args.embedding_url:
+        parser.error("--opensearch-url and --embedding-url are required")
+    args.index = args.index or str(uuid.uuid4())
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,415 @@
+"""
+Load test the chat pages headless with concurrent simulated sessions.
+
+Each session asks questions drawn from a question mix, waits a random think
+time between turns and starts over after ``--turns`` questions. The
+``chat`` scenario streams from the OpenAI compatible server with the
+``ChatHistoryManager`` of ``page/chat/conversation.py``, ``rag`` and
+``crag`` stream the same graphs as ``rag_conversation.py`` and ``crag.py``.
+Concurrency is ramped through ``--concurrency`` levels, each held for
+``--stage-seconds``, and every level reports throughput, latency and time to
+first token percentiles, and the error rate.
+
+The clients come from the environment like the pages (``VLLM_HOST``,
+``MODEL_NAME``, ``VECTORDB_HOST``, ``EMBEDDING_HOST``), with ``--mock`` a
+local mock server and an in-memory vector store are used instead.
+
+    $ python -m scripts.load_test --mock --scenario crag --concurrency 1 4 16
+    $ python -m scripts.load_test --scenario chat --questions questions.csv --output load.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List
+
+from utils.benchmark import summarize
+from utils.chat_history import ChatHistoryManager
+from utils.client.streaming import StreamMetrics
+
+QUESTION_COLUMN = "問題"
+SCENARIOS = ("chat", "rag", "crag")
+# 只有這些節點的輸出是使用者看到的回覆，其餘是 grader 與改寫問題
+ANSWER_NODES = {"generate", "extra_generate"}
+
+# 與 page/chat/conversation.py 相同的 system prompt 與問候語
+SYSTEM_PROMPT = "你是一位專業的企業助理，回答任何使用者的問題。"
+GREETING = "早安，請問您需要什麼協助?"
+
+DEFAULT_QUESTIONS = [
+    "請問我要如何請特休？",
+    "一年有幾天特休?",
+    "要怎麼請病假?",
+    "出差的交通費要怎麼報帳？",
+    "加班費怎麼計算？",
+    "新進員工的報到流程是什麼？",
+    "請幫我整理公司請假規定的重點，並說明特休、病假與事假的差異。",
+    "績效考核的時程與流程為何？主管與員工各自需要準備哪些文件？",
+]
+
+
+@dataclass
+class RequestRecord:
+    start: float
+    seconds: float
+    ttft_seconds: float | None
+    tokens: int
+    error: str | None = None
+
+
+@dataclass
+class StageResult:
+    concurrency: int
+    seconds: float
+    records: List[RequestRecord] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ok = [record for record in self.records if record.error is None]
+        errors: Dict[str, int] = {}
+        for record in self.records:
+            if record.error is not None:
+                errors[record.error] = errors.get(record.error, 0) + 1
+        tokens = sum(record.tokens for record in ok)
+        return {
+            "concurrency": self.concurrency,
+            "requests": len(self.records),
+            "errors": len(self.records) - len(ok),
+            "error_rate": (
+                (len(self.records) - len(ok)) / len(self.records)
+                if self.records else 0.0
+            ),
+            "error_types": errors,
+            "requests_per_second": len(ok) / self.seconds,
+            "tokens_per_second": tokens / self.seconds,
+            "latency_seconds": summarize([r.seconds for r in ok]),
+            "ttft_seconds": summarize([
+                r.ttft_seconds for r in ok if r.ttft_seconds is not None
+            ]),
+        }
+
+
+def load_questions(path: str | None) -> List[str]:
+    if not path:
+        return DEFAULT_QUESTIONS
+    import pandas as pd
+
+    questions = pd.read_csv(path)
+    if QUESTION_COLUMN not in questions.columns:
+        raise ValueError(f"Column '{QUESTION_COLUMN}' is required.")
+    return questions[QUESTION_COLUMN].dropna().astype(str).tolist()
+
+
+class ChatSession:
+    """
+    One user of the simple chat page, the history is kept across turns.
+    """
+
+    def __init__(self, client, model: str, max_tokens: int):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+        self.history = ChatHistoryManager(
+            system_message={
+                "role": "system", "content": SYSTEM_PROMPT + "\n\n" + GREETING
+            },
+            summarize_fn=self._summarize,
+        )
+
+    def _summarize(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "請將對話內容整理成精簡的摘要。"},
+                {
+                    "role": "user",
+                    "content": f"既有摘要：\n{summary or '無'}\n\n"
+                               f"新增對話：\n{transcript}"
+                },
+            ],
+            max_tokens=512,
+            temperature=0.2,
+        )
+        return completion.choices[0].message.content or summary
+
+    def ask(self, question: str) -> Iterator[str]:
+        self.history.append("user", question)
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=self.history.build_messages(),
+            max_tokens=self.max_tokens,
+            temperature=0.5,
+            top_p=0.5,
+            stream=True,
+        )
+        pieces = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        self.history.append("assistant", "".join(pieces))
+
+
+class GraphSession:
+    """
+    One user of the RAG or CRAG page, questions are independent.
+    """
+
+    def __init__(self, graph, name: str):
+        self.graph = graph
+        self.name = name
+
+    def ask(self, question: str) -> Iterator[str]:
+        from utils.graphs.instrumentation import request_config
+        from utils.metrics import RequestMetrics
+
+        metrics = RequestMetrics(self.name)
+        for message, metadata in self.graph.stream(
+            {"question": question},
+            request_config(metrics),
+            stream_mode="messages",
+        ):
+            if (
+                metadata.get("langgraph_node") in ANSWER_NODES
+                and isinstance(message.content, str)
+                and message.content
+            ):
+                yield message.content
+        metrics.finish()
+
+
+def run_session(
+    make_session: Callable[[], Any],
+    questions: List[str],
+    turns: int,
+    think_time: float,
+    rng: random.Random,
+    stop: threading.Event,
+    records: List[RequestRecord],
+    scenario: str,
+) -> None:
+    # 錯開每個使用者的第一個問題，避免同時打進來
+    if think_time > 0:
+        stop.wait(rng.uniform(0, think_time))
+    while not stop.is_set():
+        session = make_session()
+        for _ in range(turns):
+            if stop.is_set():
+                return
+            metrics = StreamMetrics(client=f"load_test_{scenario}")
+            start = time.perf_counter()
+            error = None
+            try:
+                for text in session.ask(rng.choice(questions)):
+                    metrics.record_text(text)
+            except Exception as exc:
+                error = type(exc).__name__
+                logging.debug("Request failed: %r", exc)
+            metrics.finish()
+            records.append(RequestRecord(
+                start=start,
+                seconds=metrics.total_seconds,
+                ttft_seconds=metrics.first_token_seconds,
+                tokens=metrics.tokens,
+                error=error,
+            ))
+            if think_time > 0:
+                # 思考時間服從指數分佈，上限為平均的 4 倍
+                stop.wait(min(rng.expovariate(1 / think_time), 4 * think_time))
+
+
+def run_stage(
+    make_session: Callable[[], Any],
+    questions: List[str],
+    concurrency: int,
+    stage_seconds: float,
+    turns: int,
+    think_time: float,
+    seed: int,
+    scenario: str,
+) -> StageResult:
+    stop = threading.Event()
+    records: List[RequestRecord] = []
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(
+                make_session, questions, turns, think_time,
+                random.Random(seed * 1000 + i), stop, records, scenario,
+            ),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(stage_seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    # 停止後仍在進行的請求會完成並計入，時間也量到最後一個請求結束為止，
+    # 吞吐量的分子與分母涵蓋同一段時間
+    end = time.perf_counter()
+    return StageResult(concurrency, end - start, records)
+
+
+def build_session_factory(args, mock=None) -> Callable[[], Any]:
+    """
+    Sessions wired like the pages, or to the mock server when given.
+    """
+    base_url = f"{mock.base_url}/v1" if mock is not None else None
+    if args.scenario == "chat":
+        from openai import OpenAI
+
+        client = OpenAI(
+            base_url=base_url or os.getenv("VLLM_HOST", ""),
+            api_key=os.getenv("VLLM_API_KEY", "") or "load-test",
+            max_retries=0,
+        )
+        model = args.model_name or os.getenv("MODEL_NAME", "")
+        return lambda: ChatSession(client, model, args.max_tokens)
+
+    from utils.graphs import crag, simple_rag
+
+    if mock is None:
+        from utils.graphs.clients import get_llm, get_retriever
+
+        llm, retriever = get_llm(), get_retriever(args.index)
+    else:
+        from langchain_core.vectorstores import InMemoryVectorStore
+        from langchain_openai import ChatOpenAI
+
+        from scripts.benchmark_suite import build_corpus
+        from utils.client.embedding import EmbeddingClient
+
+        llm = ChatOpenAI(
+            openai_api_base=base_url,
+            openai_api_key="load-test",
+            model_name=args.model_name,
+            stream_usage=True,
+        )
+        store = InMemoryVectorStore(
+            EmbeddingClient(f"{mock.base_url}/api/v0/embedding/doc")
+        )
+        store.add_texts(build_corpus(args.documents, 200, args.seed))
+        retriever = store.as_retriever()
+
+    build_graph = (
+        simple_rag.build_graph if args.scenario == "rag" else crag.build_graph
+    )
+    graph = build_graph(llm, retriever)
+    return lambda: GraphSession(graph, args.scenario)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, default="chat")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+        help="Concurrent sessions of each ramp stage."
+    )
+    parser.add_argument("--stage-seconds", type=float, default=60.0)
+    parser.add_argument(
+        "--think-time", type=float, default=5.0,
+        help="Mean seconds a user waits between two questions."
+    )
+    parser.add_argument(
+        "--turns", type=int, default=5,
+        help="Questions per session before a new session starts."
+    )
+    parser.add_argument(
+        "--questions", default=None,
+        help="CSV with a 問題 column, a built-in mix when empty."
+    )
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--model-name", default="")
+    parser.add_argument(
+        "--index", default=None,
+        help="Index for rag/crag, defaults to VECTORDB_INDEX."
+    )
+    parser.add_argument(
+        "--max-error-rate", type=float, default=None,
+        help="Stop ramping once a stage exceeds this error rate."
+    )
+    parser.add_argument(
+        "--mock", action="store_true",
+        help="Run against an in-process mock server and vector store."
+    )
+    parser.add_argument(
+        "--mock-max-concurrent", type=int, default=8,
+        help="Generations the mock server serves at once."
+    )
+    parser.add_argument(
+        "--mock-decode-tokens-per-s", type=float, default=50.0
+    )
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON report path.")
+    args = parser.parse_args()
+
+    mock = None
+    if args.mock:
+        from scripts.mock_server import MockConfig, serve_in_background
+
+        mock = serve_in_background(MockConfig(
+            max_concurrent_requests=args.mock_max_concurrent,
+            decode_tokens_per_s=args.mock_decode_tokens_per_s,
+        ))
+        args.model_name = args.model_name or MockConfig.model_name
+
+    questions = load_questions(args.questions)
+    make_session = build_session_factory(args, mock)
+    stages = []
+    try:
+        for concurrency in args.concurrency:
+            stage = run_stage(
+                make_session, questions, concurrency, args.stage_seconds,
+                args.turns, args.think_time, args.seed, args.scenario,
+            ).to_dict()
+            stages.append(stage)
+            logging.info(
+                "concurrency %d: %.2f requests/s, p95 %.2fs, "
+                "ttft p95 %.2fs, errors %.1f%%",
+                concurrency,
+                stage["requests_per_second"],
+                stage["latency_seconds"].get("p95", float("nan")),
+                stage["ttft_seconds"].get("p95", float("nan")),
+                100 * stage["error_rate"],
+            )
+            if (
+                args.max_error_rate is not None
+                and stage["error_rate"] > args.max_error_rate
+            ):
+                logging.warning(
+                    "Error rate above %.1f%%, stopping the ramp",
+                    100 * args.max_error_rate
+                )
+                break
+    finally:
+        if mock is not None:
+            mock.shutdown()
+
+    report = {
+        "scenario": args.scenario,
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key != "output"
+        },
+        "stages": stages,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    main()
@@ -0,0 +1,594 @@
+"""
+Local stand-in for the OpenAI compatible vLLM server and the lab APIs.
+
+Prefill time is simulated per prompt token and, like vLLM's automatic prefix
+caching, prompt blocks whose prefix was already seen are served from an LRU
+cache and only cost ``cached_prefill_ms_per_token``.
+
+Besides ``/v1/chat/completions`` (streaming, tool calls and ``json_schema``
+response formats) the server answers the endpoints configured in
+``settings/configs/components.py`` and ``EMBEDDING_HOST``:
+
++ ``/api/v0/embedding/doc``: hashed bag-of-token vectors, so texts sharing
+  tokens are close in cosine similarity.
++ ``/api/v0/llm/rag``: ``{"results": {"text"}}``, streamed as SSE when the
+  request has ``"stream": true``.
++ ``/api/v0/knowledgeset/prompt`` and ``/api/v0/prompt/create``.
+
+    $ python -m scripts.mock_server --port 9999
+    $ RAG_API=http://localhost:9999/api/v0/llm/rag streamlit run start.py
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+_CJK = r"\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]|\s+|[^\s{_CJK}]{{1,4}}")
+
+
+@dataclass
+class MockConfig:
+    model_name: str = "Breeze-7B"
+    prefill_ms_per_token: float = 0.2
+    cached_prefill_ms_per_token: float = 0.01
+    decode_tokens_per_s: float = 50.0
+    completion_tokens: int = 32
+    block_size: int = 16
+    cache_blocks: int = 8192
+    enable_prefix_caching: bool = True
+    # 每個請求固定的網路/排隊延遲
+    request_latency_ms: float = 0.0
+    # 同時生成的請求數上限，超過的請求排隊，0 表示不限制
+    max_concurrent_requests: int = 0
+    embedding_dim: int = 1024
+    embedding_ms_per_document: float = 1.0
+    # 結構化輸出中 yes/no 欄位 (例如 grader 的 binary_score) 回 yes 的比例
+    structured_yes_ratio: float = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Cheap stand-in tokenizer, one token per CJK character, whitespace run or
+    up to four other characters.
+    """
+    return _TOKEN_PATTERN.findall(text)
+
+
+class PrefixCache:
+    """
+    Block level prefix cache, each block is keyed by the hash of all tokens
+    up to and including it, so a block only hits if its whole prefix matches.
+    """
+
+    def __init__(self, block_size: int, capacity: int):
+        self.block_size = block_size
+        self.capacity = capacity
+        self._blocks: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup_and_insert(self, tokens: List[str]) -> int:
+        """
+        Return the number of leading tokens already cached, and cache the
+        remaining full blocks.
+        """
+        cached = 0
+        prefix_hash = hashlib.sha1()
+        hit = True
+        with self._lock:
+            for start in range(
+                0, len(tokens) - self.block_size + 1, self.block_size
+            ):
+                block = "".join(tokens[start:start + self.block_size])
+                prefix_hash.update(block.encode("utf-8"))
+                key = prefix_hash.hexdigest()
+                if hit and key in self._blocks:
+                    self._blocks.move_to_end(key)
+                    cached += self.block_size
+                    continue
+                hit = False
+                self._blocks[key] = None
+                if len(self._blocks) > self.capacity:
+                    self._blocks.popitem(last=False)
+        return cached
+
+    def reset(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+
+
+def embed(text: str, dim: int) -> List[float]:
+    """
+    Deterministic unit vector of the hashed token counts of ``text``.
+    """
+    vector = [0.0] * dim
+    for token in tokenize(text):
+        if token.isspace():
+            continue
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dim] += 1.0 if value >> 63 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        vector[0] = norm = 1.0
+    return [x / norm for x in vector]
+
+
+def mock_value(
+    schema: Dict[str, Any], rng: random.Random, yes_ratio: float,
+    name: str = ""
+) -> Any:
+    """
+    A value matching a JSON schema, yes/no strings are answered ``yes`` with
+    probability ``yes_ratio``.
+    """
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "anyOf" in schema:
+        return mock_value(schema["anyOf"][0], rng, yes_ratio, name)
+    kind = schema.get("type", "object")
+    if kind == "object":
+        return {
+            key: mock_value(value, rng, yes_ratio, key)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [mock_value(schema.get("items", {}), rng, yes_ratio, name)]
+    if kind == "boolean":
+        return rng.random() < yes_ratio
+    if kind == "integer":
+        return rng.randint(0, 10)
+    if kind == "number":
+        return round(rng.random(), 3)
+    description = f"{name} {schema.get('description', '')}".lower()
+    if "yes" in description and "no" in description:
+        return "yes" if rng.random() < yes_ratio else "no"
+    return "模擬的內容"
+
+
+def build_prompt(items: List[Dict[str, Any]], separator: str = "\n\n") -> str:
+    """
+    Join the prompt items in order, the same layout as ``BuildPromptAction``
+    builds locally.
+    """
+    ordered = sorted(items, key=lambda item: item.get("order", 0))
+    return "".join(separator + item.get("content", "") for item in ordered)
+
+
+def render_messages(messages: List[Dict[str, Any]]) -> str:
+    return "".join(
+        f"<|{m.get('role', 'user')}|>{m.get('content') or ''}\n"
+        for m in messages
+    )
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: "MockServer"
+    # keep-alive 與 chunked 串流，和 vLLM/uvicorn 一樣
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug("mock_server: " + format, *args)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _send_json(self, data: Any, status: int = 200) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_sse(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_sse(self, data: Any) -> None:
+        payload = data if isinstance(data, str) else json.dumps(
+            data, ensure_ascii=False
+        )
+        event = f"data: {payload}\n\n".encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+        self.wfile.flush()
+
+    def _end_sse(self) -> None:
+        self._send_sse("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json({
+                "object": "list",
+                "data": [{
+                    "id": self.server.config.model_name, "object": "model"
+                }],
+            })
+        elif self.path.rstrip("/") == "/health":
+            self._send_json({"status": "ok"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        body = self._read_json()
+        handler = self.routes.get(path)
+        if handler is None:
+            self._send_json({"error": "not found"}, 404)
+            return
+        if self.server.config.request_latency_ms:
+            time.sleep(self.server.config.request_latency_ms / 1000)
+        handler(self, body)
+
+    def _reset_prefix_cache(self, body: Dict[str, Any]) -> None:
+        self.server.prefix_cache.reset()
+        self._send_json({"status": "ok"})
+
+    def _prefill(self, prompt: str) -> Tuple[int, int]:
+        """
+        Sleep for the simulated prefill time, returns (prompt, cached) tokens.
+        """
+        config = self.server.config
+        tokens = tokenize(prompt)
+        cached = 0
+        if config.enable_prefix_caching:
+            cached = self.server.prefix_cache.lookup_and_insert(tokens)
+        delay_ms = (
+            (len(tokens) - cached) * config.prefill_ms_per_token
+            + cached * config.cached_prefill_ms_per_token
+        )
+        time.sleep(delay_ms / 1000)
+        return len(tokens), cached
+
+    def _completion_tokens(self, max_tokens: Any) -> List[str]:
+        default = self.server.config.completion_tokens
+        count = min(default, int(max_tokens or default))
+        text = "這是模擬的回覆內容。" * (count // 10 + 1)
+        return list(text[:count])
+
+    def _usage(
+        self, prompt_tokens: int, cached_tokens: int, completion_tokens: int
+    ) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+    def _decode(self, tokens: List[str]) -> Iterator[str]:
+        """
+        Yield the tokens at the configured decode speed.
+        """
+        decode_delay = 1 / self.server.config.decode_tokens_per_s
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(decode_delay)
+            yield token
+
+    def _structured_output(
+        self, body: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any] | None, Dict[str, Any] | None]:
+        """
+        Schema of a tool call or a JSON response format, returns
+        (tool, schema), both None for plain text.
+        """
+        tools = body.get("tools") or []
+        if tools and body.get("tool_choice") != "none":
+            choice = body.get("tool_choice")
+            tool = tools[0]["function"]
+            if isinstance(choice, dict):
+                name = choice.get("function", {}).get("name")
+                tool = next(
+                    (
+                        t["function"] for t in tools
+                        if t["function"]["name"] == name
+                    ),
+                    tool,
+                )
+            return tool, tool.get("parameters", {})
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            return None, response_format.get("json_schema", {}).get(
+                "schema", {}
+            )
+        if response_format.get("type") == "json_object":
+            return None, {"type": "object"}
+        if body.get("guided_json"):
+            return None, body["guided_json"]
+        return None, None
+
+    def _chat_completions(self, body: Dict[str, Any]) -> None:
+        with self.server.generation_slot():
+            self._chat_completion(body)
+
+    def _chat_completion(self, body: Dict[str, Any]) -> None:
+        config = self.server.config
+        prompt_tokens, cached_tokens = self._prefill(
+            render_messages(body.get("messages", []))
+        )
+        tool, schema = self._structured_output(body)
+        tool_call = None
+        if schema is not None:
+            content = json.dumps(
+                mock_value(
+                    schema, self.server.rng, config.structured_yes_ratio
+                ),
+                ensure_ascii=False,
+            )
+            # 結構化輸出依 JSON 的 token 數計算解碼時間
+            tokens = tokenize(content)
+            if tool is not None:
+                tool_call = {
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": tool["name"], "arguments": content},
+                }
+        else:
+            tokens = self._completion_tokens(
+                body.get("max_completion_tokens") or body.get("max_tokens")
+            )
+        usage = self._usage(prompt_tokens, cached_tokens, len(tokens))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        finish_reason = "tool_calls" if tool_call else "stop"
+
+        def chunk(choices: List[Dict[str, Any]], **extra) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": config.model_name,
+                "choices": choices,
+                **extra,
+            }
+
+        def delta(content: Dict[str, Any], finish: str | None = None):
+            return chunk([
+                {"index": 0, "delta": content, "finish_reason": finish}
+            ])
+
+        if not body.get("stream"):
+            for _ in self._decode(tokens):
+                pass
+            message: Dict[str, Any] = {"role": "assistant"}
+            if tool_call:
+                message.update({"content": None, "tool_calls": [tool_call]})
+            else:
+                message["content"] = "".join(tokens)
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": config.model_name,
+                "choices": [{
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            })
+            return
+
+        self._start_sse()
+        if tool_call:
+            self._send_sse(delta({
+                "role": "assistant",
+                "tool_calls": [{
+                    "index": 0,
+                    "id": tool_call["id"],
+                    "type": "function",
+                    "function": {
+                        "name": tool_call["function"]["name"],
+                        "arguments": "",
+                    },
+                }],
+            }))
+            for token in self._decode(tokens):
+                self._send_sse(delta({
+                    "tool_calls": [
+                        {"index": 0, "function": {"arguments": token}}
+                    ],
+                }))
+        else:
+            for token in self._decode(tokens):
+                self._send_sse(delta({"content": token}))
+        self._send_sse(delta({}, finish_reason))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._send_sse(chunk([], usage=usage))
+        self._end_sse()
+
+    def _rag(self, body: Dict[str, Any]) -> None:
+        with self.server.generation_slot():
+            prompt_tokens, cached_tokens = self._prefill(
+                str(body.get("query", ""))
+            )
+            tokens = self._completion_tokens(body.get("max_token"))
+            usage = self._usage(prompt_tokens, cached_tokens, len(tokens))
+            if not body.get("stream"):
+                for _ in self._decode(tokens):
+                    pass
+                self._send_json({
+                    "results": {"text": "".join(tokens)}, "usage": usage
+                })
+                return
+
+            self._start_sse()
+            for token in self._decode(tokens):
+                self._send_sse({"results": {"text": token}})
+            self._send_sse({"results": {"text": ""}, "usage": usage})
+            self._end_sse()
+
+    def _embedding(self, body: Dict[str, Any]) -> None:
+        config = self.server.config
+        documents = body.get("documents") or []
+        time.sleep(len(documents) * config.embedding_ms_per_document / 1000)
+        self._send_json({
+            "embeddings": [
+                embed(document, config.embedding_dim)
+                for document in documents
+            ]
+        })
+
+    def _build_prompt(self, body: Dict[str, Any]) -> None:
+        items = body.get("items") or []
+        if not items:
+            self._send_json({"error": "items is required"}, 422)
+            return
+        self._send_json({"prompt": build_prompt(items)})
+
+    def _create_prompt(self, body: Dict[str, Any]) -> None:
+        missing = [
+            key for key in ("name", "prompt", "prompt_type")
+            if not body.get(key)
+        ]
+        if missing:
+            self._send_json({"error": f"missing {missing}"}, 422)
+            return
+        prompt_id = uuid.uuid4().hex
+        self.server.prompts[prompt_id] = body
+        self._send_json({"id": prompt_id, **body}, 201)
+
+    routes: Dict[str, Callable[["MockHandler", Dict[str, Any]], None]] = {
+        "/v1/chat/completions": _chat_completions,
+        "/reset_prefix_cache": _reset_prefix_cache,
+        "/api/v0/embedding/doc": _embedding,
+        "/api/v0/llm/rag": _rag,
+        "/api/v0/knowledgeset/prompt": _build_prompt,
+        "/api/v0/prompt/create": _create_prompt,
+    }
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.prefix_cache = PrefixCache(config.block_size, config.cache_blocks)
+        self.prompts: Dict[str, Dict[str, Any]] = {}
+        self.rng = random.Random(0)
+        self._slots = (
+            threading.BoundedSemaphore(config.max_concurrent_requests)
+            if config.max_concurrent_requests else None
+        )
+
+    @contextlib.contextmanager
+    def generation_slot(self) -> Iterator[None]:
+        """
+        Hold one of the ``max_concurrent_requests`` generation slots.
+        """
+        if self._slots is None:
+            yield
+            return
+        with self._slots:
+            yield
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_in_background(
+    config: MockConfig | None = None, host: str = "127.0.0.1", port: int = 0
+) -> MockServer:
+    """
+    Start a mock server in a daemon thread, ``port=0`` picks a free port.
+    Call ``server.shutdown()`` to stop it.
+    """
+    server = MockServer((host, port), config or MockConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--model-name", default=MockConfig.model_name)
+    parser.add_argument(
+        "--prefill-ms-per-token", type=float,
+        default=MockConfig.prefill_ms_per_token
+    )
+    parser.add_argument(
+        "--cached-prefill-ms-per-token", type=float,
+        default=MockConfig.cached_prefill_ms_per_token
+    )
+    parser.add_argument(
+        "--decode-tokens-per-s", type=float,
+        default=MockConfig.decode_tokens_per_s
+    )
+    parser.add_argument(
+        "--completion-tokens", type=int, default=MockConfig.completion_tokens
+    )
+    parser.add_argument(
+        "--no-prefix-caching", action="store_true",
+        help="Disable the simulated prefix cache."
+    )
+    parser.add_argument(
+        "--request-latency-ms", type=float,
+        default=MockConfig.request_latency_ms
+    )
+    parser.add_argument(
+        "--max-concurrent-requests", type=int,
+        default=MockConfig.max_concurrent_requests,
+        help="Generation requests served at once, 0 for no limit."
+    )
+    parser.add_argument(
+        "--embedding-dim", type=int, default=MockConfig.embedding_dim
+    )
+    parser.add_argument(
+        "--embedding-ms-per-document", type=float,
+        default=MockConfig.embedding_ms_per_document
+    )
+    parser.add_argument(
+        "--structured-yes-ratio", type=float,
+        default=MockConfig.structured_yes_ratio
+    )
+    args = parser.parse_args()
+
+    config = MockConfig(
+        model_name=args.model_name,
+        prefill_ms_per_token=args.prefill_ms_per_token,
+        cached_prefill_ms_per_token=args.cached_prefill_ms_per_token,
+        decode_tokens_per_s=args.decode_tokens_per_s,
+        completion_tokens=args.completion_tokens,
+        enable_prefix_caching=not args.no_prefix_caching,
+        request_latency_ms=args.request_latency_ms,
+        max_concurrent_requests=args.max_concurrent_requests,
+        embedding_dim=args.embedding_dim,
+        embedding_ms_per_document=args.embedding_ms_per_document,
+        structured_yes_ratio=args.structured_yes_ratio,
+    )
+    server = MockServer((args.host, args.port), config)
+    logging.info("Mock server listening on %s", server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,34 +1,46 @@
-from ast import literal_eval
+"""
+Create an index and load the chunks of an exported knowledge base.
+
+The input is the chunk CSV or a Parquet/Arrow export. Embeddings stored in
+the export are reused when they come from the same embedding model, so the
+chunks are not embedded again.
+
+    $ python -m scripts.rebuild_index_with_csv llm_v2.csv --db-name llm_demokit_v2
+"""
+import argparse
+import logging
+import os
+import uuid
 from typing import Dict, List, cast
-import pandas as pd
 
-from urllib.parse import urlparse
+import numpy as np
+
+from utils.data.export_data import read_chunks
 from utils.opensearch_client import OpenSearchClient
 from utils.send_requests import send_post_request
 
 
-API_BASE_URL = ""
-LLM_BASE_URL = ""
-OPENSEARCH_URL = ""
-parsed_url = urlparse(OPENSEARCH_URL)
-
-opensearch = OpenSearchClient(
-    str(parsed_url.hostname), int(cast(str, parsed_url.port))
-)
+def chunks_to_embedding(
+    chunks: List[Dict], embedding_url: str, batch_size: int = 64
+) -> List[Dict]:
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        data = {"documents": [chunk["Text"] for chunk in batch]}
+        response = cast(Dict, send_post_request(embedding_url, data))
+        for chunk, embedding in zip(batch, response["embeddings"]):
+            chunk["embedding"] = embedding
+    return chunks
 
 
-def chunks_to_embedding(df: pd.DataFrame) -> List[Dict]:
-    df['Metadata'] = df['Metadata'].apply(literal_eval)
-    chunks = df.to_dict("records")
-    url = f"{LLM_BASE_URL}/api/v0/embedding/doc"
-    data = {"documents": [chunk["Text"] for chunk in chunks]}
-    response = cast(Dict, send_post_request(url, data))
-    for chunk, embedding in zip(chunks, response["embeddings"]):
-        chunk["embedding"] = embedding
+def attach_embeddings(chunks: List[Dict], embeddings: np.ndarray):
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk["embedding"] = embedding.tolist()
     return chunks
 
 
-def save_chunk_to_db(chunks: List[Dict], index: str):
+def save_chunk_to_db(
+    opensearch: OpenSearchClient, chunks: List[Dict], index: str
+):
     documents = []
     for chunk in chunks:
         document = {
@@ -42,45 +54,115 @@ def save_chunk_to_db(chunks: List[Dict], index: str):
 
 
 def data_process(
-    df: pd.DataFrame,
-    index: str
+    opensearch: OpenSearchClient,
+    chunks: List[Dict],
+    index: str,
+    embedding_url: str,
+    batch_size: int = 64,
 ):
-    list_of_chunks = chunks_to_embedding(df)
-    save_chunk_to_db(list_of_chunks, index)
+    list_of_chunks = chunks_to_embedding(chunks, embedding_url, batch_size)
+    save_chunk_to_db(opensearch, list_of_chunks, index)
 
 
 def create_index(
+    opensearch: OpenSearchClient,
     index: str,
     db_name: str,
     embedding_model: str,
     chunk_size: int,
     overlap: int,
+    embedding_url: str,
+    dim: int | None = None,
 ):
-    url = f"{LLM_BASE_URL}/api/v0/embedding/doc"
-    data = {"documents": ["test"]}
-    response = cast(Dict, send_post_request(url, data))
-    dim = len(response["embeddings"][0])
+    if dim is None:
+        data = {"documents": ["test"]}
+        response = cast(Dict, send_post_request(embedding_url, data))
+        dim = len(response["embeddings"][0])
     opensearch.create_index(
         index, db_name, embedding_model, chunk_size, overlap, dim
     )
 
 
 def main():
-    db_name = "llm_demokit_v2"
-    index = "1139c161-22d4-4ef1-96ec-94c09055daec"
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "chunks", help="Chunk CSV, Parquet or Arrow file from the export."
+    )
+    parser.add_argument("--db-name", required=True)
+    parser.add_argument(
+        "--index", default="",
+        help="Index to create, a new UUID is used when omitted."
+    )
+    parser.add_argument(
+        "--opensearch-url", default=os.getenv("VECTORDB_HOST", "")
+    )
+    parser.add_argument(
+        "--embedding-url", default=os.getenv("EMBEDDING_HOST", ""),
+        help="Embedding endpoint, e.g. http://llm:8001/api/v0/embedding/doc"
+    )
+    parser.add_argument(
+        "--embedding-model", default=os.getenv("EMBEDDING_MODEL", ""),
+        help="Defaults to the model recorded in the export, then "
+        "MULTILINGUAL-E5."
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=None,
+        help="Defaults to the export _meta, then 600."
+    )
+    parser.add_argument(
+        "--overlap", type=int, default=None,
+        help="Defaults to the export _meta, then 180."
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--reembed", action="store_true",
+        help="Embed the chunks even when the export has embeddings."
+    )
+    args = parser.parse_args()
+
+    if not args.opensearch_url or not args.embedding_url:
+        parser.error("--opensearch-url and --embedding-url are required")
+    index = args.index or str(uuid.uuid4())
+    opensearch = OpenSearchClient.from_url(args.opensearch_url)
+
+    chunks, embeddings, index_meta = read_chunks(args.chunks)
+    exported_model = index_meta.get("embedding_model")
+    embedding_model = (
+        args.embedding_model or exported_model or "MULTILINGUAL-E5"
+    )
+    if embeddings is not None and not args.reembed:
+        if exported_model and exported_model != embedding_model:
+            logging.warning(
+                "Embeddings were made with %s, embedding again with %s",
+                exported_model, embedding_model
+            )
+            embeddings = None
+    else:
+        embeddings = None
 
     create_index(
+        opensearch,
         index,
-        db_name,
-        "MULTILINGUAL-E5",
-        600,
-        180,
+        args.db_name,
+        embedding_model,
+        args.chunk_size or index_meta.get("chunk_size", 600),
+        args.overlap if args.overlap is not None
+        else index_meta.get("overlap", 180),
+        args.embedding_url,
+        dim=None if embeddings is None else embeddings.shape[1],
     )
 
-    df = pd.read_csv("llm_v2.csv")
-    chunks = chunks_to_embedding(df)
-    save_chunk_to_db(chunks, index)
+    if embeddings is None:
+        data_process(
+            opensearch, chunks, index, args.embedding_url, args.batch_size
+        )
+    else:
+        save_chunk_to_db(
+            opensearch, attach_embeddings(chunks, embeddings), index
+        )
+    logging.info("Loaded %d chunks into %s", len(chunks), index)
+
 
-    
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
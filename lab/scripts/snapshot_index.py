@@ -0,0 +1,72 @@
+"""
+Snapshot an index to disk or restore it, vectors included.
+
+Moving a knowledge base between clusters this way needs no embedding calls.
+
+    $ python -m scripts.snapshot_index snapshot <index> snapshots/kb
+    $ python -m scripts.snapshot_index restore snapshots/kb \
+          --opensearch-url http://new:9200
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+from utils.opensearch_client import OpenSearchClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    # 放在子命令的參數中，才能寫在子命令之後，例如 restore <dir> --opensearch-url
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--opensearch-url", default=os.getenv("VECTORDB_HOST", "")
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", parents=[common])
+    snapshot.add_argument("index")
+    snapshot.add_argument("directory")
+    snapshot.add_argument("--batch-size", type=int, default=1000)
+
+    restore = commands.add_parser("restore", parents=[common])
+    restore.add_argument("directory")
+    restore.add_argument(
+        "--index", default=None, help="Defaults to the snapshot index name."
+    )
+    restore.add_argument(
+        "--db-name", default=None,
+        help="Rename the knowledge base, required next to the original."
+    )
+    restore.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if not args.opensearch_url:
+        parser.error("--opensearch-url is required")
+    opensearch = OpenSearchClient.from_url(args.opensearch_url)
+
+    start = time.perf_counter()
+    if args.command == "snapshot":
+        manifest = opensearch.snapshot(
+            args.index, args.directory, args.batch_size
+        )
+    else:
+        manifest = opensearch.restore(
+            args.directory, args.index, args.db_name, args.batch_size
+        )
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "command": args.command,
+        "index": args.index or manifest["index"],
+        "count": manifest["count"],
+        "dim": manifest["dim"],
+        "seconds": seconds,
+        "documents_per_second": manifest["count"] / seconds
+        if seconds else 0,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,393 @@
+"""
+Tune the HNSW parameters of an index against a recall@k target.
+
+``get_mapping`` builds every index with ``m=16``, ``ef_construction=512`` and
+``ef_search=512``, far more search effort than a small knowledge base needs.
+This command samples queries, computes their exact top-k with a brute-force
+numpy search over the vectors of the index, and measures recall@k and latency
+for each ``ef_search``. The sweep runs on a temporary copy of the index (no
+embedding calls), so live searches keep their ``ef_search``. With
+``--m``/``--ef-construction`` it also sweeps copies built with those values.
+
+The recommendation is the smallest ``ef_search`` whose recall meets
+``--target-recall`` for each build, the fastest of those by p50 latency.
+``--apply`` sets its ``ef_search`` on the index and records the result under
+``hnsw`` in ``_meta``; an ``m``/``ef_construction`` other than the current
+ones is only applied with ``--rebuild``, which builds
+``<index>-m<m>-efc<ef_construction>`` and swaps an alias named ``<index>``
+to it in one step, so searches never see the index missing.
+
+Queries are stored vectors sampled from the index unless ``--questions`` (a
+CSV with a ``問題`` column) is given, which are embedded with
+``EMBEDDING_HOST``. A sampled vector is held out of its own top-k, in the
+ground truth and in the search hits, as it would otherwise always be found
+first and inflate the recall.
+
+    $ python -m scripts.tune_hnsw <index> --target-recall 0.95
+    $ python -m scripts.tune_hnsw <index> --m 8 16 --ef-construction 128 512 \
+          --apply
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from utils.benchmark import summarize
+from utils.opensearch_client import OpenSearchClient
+
+DEFAULT_EF_SEARCH = [16, 32, 48, 64, 96, 128, 192, 256, 384, 512]
+
+
+def load_vectors(
+    opensearch: OpenSearchClient, index: str, dim: int, batch_size: int
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Ids and vectors of every document of the index.
+    """
+    ids, vectors = [], []
+    for hit in opensearch.scan(index, batch_size):
+        vector = hit["_source"].get("vector_field")
+        if vector is None or len(vector) != dim:
+            continue
+        ids.append(hit["_id"])
+        vectors.append(vector)
+    return ids, np.asarray(vectors, dtype=np.float32).reshape(-1, dim)
+
+
+def ground_truth(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    space_type: str,
+    k: int,
+    batch_size: int = 64,
+) -> np.ndarray:
+    """
+    Rows of the exact top-k of each query for the ``space_type`` of the
+    index, the queries are scored in batches to bound memory.
+    """
+    if space_type == "cosinesimil":
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(query_norms == 0, 1, query_norms)
+    elif space_type not in ("l2", "innerproduct"):
+        raise ValueError(f"Unsupported space type: {space_type}")
+    squared_norms = (vectors ** 2).sum(axis=1)
+
+    k = min(k, len(vectors))
+    truth = []
+    for i in range(0, len(queries), batch_size):
+        scores = queries[i:i + batch_size] @ vectors.T
+        if space_type == "l2":
+            # |q - x|^2 = |q|^2 - 2 q·x + |x|^2，|q|^2 不影響排序
+            scores = 2 * scores - squared_norms
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(
+            -np.take_along_axis(scores, top, axis=1), axis=1
+        )
+        truth.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(truth)
+
+
+def _knn_query(vector: np.ndarray, k: int) -> Dict[str, Any]:
+    return {
+        "size": k,
+        "_source": False,
+        "query": {
+            "knn": {"vector_field": {"vector": vector.tolist(), "k": k}}
+        },
+    }
+
+
+def graph_memory_bytes(count: int, dim: int, m: int) -> int:
+    """
+    Native memory of the HNSW graphs, the estimate of the k-NN plugin
+    documentation: ``1.1 * (4 * dim + 8 * m)`` bytes per vector.
+    """
+    return int(1.1 * (4 * dim + 8 * m) * count)
+
+
+def sweep_ef_search(
+    opensearch: OpenSearchClient,
+    index: str,
+    queries: np.ndarray,
+    truth: List[set],
+    k: int,
+    ef_searches: List[int],
+    held_out: List[str] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Recall@k and latency of each ``ef_search``.
+
+    :param held_out: Id of the stored document each query was sampled from,
+    one more hit is requested and that document is dropped from the hits.
+    """
+    size = k + 1 if held_out else k
+    runs = []
+    for ef_search in ef_searches:
+        opensearch.set_ef_search(index, ef_search)
+        # 第一次查詢會把 graph 載入記憶體，不計入延遲
+        opensearch.search(index, _knn_query(queries[0], size))
+        latencies, recalls = [], []
+        for i, (query, expected) in enumerate(zip(queries, truth)):
+            start = time.perf_counter()
+            response = opensearch.search(index, _knn_query(query, size))
+            latencies.append(time.perf_counter() - start)
+            found = [
+                hit["_id"] for hit in response["hits"]["hits"]
+                if not held_out or hit["_id"] != held_out[i]
+            ][:k]
+            recalls.append(len(set(found) & expected) / len(expected))
+        runs.append({
+            "ef_search": ef_search,
+            "recall": float(np.mean(recalls)),
+            "search_seconds": summarize(latencies),
+        })
+        logging.info(
+            "%s ef_search=%d: p50 %.4fs, recall@%d %.3f",
+            index, ef_search, runs[-1]["search_seconds"]["p50"], k,
+            runs[-1]["recall"]
+        )
+    return runs
+
+
+def recommend(
+    candidates: List[Dict[str, Any]], target_recall: float
+) -> Dict[str, Any] | None:
+    """
+    Cheapest candidate meeting the target: the smallest passing
+    ``ef_search`` of each build, then the fastest of those by p50 latency,
+    the smaller graph breaking ties.
+    """
+    cheapest: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for candidate in candidates:
+        if candidate["recall"] < target_recall:
+            continue
+        build = (candidate["m"], candidate["ef_construction"])
+        if (
+            build not in cheapest
+            or candidate["ef_search"] < cheapest[build]["ef_search"]
+        ):
+            cheapest[build] = candidate
+    if not cheapest:
+        return None
+    return min(cheapest.values(), key=lambda candidate: (
+        candidate["search_seconds"]["p50"],
+        candidate["graph_memory_bytes"],
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("index")
+    parser.add_argument(
+        "--opensearch-url", default=os.getenv("VECTORDB_HOST", "")
+    )
+    parser.add_argument(
+        "--k", type=int, default=4,
+        help="Recall is measured on the top k, the retriever default is 4."
+    )
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--questions", default=None,
+        help="CSV of questions to embed instead of sampling stored vectors."
+    )
+    parser.add_argument(
+        "--embedding-url", default=os.getenv("EMBEDDING_HOST", "")
+    )
+    parser.add_argument(
+        "--ef-search", type=int, nargs="+", default=DEFAULT_EF_SEARCH
+    )
+    parser.add_argument(
+        "--m", type=int, nargs="+", default=None,
+        help="Also try these m on temporary copies of the index."
+    )
+    parser.add_argument(
+        "--ef-construction", type=int, nargs="+", default=None,
+        help="Also try these ef_construction on temporary copies."
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--apply", action="store_true",
+        help="Set the recommended ef_search and record it in _meta."
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true",
+        help="With --apply, rebuild the index when the recommended m or "
+        "ef_construction differ from the current ones, the old name becomes "
+        "an alias of the rebuilt index."
+    )
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if not args.opensearch_url:
+        parser.error("--opensearch-url is required")
+    opensearch = OpenSearchClient.from_url(args.opensearch_url)
+    current = opensearch.get_knn_params(args.index)
+    dim = current["dim"]
+
+    start = time.perf_counter()
+    ids, vectors = load_vectors(opensearch, args.index, dim, args.batch_size)
+    if not ids:
+        raise ValueError(f"Index '{args.index}' has no vectors.")
+    logging.info(
+        "Loaded %d vectors of %s in %.1fs",
+        len(ids), args.index, time.perf_counter() - start
+    )
+
+    rng = random.Random(args.seed)
+    held_out = None
+    if args.questions:
+        from scripts.load_test import load_questions
+        from utils.client.embedding import EmbeddingClient
+
+        if not args.embedding_url:
+            parser.error("--embedding-url is required with --questions")
+        questions = load_questions(args.questions)
+        questions = rng.sample(questions, min(args.queries, len(questions)))
+        queries = np.asarray(
+            EmbeddingClient(args.embedding_url).embed_documents(questions),
+            dtype=np.float32,
+        )
+        top_k = ground_truth(vectors, queries, current["space_type"], args.k)
+        truth = [{ids[row] for row in top} for top in top_k]
+    else:
+        if len(ids) <= args.k:
+            raise ValueError(
+                f"Index '{args.index}' needs more than {args.k} vectors."
+            )
+        rows = rng.sample(range(len(ids)), min(args.queries, len(ids)))
+        queries = vectors[rows]
+        held_out = [ids[row] for row in rows]
+        # 查詢向量本身一定排第一，多取一筆再排除自己
+        top_k = ground_truth(
+            vectors, queries, current["space_type"], args.k + 1
+        )
+        truth = [
+            {ids[row] for row in top if row != query_row}
+            if query_row in top else {ids[row] for row in top[:args.k]}
+            for query_row, top in zip(rows, top_k)
+        ]
+    del vectors
+
+    ef_searches = sorted(set(args.ef_search))
+    builds = [(current["m"], current["ef_construction"])]
+    for build in itertools.product(
+        args.m or [current["m"]],
+        args.ef_construction or [current["ef_construction"]],
+    ):
+        if build not in builds:
+            builds.append(build)
+
+    candidates = []
+    for m, ef_construction in builds:
+        # 目前的設定也在複本上掃描，調整 ef_search 不影響線上的查詢
+        index = f"{args.index}-tune-m{m}-efc{ef_construction}"
+        start = time.perf_counter()
+        opensearch.copy_index(
+            args.index, index, m, ef_construction, keep_meta=False
+        )
+        build_seconds = time.perf_counter() - start
+        try:
+            for run in sweep_ef_search(
+                opensearch, index, queries, truth, args.k, ef_searches,
+                held_out,
+            ):
+                candidates.append({
+                    "m": m,
+                    "ef_construction": ef_construction,
+                    "build_seconds": build_seconds,
+                    "graph_memory_bytes": graph_memory_bytes(
+                        len(ids), dim, m
+                    ),
+                    **run,
+                })
+        finally:
+            opensearch.delete_index(index)
+
+    best = recommend(candidates, args.target_recall)
+    report = {
+        "index": args.index,
+        "documents": len(ids),
+        "queries": len(queries),
+        "k": args.k,
+        "target_recall": args.target_recall,
+        "current": current,
+        "candidates": candidates,
+        "recommended": best,
+        "applied": False,
+    }
+
+    if best is None:
+        logging.warning(
+            "No setting reaches recall@%d %.3f, try larger --ef-search, "
+            "--m or --ef-construction", args.k, args.target_recall
+        )
+    elif args.apply:
+        needs_rebuild = (best["m"], best["ef_construction"]) != builds[0]
+        applied = best
+        if needs_rebuild and not args.rebuild:
+            # 不重建時改用目前 graph 下達標的設定
+            applied = recommend(
+                [c for c in candidates if (
+                    c["m"], c["ef_construction"]
+                ) == builds[0]],
+                args.target_recall,
+            )
+            logging.warning(
+                "Recommended m=%d ef_construction=%d needs --rebuild",
+                best["m"], best["ef_construction"]
+            )
+        elif needs_rebuild:
+            logging.info(
+                "Rebuilding %s with m=%d ef_construction=%d",
+                args.index, best["m"], best["ef_construction"]
+            )
+            rebuilt = opensearch.rebuild_index(
+                args.index, best["m"], best["ef_construction"]
+            )
+            logging.info("%s now points to %s", args.index, rebuilt)
+        if applied is not None:
+            opensearch.set_ef_search(args.index, applied["ef_search"])
+            hnsw = {
+                "m": applied["m"],
+                "ef_construction": applied["ef_construction"],
+                "ef_search": applied["ef_search"],
+                "k": args.k,
+                "recall": applied["recall"],
+                "target_recall": args.target_recall,
+                "p50_seconds": applied["search_seconds"]["p50"],
+                "queries": len(queries),
+                "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            }
+            if applied is not best:
+                hnsw["recommended"] = {
+                    "m": best["m"],
+                    "ef_construction": best["ef_construction"],
+                    "ef_search": best["ef_search"],
+                }
+            opensearch.update_meta(args.index, hnsw=hnsw)
+            report["applied"] = hnsw
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps({
+        key: report[key] for key in (
+            "index", "documents", "k", "target_recall", "current",
+            "recommended", "applied",
+        )
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -8,6 +8,57 @@ inference_action_config = {
     "llm_api_path": os.getenv(
         "RAG_API", "http://localhost:8001/api/v0/llm/rag"
     ),
+    # 串流回覆，需 LLM API 支援 SSE 或 chunked 輸出
+    "stream": os.getenv("RAG_API_STREAM", "false").lower() == "true",
+    "timeout": int(os.getenv("RAG_API_TIMEOUT", "600")),
+}
+
+# 參數掃描：一次送出多組參數與 prompt 的推論請求並排比較
+sweep_action_config = {
+    "label": "執行參數掃描",
+    "button_type": "primary",
+    "llm_api_path": os.getenv(
+        "RAG_API", "http://localhost:8001/api/v0/llm/rag"
+    ),
+    # 同時送出的請求數上限，避免壓垮 LLM API
+    "max_workers": int(os.getenv("RAG_API_SWEEP_CONCURRENCY", "4")),
+    "max_runs": int(os.getenv("RAG_API_SWEEP_MAX_RUNS", "64")),
+    "timeout": int(os.getenv("RAG_API_TIMEOUT", "600")),
+}
+
+# 批次評估：以問題集 (問題, 答案) 產生每一筆的回覆
+batch_evaluation_action_config = {
+    "label": "執行批次評估",
+    "button_type": "primary",
+    "llm_api_path": os.getenv(
+        "RAG_API", "http://localhost:8001/api/v0/llm/rag"
+    ),
+    "max_workers": int(os.getenv("RAG_API_BATCH_CONCURRENCY", "4")),
+    "max_rows": int(os.getenv("RAG_API_BATCH_MAX_ROWS", "500")),
+    "timeout": int(os.getenv("RAG_API_TIMEOUT", "600")),
+}
+
+batch_file_uploader_config = {
+    "label": "上傳問題集 CSV",
+    "type": ["csv"],
+}
+
+batch_results_template_config = {
+    "download_label": "下載評估結果",
+    "file_name": "batch_results.csv",
+}
+
+# 參數掃描結果模板
+sweep_results_template_config = {
+    "columns": 3,
+}
+
+# 參數掃描模式下的 prompt 變體數上限
+sweep_prompt_variants_config = {
+    "label": "Prompt 變體數",
+    "min_value": 1,
+    "max_value": 5,
+    "value": 1,
 }
 
 # 模型參數說明模板
@@ -125,6 +176,9 @@ build_prompt_action_config = {
     "build_prompt_api": os.getenv(
         "BUILD_PROMPT_API", "http://localhost:8001/api/v0/knowledgeset/prompt"
     ),
+    # local: 在本機組 prompt；remote: 呼叫 BUILD_PROMPT_API；
+    # validate: 兩者都做，不一致時記錄警告並以 API 結果為準
+    "mode": os.getenv("BUILD_PROMPT_MODE", "local"),
 }
 
 save_prompt_action_config = {
@@ -1,3 +1,4 @@
+import os
 
 prompt_placeholder = {
     "詢問問題": '{HISTORY_QUESTION}', 
@@ -9,3 +10,98 @@ prompt_placeholder = {
     '使用者歷史prompt': '{USER_HISTORY_PROMPT}', 
     '與知識庫無關時使用者設定的回應': '{USER_IRRELEVANT_RESPONSE}'
 }
+
+
+# RAG 相關的 prompt，以版本管理，可透過環境變數 RAG_PROMPT_VERSION 切換。
+# v1: 原始排列，問題在檢索內容之前、grader 的文件在問題之前。
+# v2: 固定的指示放在 system message，檢索內容放在問題之前，並依來源排序
+#     (rag_context_order)，相同的文件組合不論檢索分數的順序都組出相同的
+#     context，讓 vLLM 的 automatic prefix caching 重複使用整段 context 的
+#     KV cache。grader 維持文件在問題之前：熱門的 chunk 會被不同問題反覆檢索，
+#     system + 文件 的長前綴比 system + 問題 更常命中快取。
+RAG_PROMPT_VERSION = os.getenv("RAG_PROMPT_VERSION", "v2")
+
+_generate_instructions = (
+    "You are an assistant for question-answering tasks. Use the following "
+    "pieces of retrieved context to answer the question. If you don't know "
+    "the answer, just say that you don't know. Use three sentences maximum "
+    "and keep the answer concise."
+)
+
+_grade_instructions = """You are a grader assessing relevance of a retrieved document to a user question. \n 
+    If the document contains keyword(s) or semantic meaning related to the question, grade it as relevant. \n
+    Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question."""
+
+_rewrite_instructions = """You a question re-writer that converts an input question to a better version that is optimized \n 
+     for retrival. Look at the input and try to reason about the underlying semantic intent / meaning."""
+
+rag_prompts = {
+    "v1": {
+        "generate": [
+            (
+                "human",
+                _generate_instructions + "\n"
+                "Question: {question} \n"
+                "Context: {context} \n"
+                "Answer:"
+            ),
+        ],
+        "grade": [
+            ("system", _grade_instructions),
+            (
+                "human",
+                "Retrieved document: \n\n {document} \n\n "
+                "User question: {question}"
+            ),
+        ],
+        "rewrite": [
+            ("system", _rewrite_instructions),
+            (
+                "human",
+                "Here is the initial question: \n\n {question} \n "
+                "Formulate an improved question.",
+            ),
+        ],
+    },
+    "v2": {
+        "generate": [
+            ("system", _generate_instructions),
+            (
+                "human",
+                "Context: {context} \n\n"
+                "Question: {question} \n"
+                "Answer:"
+            ),
+        ],
+        "grade": [
+            ("system", _grade_instructions),
+            (
+                "human",
+                "Retrieved document: \n\n {document} \n\n "
+                "User question: {question}"
+            ),
+        ],
+        "rewrite": [
+            ("system", _rewrite_instructions),
+            (
+                "human",
+                "Here is the initial question: \n\n {question} \n "
+                "Formulate an improved question.",
+            ),
+        ],
+    },
+}
+
+
+# 檢索結果放進 generate context 的順序，retrieval: 依檢索分數，source: 依來源
+rag_context_order = {"v1": "retrieval", "v2": "source"}
+
+
+def get_rag_prompt(name: str, version: str | None = None):
+    """
+    Return the message list of a RAG prompt, e.g. ``get_rag_prompt("grade")``.
+    """
+    version = version or RAG_PROMPT_VERSION
+    if version not in rag_prompts:
+        raise ValueError(f"Unknown RAG prompt version: {version}")
+    return rag_prompts[version][name]
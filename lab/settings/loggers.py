@@ -1,15 +1,179 @@
 import functools
+import json
 import logging
+import os
+import random
+import reprlib
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List
 
+# 取樣比例與 payload 長度上限，可由環境變數調整
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_MAX_PAYLOAD = int(os.getenv("TRACE_MAX_PAYLOAD", "512"))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
 
-def log_io(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        logging.info(
-            "Calling %s with args: %s, kwargs: %s", 
-            func.__name__, args, kwargs
+trace_logger = logging.getLogger("trace")
+
+_repr = reprlib.Repr()
+_repr.maxstring = TRACE_MAX_PAYLOAD
+_repr.maxother = TRACE_MAX_PAYLOAD
+_repr.maxlist = _repr.maxtuple = _repr.maxdict = 10
+
+
+def truncate(obj: Any, max_length: int = TRACE_MAX_PAYLOAD) -> str:
+    text = _repr.repr(obj)
+    if len(text) > max_length:
+        return f"{text[:max_length]}...<{len(text) - max_length} more>"
+    return text
+
+
+class _LazyRepr:
+    """
+    Defer building the truncated repr until a log record is emitted.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return truncate(self.obj)
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    start_time: float
+    duration: float
+    status: str
+    args: str = ""
+    result: str = ""
+    error: str = ""
+
+
+class SpanExporter(ABC):
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+
+class JsonlSpanExporter(SpanExporter):
+    """
+    Append spans as JSON lines to a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(asdict(span), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+_exporters: List[SpanExporter] = []
+if TRACE_EXPORT_PATH:
+    _exporters.append(JsonlSpanExporter(TRACE_EXPORT_PATH))
+
+
+def add_span_exporter(exporter: SpanExporter) -> None:
+    _exporters.append(exporter)
+
+
+def traced_call(
+    name: str,
+    func: Callable,
+    args: tuple = (),
+    kwargs: Dict[str, Any] | None = None,
+    sample_rate: float | None = None,
+    level: int = logging.DEBUG,
+) -> Any:
+    """
+    Call ``func`` and, for a sampled fraction of calls, log its truncated
+    inputs, output and duration at ``level`` and export it as a span.
+
+    Nothing is formatted unless the log level is enabled or an exporter is
+    registered, so tracing is close to free on the hot path.
+    """
+    kwargs = kwargs or {}
+    log_enabled = trace_logger.isEnabledFor(level)
+    if not (log_enabled or _exporters):
+        return func(*args, **kwargs)
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return func(*args, **kwargs)
+
+    span_id = uuid.uuid4().hex[:16]
+    if log_enabled:
+        trace_logger.log(
+            level, "[%s] Calling %s with args: %s, kwargs: %s",
+            span_id, name, _LazyRepr(args), _LazyRepr(kwargs)
         )
+    start_time = time.time()
+    start = time.perf_counter()
+    status, result, error = "ok", None, ""
+    try:
         result = func(*args, **kwargs)
-        logging.info("%s returned %s", func.__name__, result)
         return result
-    return wrapper
\ No newline at end of file
+    except Exception as exc:
+        status, error = "error", truncate(exc)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if log_enabled:
+            trace_logger.log(
+                level, "[%s] %s returned %s in %.3fs (%s)",
+                span_id, name, _LazyRepr(result), duration, status
+            )
+        if _exporters:
+            span = Span(
+                name=name,
+                span_id=span_id,
+                start_time=start_time,
+                duration=duration,
+                status=status,
+                args=truncate({"args": args, "kwargs": kwargs}),
+                result=truncate(result),
+                error=error,
+            )
+            for exporter in _exporters:
+                try:
+                    exporter.export(span)
+                except Exception as exc:
+                    logging.warning("Failed to export span: %s", exc)
+
+
+def trace_io(
+    func: Callable | None = None,
+    *,
+    sample_rate: float | None = None,
+    level: int = logging.DEBUG,
+):
+    """
+    Decorator form of ``traced_call``, usable as ``@trace_io`` or
+    ``@trace_io(sample_rate=0.1)``.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return traced_call(
+                func.__qualname__, func, args, kwargs,
+                sample_rate=sample_rate, level=level
+            )
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+# 舊名稱保留給既有的呼叫端
+log_io = trace_io
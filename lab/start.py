@@ -1,6 +1,8 @@
 import logging
+import os
 import sys
 import streamlit as st
+from utils.metrics import start_metrics_server
 
 
 logging.basicConfig(
@@ -9,6 +11,9 @@ logging.basicConfig(
     datefmt="%d/%b/%Y %H:%M:%S",
     stream=sys.stdout)
 
+if os.getenv("METRICS_PORT"):
+    start_metrics_server(int(os.getenv("METRICS_PORT", "")))
+
 
 pages = {
     "Prompt": [
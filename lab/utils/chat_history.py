@@ -0,0 +1,153 @@
+import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+Message = Dict[str, str]
+
+_CJK_PATTERN = re.compile(
+    r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]"
+)
+
+# 單一背景 worker，摘要依序產生，避免同一個 session 同時送出多個摘要請求
+_summary_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="history-summary"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate without a tokenizer: one token per CJK character
+    and about four characters per token for everything else.
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ChatHistoryManager:
+    """
+    Keep the prompt sent to the LLM within a token budget.
+
+    The message list sent to the model is laid out as::
+
+        [system prompt] [summary of older turns + recent turns ...]
+
+    The system prompt is never modified, so its bytes stay identical across
+    requests and vLLM prefix caching keeps hitting it. Recent turns are only
+    appended to; when they exceed ``max_history_tokens`` the oldest turns are
+    folded into the summary in the background, in one batch, until the window
+    is back under ``low_watermark`` of the budget. Between two compactions the
+    whole prompt therefore grows append-only as well.
+    """
+
+    def __init__(
+        self,
+        system_message: Message,
+        summarize_fn: Callable[[str, List[Message]], str],
+        max_history_tokens: int = 4000,
+        low_watermark: float = 0.5,
+        min_recent_messages: int = 2,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        :param system_message: The system message, sent first on every turn.
+        :param summarize_fn: Called as ``summarize_fn(summary, messages)`` in
+        a background thread, returns the new summary covering both.
+        :param max_history_tokens: Token budget for summary and recent turns,
+        at least half of it is always left to the recent turns.
+        :param low_watermark: Fraction of the budget the recent turns are
+        trimmed down to when a compaction is triggered.
+        :param min_recent_messages: Number of latest messages never summarized.
+        :param token_counter: Function used to estimate tokens of a text.
+        """
+        self.system_message = system_message
+        self.summarize_fn = summarize_fn
+        self.max_history_tokens = max_history_tokens
+        self.low_watermark = low_watermark
+        self.min_recent_messages = min_recent_messages
+        self.token_counter = token_counter
+
+        self.messages: List[Message] = []  # 完整對話紀錄，供畫面顯示
+        self.summary = ""
+        self._summarized_upto = 0  # messages[:_summarized_upto] 已併入摘要
+        self._pending: Future | None = None
+        self._pending_upto = 0
+
+    def append(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+        self._maybe_compact()
+
+    def build_messages(self) -> List[Message]:
+        """
+        Messages to send to the LLM for the next completion.
+        """
+        self._collect_summary()
+        recent = list(self.messages[self._summarized_upto:])
+        if self.summary:
+            # 摘要併入第一則使用者訊息，避免多個 system 訊息或角色順序不合
+            # chat template 的規則
+            summary = f"先前對話摘要：\n{self.summary}"
+            if recent and recent[0]["role"] == "user":
+                recent[0] = {
+                    "role": "user",
+                    "content": summary + "\n\n" + recent[0]["content"]
+                }
+            else:
+                recent.insert(0, {"role": "user", "content": summary})
+        return [self.system_message] + recent
+
+    def _tokens(self, messages: List[Message]) -> int:
+        return sum(self.token_counter(m["content"]) for m in messages)
+
+    def _collect_summary(self) -> None:
+        if self._pending is None or not self._pending.done():
+            return
+        future, upto = self._pending, self._pending_upto
+        self._pending = None
+        try:
+            self.summary = future.result()
+            self._summarized_upto = upto
+        except Exception as exc:
+            # 摘要失敗時保留原始訊息，下次超出上限時再重試
+            logging.warning("History summarization failed: %s", exc)
+
+    def _maybe_compact(self) -> None:
+        self._collect_summary()
+        if self._pending is not None:
+            return
+
+        recent = self.messages[self._summarized_upto:]
+        # 摘要接近上限時仍保留一半的預算給最近的對話，避免每一輪都重新摘要
+        budget = max(
+            self.max_history_tokens - self.token_counter(self.summary),
+            self.max_history_tokens // 2,
+        )
+        if self._tokens(recent) <= budget:
+            return
+
+        target = int(budget * self.low_watermark)
+        keep_from = len(self.messages) - self.min_recent_messages
+        upto = self._summarized_upto
+        remaining = self._tokens(recent)
+        while upto < keep_from and remaining > target:
+            remaining -= self.token_counter(self.messages[upto]["content"])
+            upto += 1
+        # 不要把一組 user/assistant 問答從中間切開，保留的訊息從 user 開始
+        while (
+            upto > self._summarized_upto
+            and upto < len(self.messages)
+            and self.messages[upto]["role"] != "user"
+        ):
+            upto -= 1
+
+        if upto <= self._summarized_upto:
+            return
+
+        to_summarize = list(self.messages[self._summarized_upto:upto])
+        logging.debug(
+            "Summarizing %d messages in background", len(to_summarize)
+        )
+        self._pending = _summary_executor.submit(
+            self.summarize_fn, self.summary, to_summarize
+        )
+        self._pending_upto = upto
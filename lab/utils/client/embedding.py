@@ -2,6 +2,7 @@ import logging
 import requests
 from typing import List
 from langchain_core.embeddings import Embeddings
+from utils.metrics import track_client
 
 
 class EmbeddingClient(Embeddings):
@@ -15,11 +16,12 @@ class EmbeddingClient(Embeddings):
     ) -> List[List[float]]:
 
         try:
-            response = requests.post(
-                self.embedding_api_path,
-                json={'documents': documents},
-                timeout=self.request_timeout
-            )
+            with track_client("embedding"):
+                response = requests.post(
+                    self.embedding_api_path,
+                    json={'documents': documents},
+                    timeout=self.request_timeout
+                )
             return response.json()['embeddings']
         
         except requests.exceptions.Timeout as timeout_exception:
@@ -0,0 +1,216 @@
+import codecs
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator
+
+import requests
+from utils.chat_history import estimate_tokens
+from utils.metrics import metrics_logger, registry
+
+# 非 chunked 串流每次最多讀取的 bytes
+STREAM_READ_SIZE = 512
+
+ttft_seconds = registry.histogram(
+    "lab_inference_ttft_seconds",
+    "Time to first token of streamed LLM API responses.",
+)
+tokens_per_second = registry.histogram(
+    "lab_inference_tokens_per_second",
+    "Decode speed of streamed LLM API responses.",
+    (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500),
+)
+
+
+class StreamMetrics:
+    """
+    Time to first token, duration and decode speed of one streamed response.
+    Tokens are taken from the ``usage`` of the last event when the server
+    sends it, otherwise estimated from the text.
+    """
+
+    def __init__(self, client: str = "llm_api"):
+        self.client = client
+        self._start = time.perf_counter()
+        self.first_token_seconds: float | None = None
+        self.total_seconds: float | None = None
+        self.chunks = 0
+        self.completion_tokens: int | None = None
+        self._text_length = 0
+        self._estimated_tokens = 0
+
+    def record_text(self, text: str) -> None:
+        if not text:
+            return
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self._start
+        self.chunks += 1
+        self._text_length += len(text)
+        self._estimated_tokens += estimate_tokens(text)
+
+    def record_usage(self, usage: Dict[str, Any]) -> None:
+        if usage.get("completion_tokens") is not None:
+            self.completion_tokens = int(usage["completion_tokens"])
+
+    @property
+    def tokens(self) -> int:
+        if self.completion_tokens is not None:
+            return self.completion_tokens
+        return self._estimated_tokens
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        # 解碼速度不含等待第一個 token 的時間
+        if self.total_seconds is None or self.first_token_seconds is None:
+            return None
+        decode_seconds = self.total_seconds - self.first_token_seconds
+        if decode_seconds <= 0:
+            return None
+        return self.tokens / decode_seconds
+
+    def finish(self) -> "StreamMetrics":
+        self.total_seconds = time.perf_counter() - self._start
+        if self.first_token_seconds is not None:
+            ttft_seconds.observe(self.first_token_seconds, client=self.client)
+        if self.tokens_per_second is not None:
+            tokens_per_second.observe(
+                self.tokens_per_second, client=self.client
+            )
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "client": self.client,
+            "ttft_seconds": self.first_token_seconds,
+            "total_seconds": self.total_seconds,
+            "tokens": self.tokens,
+            "tokens_estimated": self.completion_tokens is None,
+            "tokens_per_second": self.tokens_per_second,
+            "chunks": self.chunks,
+            "characters": self._text_length,
+        }
+
+    def log(self) -> None:
+        if metrics_logger.isEnabledFor(logging.INFO):
+            metrics_logger.info(json.dumps(self.to_dict(), ensure_ascii=False))
+
+
+def event_text(event: Any) -> str:
+    """
+    Text of one stream event, for the RAG API (``{"results": {"text"}}``),
+    OpenAI style chunks (``choices[0].delta.content``) and plain
+    ``text``/``token`` payloads.
+    """
+    if isinstance(event, str):
+        return event
+    if not isinstance(event, dict):
+        return ""
+    choices = event.get("choices")
+    if choices:
+        choice = choices[0]
+        delta = choice.get("delta") or {}
+        return delta.get("content") or choice.get("text") or ""
+    results = event.get("results")
+    if isinstance(results, dict):
+        return results.get("text") or ""
+    return event.get("text") or event.get("token") or ""
+
+
+def _parse_data(data: str) -> Any:
+    try:
+        return json.loads(data)
+    except ValueError:
+        return data
+
+
+def _iter_chunks(response: requests.Response) -> Iterator[bytes]:
+    raw = response.raw
+    if getattr(raw, "chunked", False) or not hasattr(raw, "read1"):
+        # chunked 回應每個 chunk 一到就交出來
+        yield from response.iter_content(chunk_size=None)
+        return
+    # 沒有 chunked 時 read(n) 會等滿 n bytes，read1 只回傳已到達的資料
+    while True:
+        chunk = raw.read1(STREAM_READ_SIZE, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_text(response: requests.Response) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(
+        errors="replace"
+    )
+    for chunk in _iter_chunks(response):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _iter_lines(response: requests.Response) -> Iterator[str]:
+    pending = ""
+    for text in _iter_text(response):
+        lines = (pending + text).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line[:-1] if line.endswith("\r") else line
+    if pending:
+        yield pending
+
+
+def iter_events(response: requests.Response) -> Iterator[Any]:
+    """
+    Decode a streamed response into events: Server-Sent Events, NDJSON, a
+    plain JSON body when the server does not stream, or raw text chunks.
+    Each piece is handed over as soon as it arrives, without waiting for a
+    buffer to fill.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if "charset" not in content_type:
+        # requests 對 text/* 預設 ISO-8859-1，SSE 規範為 UTF-8
+        response.encoding = "utf-8"
+    if "text/event-stream" in content_type:
+        data_lines = []
+        for line in _iter_lines(response):
+            if line.startswith("data:"):
+                data = line[5:]
+                data_lines.append(data[1:] if data.startswith(" ") else data)
+            elif not line and data_lines:
+                # 空行代表一個事件結束
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data.strip() == "[DONE]":
+                    return
+                yield _parse_data(data)
+        if data_lines and "\n".join(data_lines).strip() != "[DONE]":
+            yield _parse_data("\n".join(data_lines))
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        for line in _iter_lines(response):
+            if line:
+                yield _parse_data(line)
+    elif "application/json" in content_type:
+        yield response.json()
+    else:
+        yield from _iter_text(response)
+
+
+def iter_stream_text(
+    response: requests.Response, metrics: StreamMetrics | None = None
+) -> Iterator[str]:
+    """
+    Yield the text pieces of a streamed response, recording them in
+    ``metrics`` when given.
+    """
+    for event in iter_events(response):
+        if metrics is not None and isinstance(event, dict):
+            usage = event.get("usage")
+            if isinstance(usage, dict):
+                metrics.record_usage(usage)
+        text = event_text(event)
+        if text:
+            if metrics is not None:
+                metrics.record_text(text)
+            yield text
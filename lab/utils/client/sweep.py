@@ -0,0 +1,158 @@
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from utils.chat_history import estimate_tokens
+from utils.client.streaming import event_text
+from utils.metrics import registry
+
+SWEEP_PARAMS = ("top_p", "top_k", "temperature", "max_token")
+
+sweep_latency_seconds = registry.histogram(
+    "lab_sweep_request_seconds",
+    "Latency of LLM API requests issued by prompt sweeps.",
+)
+
+
+@dataclass
+class SweepRun:
+    """
+    One combination of prompt variant and generation parameters.
+    """
+    index: int
+    variant: int
+    prompt: str
+    params: Dict[str, Any]
+    text: str = ""
+    latency_seconds: float | None = None
+    tokens: int | None = None
+    tokens_estimated: bool = True
+    error: str | None = None
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if not self.tokens or not self.latency_seconds:
+            return None
+        return self.tokens / self.latency_seconds
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            "run": self.index + 1,
+            "variant": self.variant + 1,
+            **self.params,
+            "latency_s": None if self.latency_seconds is None
+            else round(self.latency_seconds, 3),
+            "tokens": self.tokens,
+            "tokens/s": None if self.tokens_per_second is None
+            else round(self.tokens_per_second, 1),
+            "response": self.text if self.error is None
+            else f"[error] {self.error}",
+        }
+
+
+def parse_values(
+    text: str, cast: Callable[[str], Any], separator: str = ","
+) -> List[Any]:
+    """
+    Parse a comma separated list of parameter values, e.g. ``"0.2, 0.5"``,
+    keeping the order and dropping repeated values.
+    """
+    values = []
+    for item in text.split(separator):
+        item = item.strip()
+        if not item:
+            continue
+        value = cast(item)
+        if value not in values:
+            values.append(value)
+    if not values:
+        raise ValueError(f"No values in {text!r}")
+    return values
+
+
+def expand_grid(
+    prompts: Sequence[str], grid: Dict[str, Sequence[Any]]
+) -> List[SweepRun]:
+    """
+    Cartesian product of the prompt variants and the parameter values.
+
+    :param grid: Values to try for each name in ``SWEEP_PARAMS``.
+    """
+    names = [name for name in SWEEP_PARAMS if name in grid]
+    runs = []
+    for variant, prompt in enumerate(prompts):
+        for values in itertools.product(*(grid[name] for name in names)):
+            runs.append(SweepRun(
+                index=len(runs),
+                variant=variant,
+                prompt=prompt,
+                params=dict(zip(names, values)),
+            ))
+    return runs
+
+
+def _generate(
+    session: requests.Session, llm_api_path: str, run: SweepRun, timeout: int
+) -> SweepRun:
+    start = time.perf_counter()
+    try:
+        response = session.post(
+            url=llm_api_path,
+            json={"query": run.prompt, **run.params},
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            response.raise_for_status()
+        body = response.json()
+    except (requests.exceptions.RequestException, ValueError) as exc:
+        run.latency_seconds = time.perf_counter() - start
+        run.error = str(exc)
+        logging.error("Sweep run %d failed: %s", run.index, exc)
+        return run
+
+    run.latency_seconds = time.perf_counter() - start
+    sweep_latency_seconds.observe(run.latency_seconds, client="llm_api")
+    run.text = event_text(body)
+    results = body.get("results")
+    usage = body.get("usage") or (
+        results.get("usage") if isinstance(results, dict) else None
+    ) or {}
+    if usage.get("completion_tokens") is not None:
+        run.tokens = int(usage["completion_tokens"])
+        run.tokens_estimated = False
+    else:
+        run.tokens = estimate_tokens(run.text)
+    return run
+
+
+def run_sweep(
+    llm_api_path: str,
+    runs: Sequence[SweepRun],
+    max_workers: int = 4,
+    timeout: int = 600,
+) -> Iterator[SweepRun]:
+    """
+    Send the runs to the LLM API with at most ``max_workers`` requests in
+    flight and yield each run as soon as it finishes. A failed request sets
+    ``error`` on its run instead of stopping the sweep.
+    """
+    if not runs:
+        return
+    max_workers = max(1, min(max_workers, len(runs)))
+    with requests.Session() as session:
+        # 連線池大小跟併發數一致，避免超出的連線用完就丟
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_generate, session, llm_api_path, run, timeout)
+                for run in runs
+            ]
+            for future in as_completed(futures):
+                yield future.result()
@@ -1 +1,2 @@
 from .base_pipe import Pipeline
+from .cache import DiskStepCache
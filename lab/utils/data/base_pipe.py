@@ -1,14 +1,32 @@
 import typing as tp
 from abc import ABC, abstractmethod
-from dataclasses import make_dataclass, fields, asdict
+from collections.abc import Iterator
+from concurrent.futures import (FIRST_COMPLETED, Executor, Future,
+                                ProcessPoolExecutor, ThreadPoolExecutor, wait)
+from dataclasses import make_dataclass, fields
 import logging
+import queue
+import threading
+
+from .cache import make_cache_key
 
 
 def create_pipeline_input(fields: tp.Set[tp.Tuple]) -> tp.Type[tp.Any]:
     return make_dataclass("PipelineInput", fields)
 
 
+def as_dict(obj: tp.Any) -> tp.Dict[str, tp.Any]:
+    """
+    Shallow field dict of a dataclass instance, unlike ``dataclasses.asdict``
+    the values are not deep copied.
+    """
+    return {f.name: getattr(obj, f.name) for f in fields(obj)}
+
+
 class PipelineStep(ABC):
+    # 輸出內容與相同輸入的關係改變時須調高版本，讓舊的快取失效
+    version: str = "1"
+
     @property
     @abstractmethod
     def input_class(self) -> type:
@@ -24,10 +42,232 @@ class PipelineStep(ABC):
         pass
 
 
+def _select_inputs(
+    step: PipelineStep, data: tp.Dict[str, tp.Any]
+) -> tp.Dict[str, tp.Any]:
+    input_fields = {f.name for f in fields(step.input_class)}
+    return {k: v for k, v in data.items() if k in input_fields}
+
+
+def _execute_step(
+    step: PipelineStep, step_inputs: tp.Dict[str, tp.Any]
+) -> tp.Dict[str, tp.Any]:
+    # 模組層級函式，才能送進 ProcessPoolExecutor
+    return as_dict(step.execute(step.input_class(**step_inputs)))
+
+
+def _is_cacheable(outputs: tp.Dict[str, tp.Any]) -> bool:
+    # 串流步驟輸出的 generator 只能走訪一次，快取後再次取用會是空的
+    return not any(isinstance(value, Iterator) for value in outputs.values())
+
+
+_DONE = object()
+# stream 逐筆快取時附在資料上的標記，不會被選進任何步驟的輸入
+_CACHE_KEY = "__cache_key__"
+_CACHED = "__cached__"
+
+
+def _completed(result: tp.Any) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
+class _Stage:
+    """
+    One step of a streaming pipeline.
+
+    A feeder thread pulls items from the upstream iterator, submits them to
+    the step's executor and puts the futures on a bounded queue. Iterating
+    the stage yields the merged results in input order, and a full queue
+    blocks the feeder, so at most ``queue_size`` items are in flight.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        step: PipelineStep,
+        executor: Executor,
+        upstream: tp.Iterable[tp.Dict[str, tp.Any]],
+        queue_size: int,
+        pipeline: "Pipeline",
+    ):
+        self.name = name
+        self.step = step
+        self.executor = executor
+        self.pipeline = pipeline
+        self.upstream = upstream
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._feed, name=f"pipeline-{name}", daemon=True
+        )
+        self.thread.start()
+
+    def _put(self, item: tp.Any) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _feed(self) -> None:
+        try:
+            for data in self.upstream:
+                if self.stopped.is_set():
+                    return
+                if _CACHED in data:
+                    # 整筆輸出已在快取中，不經過這個步驟
+                    self._put((data, _completed({})))
+                    continue
+                self._put((data, self.pipeline._submit(
+                    self.executor, self.name, self.step,
+                    _select_inputs(self.step, data)
+                )))
+        except BaseException as exc:
+            self._put((None, exc))
+        finally:
+            self._put(_DONE)
+
+    def __iter__(self) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            data, result = item
+            if isinstance(result, BaseException):
+                raise result
+            yield {**data, **result.result()}
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if isinstance(self.upstream, _Stage):
+            self.upstream.stop()
+
+
 class Pipeline:
     def __init__(self, **steps: PipelineStep):
         self.steps: tp.Dict[str, PipelineStep] = steps
         self.input_class = self._calculate_required_inputs()
+        self.dependencies = self._calculate_dependencies()
+        self.max_workers = 1
+        self.cache: tp.MutableMapping[str, tp.Dict[str, tp.Any]] | None = None
+
+    def use_cache(
+        self,
+        cache: tp.MutableMapping[str, tp.Dict[str, tp.Any]] | None = None
+    ) -> "Pipeline":
+        """
+        Skip steps whose outputs are cached for identical inputs, keyed by
+        step name, step version and input content (see ``make_cache_key``).
+        Pass a ``DiskStepCache`` to keep outputs across runs, inputs that
+        cannot be pickled are never cached.
+
+        A step output holding iterators (the generators of streaming steps)
+        is not cached on its own. ``stream`` and ``map`` also cache each item
+        as a whole, keyed by the item inputs and every step name and version:
+        the iterators of the last step are collected into lists as they are
+        consumed and stored once all are exhausted, so an unchanged item
+        skips every step on the next run.
+        """
+        self.cache = {} if cache is None else cache
+        return self
+
+    def _submit(
+        self,
+        executor: Executor,
+        step_name: str,
+        step: PipelineStep,
+        step_inputs: tp.Dict[str, tp.Any],
+    ) -> Future:
+        """
+        Submit a step to ``executor``, or return an already completed future
+        when its outputs are cached.
+        """
+        cache = self.cache
+        key = None
+        if cache is not None:
+            key = make_cache_key(step_name, step, step_inputs)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logging.info(f"Skipping step: {step_name} (cached)")
+                return _completed(cached)
+
+        future = executor.submit(_execute_step, step, step_inputs)
+        if key is not None:
+            def store(done: Future) -> None:
+                if (
+                    not done.cancelled()
+                    and done.exception() is None
+                    and _is_cacheable(done.result())
+                ):
+                    cache[key] = done.result()
+            future.add_done_callback(store)
+        return future
+
+    def _item_cache_key(self, item: tp.Dict[str, tp.Any]) -> str | None:
+        steps = ",".join(
+            f"{step_name}:{step.version}"
+            for step_name, step in self.steps.items()
+        )
+        return make_cache_key(f"stream[{steps}]", None, item)
+
+    def _lookup_items(
+        self, inputs: tp.Iterable[tp.Dict[str, tp.Any]]
+    ) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+        cache = self.cache
+        for item in inputs:
+            key = self._item_cache_key(item)
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                logging.info("Skipping all steps (cached)")
+                yield {**item, _CACHED: cached}
+            else:
+                yield {**item, _CACHE_KEY: key}
+
+    def _store_item(
+        self, result: tp.Dict[str, tp.Any]
+    ) -> tp.Dict[str, tp.Any]:
+        cached = result.pop(_CACHED, None)
+        key = result.pop(_CACHE_KEY, None)
+        if cached is not None:
+            return {**result, **cached}
+        if key is None:
+            return result
+
+        cache = self.cache
+        last_step = list(self.steps.values())[-1]
+        final_fields = {f.name for f in fields(last_step.output_class)}
+        # 中間步驟的 iterator 已由後面的步驟取用，不放進快取
+        entry = {
+            name: value for name, value in result.items()
+            if not isinstance(value, Iterator) or name in final_fields
+        }
+        streams = [
+            name for name, value in entry.items()
+            if isinstance(value, Iterator)
+        ]
+        if not streams:
+            cache[key] = entry
+            return result
+        remaining = set(streams)
+
+        def collect(name: str, items: Iterator) -> tp.Iterator[tp.Any]:
+            values = []
+            for value in items:
+                values.append(value)
+                yield value
+            entry[name] = values
+            remaining.discard(name)
+            if not remaining:
+                cache[key] = entry
+
+        return {
+            **result,
+            **{name: collect(name, result[name]) for name in streams},
+        }
 
     def __str__(self):
         step_info = []
@@ -72,7 +312,8 @@ class Pipeline:
                 for field in step.output_class.__dataclass_fields__.values()
             }
 
-            missing_input_names = input_field_names - output_field_names
+            # 只有前面步驟產生的輸出才不需要由 pipeline 的輸入提供
+            missing_input_names = input_field_names - outputs_produced
             missing_inputs = {
                 field
                 for field in input_fields_with_type
@@ -85,21 +326,153 @@ class Pipeline:
 
         return create_pipeline_input(inputs_needed)
 
+    def _calculate_dependencies(self) -> tp.Dict[str, tp.Set[str]]:
+        """
+        Steps each step has to wait for, derived from the dataclass fields.
+
+        A step depends on the latest earlier step producing one of its inputs,
+        and on earlier steps reading or writing a field it overwrites, so the
+        result is the same as running the steps in declaration order.
+        """
+        dependencies: tp.Dict[str, tp.Set[str]] = {}
+        producers: tp.Dict[str, str] = {}
+        readers: tp.Dict[str, tp.Set[str]] = {}
+
+        for step_name, step in self.steps.items():
+            input_names = {f.name for f in fields(step.input_class)}
+            output_names = {f.name for f in fields(step.output_class)}
+
+            depends_on = {
+                producers[name] for name in input_names if name in producers
+            }
+            for name in output_names:
+                if name in producers:
+                    depends_on.add(producers[name])
+                depends_on.update(readers.get(name, set()))
+            depends_on.discard(step_name)
+            dependencies[step_name] = depends_on
+
+            for name in input_names:
+                readers.setdefault(name, set()).add(step_name)
+            for name in output_names:
+                producers[name] = step_name
+                readers[name] = set()
+
+        return dependencies
+
     def get_input_params_info(self) -> tp.Set[str]:
         return [(field.name, field.type) for field in fields(self.input_class)]  # type: ignore
 
     def execute(self, **kwargs) -> dict:
-        current_data = kwargs
-        for step_name, step in self.steps.items():
-            logging.info(f"Executing step: {step_name}")
-            input_cls = step.input_class
-            input_fields = {f.name for f in fields(input_cls)}
-            step_inputs = {
-                k: v for k, v in current_data.items() if k in input_fields
-            }
-            input_data = input_cls(**step_inputs)
+        return self.run(kwargs, self.max_workers)
 
-            output_data = step.execute(input_data)
+    def run(
+        self, inputs: tp.Dict[str, tp.Any], max_workers: int | None = None
+    ) -> dict:
+        """
+        Execute the steps as a DAG, steps whose dependencies are done run
+        concurrently on up to ``max_workers`` threads.
+        """
+        current_data = inputs
+        pending = {
+            step_name: set(depends_on)
+            for step_name, depends_on in self.dependencies.items()
+        }
+        done: tp.Set[str] = set()
+        running: tp.Dict[Future, str] = {}
 
-            current_data.update(asdict(output_data))
+        with ThreadPoolExecutor(
+            max_workers or self.max_workers, thread_name_prefix="pipeline"
+        ) as executor:
+            while pending or running:
+                ready = [
+                    step_name for step_name in self.steps
+                    if step_name in pending and pending[step_name] <= done
+                ]
+                for step_name in ready:
+                    del pending[step_name]
+                    step = self.steps[step_name]
+                    logging.info(f"Executing step: {step_name}")
+                    future = self._submit(
+                        executor, step_name, step,
+                        _select_inputs(step, current_data)
+                    )
+                    running[future] = step_name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step_name = running.pop(future)
+                    current_data.update(future.result())
+                    done.add(step_name)
         return current_data
+
+    def stream(
+        self,
+        inputs: tp.Iterable[tp.Dict[str, tp.Any]],
+        workers: int | tp.Dict[str, int] = 1,
+        executor: str | tp.Dict[str, str] = "thread",
+        queue_size: int | None = None,
+    ) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+        """
+        Push many inputs through the steps, each step running concurrently
+        on its own pool, and yield the results in input order.
+
+        :param inputs: Iterable of keyword dicts, as passed to ``execute``.
+        :param workers: Workers per step, a number for all steps or a dict
+        keyed by step name (missing steps get one worker).
+        :param executor: ``"thread"`` for I/O bound steps or ``"process"``
+        for CPU bound ones, for all steps or per step name. Steps and their
+        inputs must be picklable to run in a process pool.
+        :param queue_size: Maximum items in flight per step, defaults to
+        twice its workers.
+        """
+        def per_step(value, step_name, default):
+            if isinstance(value, dict):
+                return value.get(step_name, default)
+            return value
+
+        executors: tp.List[Executor] = []
+        stages: tp.List[_Stage] = []
+        upstream: tp.Iterable[tp.Dict[str, tp.Any]] = inputs
+        if self.cache is not None:
+            upstream = self._lookup_items(inputs)
+        try:
+            for step_name, step in self.steps.items():
+                n_workers = per_step(workers, step_name, 1)
+                kind = per_step(executor, step_name, "thread")
+                if kind == "process":
+                    pool: Executor = ProcessPoolExecutor(n_workers)
+                elif kind == "thread":
+                    pool = ThreadPoolExecutor(
+                        n_workers, thread_name_prefix=f"step-{step_name}"
+                    )
+                else:
+                    raise ValueError(f"Unsupported executor: {kind}")
+                executors.append(pool)
+                upstream = _Stage(
+                    step_name, step, pool, upstream,
+                    queue_size or 2 * n_workers, self
+                )
+                stages.append(upstream)
+            if self.cache is None:
+                yield from upstream
+            else:
+                for result in upstream:
+                    yield self._store_item(result)
+        finally:
+            if stages:
+                stages[-1].stop()
+            for pool in executors:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def map(
+        self,
+        inputs: tp.Iterable[tp.Dict[str, tp.Any]],
+        workers: int | tp.Dict[str, int] = 1,
+        executor: str | tp.Dict[str, str] = "thread",
+        queue_size: int | None = None,
+    ) -> tp.List[tp.Dict[str, tp.Any]]:
+        """
+        Eager version of ``stream``, returns all results as a list.
+        """
+        return list(self.stream(inputs, workers, executor, queue_size))
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import typing as tp
+
+
+def _fingerprint_value(value: tp.Any) -> tp.Any:
+    # 路徑類的輸入以檔案的 mtime 與大小判斷內容是否變更
+    if isinstance(value, (str, os.PathLike)):
+        try:
+            if os.path.isfile(value):
+                stat = os.stat(value)
+                return (
+                    "file", os.path.abspath(value),
+                    stat.st_mtime_ns, stat.st_size
+                )
+        except (OSError, ValueError):
+            pass
+    return value
+
+
+def make_cache_key(
+    step_name: str, step: tp.Any, step_inputs: tp.Dict[str, tp.Any]
+) -> str | None:
+    """
+    Key of a step run: step name, step version and a content hash of the
+    inputs, with files identified by path, mtime and size. Returns None when
+    the inputs cannot be pickled.
+    """
+    version = getattr(step, "version", "1")
+    try:
+        payload = pickle.dumps(sorted(
+            (name, _fingerprint_value(value))
+            for name, value in step_inputs.items()
+        ))
+    except Exception:
+        return None
+    return f"{step_name}:{version}:{hashlib.sha256(payload).hexdigest()}"
+
+
+class DiskStepCache(tp.MutableMapping[str, tp.Dict[str, tp.Any]]):
+    """
+    On-disk cache of step outputs, one pickle file per key.
+
+    When the total size exceeds ``max_bytes`` the least recently used entries
+    are removed until it is back under ``low_watermark`` of the limit.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 1 << 30,
+        low_watermark: float = 0.8,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._paths())
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".pkl")
+
+    def _paths(self) -> tp.Iterator[str]:
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pkl"):
+                    yield os.path.join(root, name)
+
+    def __getitem__(self, key: str) -> tp.Dict[str, tp.Any]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            raise KeyError(key)
+        except (pickle.UnpicklingError, EOFError) as exc:
+            logging.warning("Dropping corrupted cache entry %s: %s", key, exc)
+            self.__delitem__(key)
+            raise KeyError(key)
+        # 以 mtime 記錄最近使用時間，淘汰時使用
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # 讀取後剛好被其他執行緒淘汰，視為未命中
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: tp.Dict[str, tp.Any]) -> None:
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:
+            logging.debug("Output of %s is not cacheable: %s", key, exc)
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += len(payload) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def __delitem__(self, key: str) -> None:
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                raise KeyError(key)
+            self._size -= size
+
+    def __iter__(self) -> tp.Iterator[str]:
+        # 檔名是 key 的雜湊值，無法還原原本的 key
+        raise TypeError("DiskStepCache keys cannot be listed")
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._paths())
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and os.path.exists(self._path(key))
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self._paths():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        target = self.max_bytes * self.low_watermark
+        removed = 0
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            removed += 1
+        logging.info(
+            "Evicted %d cache entries, cache size %d bytes", removed,
+            self._size
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in list(self._paths()):
+                os.remove(path)
+            self._size = 0
@@ -0,0 +1,240 @@
+import csv
+import os
+import re
+import typing as tp
+from collections import deque
+from dataclasses import dataclass
+
+from ..base_pipe import PipelineStep
+from ..loader.pdf_loader import IMAGE_MARKER, TABLE_MARKER
+
+if tp.TYPE_CHECKING:
+    from utils.opensearch_client import OpenSearchClient
+
+# 句尾標點 (含全形) 連同其後的右引號、右括號與換行視為一句的結尾
+SENTENCE_END = re.compile(
+    "[。！？!?；;]+[」』）)”’\"']*\n*|\n+"
+)
+
+CSV_COLUMNS = ("Text", "Metadata", "Source")
+
+
+@dataclass
+class ChunkerInput:
+    file_path: str
+    # PdfLoader 的頁面，或 TxtStreamLoader (output_format="text") 的文字片段
+    pages: tp.Iterable[tp.Any]
+
+
+@dataclass
+class ChunkerOutput:
+    chunks: tp.Iterator[tp.Dict[str, tp.Any]]
+
+
+class _Sentence(tp.NamedTuple):
+    text: str
+    page: int | None
+    tables: tp.List[tp.Any]
+    images: tp.List[tp.Any]
+
+
+class SentenceChunker(PipelineStep):
+    """
+    Split documents into chunks of at most ``chunk_size`` characters on
+    sentence boundaries, consecutive chunks share up to ``overlap``
+    characters of trailing sentences.
+
+    The input is consumed as a stream in a single pass, sentences longer than
+    a chunk are cut by length and still overlap. Each ``<表>``/``<圖>``
+    marker carries the table or image metadata of its page into the chunks
+    it ends up in.
+    """
+
+    def __init__(self, chunk_size: int = 600, overlap: int = 180) -> None:
+        """
+        :param chunk_size: Maximum characters per chunk.
+        :param overlap: Characters repeated at the start of the next chunk,
+        must be smaller than ``chunk_size``.
+        """
+        super().__init__()
+        if chunk_size <= 0 or not 0 <= overlap < chunk_size:
+            raise ValueError(
+                f"Invalid chunk_size/overlap: {chunk_size}/{overlap}"
+            )
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    @classmethod
+    def from_index(
+        cls, client: "OpenSearchClient", index: str
+    ) -> "SentenceChunker":
+        """
+        Use the ``chunk_size`` and ``overlap`` recorded in the index ``_meta``
+        so re-chunked documents match the existing ones.
+        """
+        meta = client.get_mapping_info(index).get("mappings", {}).get(
+            "_meta", {}
+        )
+        if "chunk_size" not in meta:
+            raise ValueError(f"Index '{index}' has no chunk_size in _meta")
+        return cls(int(meta["chunk_size"]), int(meta.get("overlap", 0)))
+
+    @property
+    def input_class(self):
+        return ChunkerInput
+
+    @property
+    def output_class(self):
+        return ChunkerOutput
+
+    def _iter_sentences(
+        self, pages: tp.Iterable[tp.Any]
+    ) -> tp.Iterator[_Sentence]:
+        carry = ""
+        for page in pages:
+            if isinstance(page, str):
+                # 片段可能在句子中間斷開，未結束的部分留到下一個片段
+                text, page_number = carry + page, None
+                tables = images = ()
+                final = False
+            else:
+                text = page.text + "\n"
+                page_number = page.page_number
+                tables = deque(page.metadata.get("tables", ()))
+                images = deque(page.metadata.get("images", ()))
+                final = True
+
+            start = 0
+            for match in SENTENCE_END.finditer(text):
+                end = match.end()
+                if not final and end == len(text):
+                    break
+                sentence = text[start:end]
+                start = end
+                attached_tables = attached_images = []
+                if tables and TABLE_MARKER in sentence:
+                    attached_tables = [
+                        tables.popleft()
+                        for _ in range(sentence.count(TABLE_MARKER))
+                        if tables
+                    ]
+                if images and IMAGE_MARKER in sentence:
+                    attached_images = [
+                        images.popleft()
+                        for _ in range(sentence.count(IMAGE_MARKER))
+                        if images
+                    ]
+                yield _Sentence(
+                    sentence, page_number, attached_tables, attached_images
+                )
+            carry = text[start:] if not final else ""
+            # 沒有句尾標點的長文字不留在緩衝區，避免緩衝區無限成長；切成
+            # chunk_size - overlap 的片段，接在前一個 chunk 的重疊尾端後仍放得下
+            piece_size = self.chunk_size - self.overlap
+            while len(carry) >= self.chunk_size:
+                yield _Sentence(carry[:piece_size], None, [], [])
+                carry = carry[piece_size:]
+        if carry:
+            yield _Sentence(carry, None, [], [])
+
+    def _make_chunk(
+        self, sentences: tp.Iterable[_Sentence], source_file: str
+    ) -> tp.Dict[str, tp.Any] | None:
+        sentences = list(sentences)
+        text = "".join(sentence.text for sentence in sentences).strip()
+        if not text:
+            return None
+        metadata: tp.Dict[str, tp.Any] = {"source_file": source_file}
+        pages = sorted({s.page for s in sentences if s.page is not None})
+        if pages:
+            metadata["pages"] = pages
+        tables = [table for s in sentences for table in s.tables]
+        if tables:
+            metadata["tables"] = tables
+        images = [image for s in sentences for image in s.images]
+        if images:
+            metadata["images"] = images
+        return {"Text": text, "Metadata": metadata, "Source": source_file}
+
+    def _overlap_tail(
+        self, sentences: tp.Deque[_Sentence]
+    ) -> tp.Tuple[tp.Deque[_Sentence], int]:
+        # 由尾端保留不超過 overlap 的完整句子，最後一句就超過時取其結尾
+        kept: tp.Deque[_Sentence] = deque()
+        length = 0
+        while sentences and \
+                length + len(sentences[-1].text) <= self.overlap:
+            sentence = sentences.pop()
+            kept.appendleft(sentence)
+            length += len(sentence.text)
+        if not kept and sentences and self.overlap:
+            last = sentences[-1]
+            text = last.text[-self.overlap:]
+            kept.append(last._replace(
+                text=text,
+                tables=last.tables if TABLE_MARKER in text else [],
+                images=last.images if IMAGE_MARKER in text else [],
+            ))
+            length = len(text)
+        return kept, length
+
+    def iter_chunks(
+        self, file_path: str, pages: tp.Iterable[tp.Any]
+    ) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+        source_file = os.path.basename(file_path)
+        piece_size = self.chunk_size - self.overlap
+        current: deque = deque()
+        length = 0
+        fresh = 0  # 上一個 chunk 之後新加入的句子數
+
+        for sentence in self._iter_sentences(pages):
+            if len(sentence.text) > self.chunk_size:
+                pieces = [
+                    sentence._replace(text=sentence.text[i:i + piece_size])
+                    for i in range(0, len(sentence.text), piece_size)
+                ]
+            else:
+                pieces = [sentence]
+
+            for piece in pieces:
+                if length + len(piece.text) > self.chunk_size:
+                    if fresh:
+                        chunk = self._make_chunk(current, source_file)
+                        if chunk is not None:
+                            yield chunk
+                        fresh = 0
+                        current, length = self._overlap_tail(current)
+                    if length + len(piece.text) > self.chunk_size:
+                        current.clear()
+                        length = 0
+                current.append(piece)
+                length += len(piece.text)
+                if not piece.text.isspace():
+                    fresh += 1
+
+        if fresh:
+            chunk = self._make_chunk(current, source_file)
+            if chunk is not None:
+                yield chunk
+
+    def execute(self, inputs: ChunkerInput) -> ChunkerOutput:
+        return ChunkerOutput(
+            chunks=self.iter_chunks(inputs.file_path, inputs.pages)
+        )
+
+
+def write_csv(
+    chunks: tp.Iterable[tp.Dict[str, tp.Any]], path: str
+) -> int:
+    """
+    Write chunks in the CSV layout read by ``rebuild_index_with_csv``, the
+    metadata is stored as a Python literal. Returns the number of rows.
+    """
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for chunk in chunks:
+            writer.writerow({**chunk, "Metadata": repr(chunk["Metadata"])})
+            rows += 1
+    return rows
@@ -0,0 +1,280 @@
+import hashlib
+import re
+import threading
+import typing as tp
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from .base_pipe import PipelineStep
+
+_BASE = np.uint64(1_000_003)
+_MASK = np.uint64(0xFFFFFFFF)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class DedupStats:
+    seen: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    vector_duplicates: int = 0
+    removed_chars: int = 0
+
+    @property
+    def kept(self) -> int:
+        return self.seen - self.removed
+
+    @property
+    def removed(self) -> int:
+        return (
+            self.exact_duplicates + self.near_duplicates
+            + self.vector_duplicates
+        )
+
+    def to_dict(self) -> tp.Dict[str, tp.Any]:
+        return {
+            **asdict(self),
+            "kept": self.kept,
+            "removed": self.removed,
+            "removed_ratio": self.removed / self.seen if self.seen else 0.0,
+        }
+
+
+@dataclass
+class TextDedupInput:
+    chunks: tp.List[tp.Dict[str, tp.Any]]
+
+
+@dataclass
+class TextDedupOutput:
+    chunks: tp.List[tp.Dict[str, tp.Any]]
+
+
+@dataclass
+class VectorDedupInput:
+    chunks: tp.List[tp.Dict[str, tp.Any]]
+    embeddings: tp.List[tp.List[float]]
+
+
+@dataclass
+class VectorDedupOutput:
+    chunks: tp.List[tp.Dict[str, tp.Any]]
+    embeddings: tp.List[tp.List[float]]
+
+
+def _choose_bands(num_perm: int, threshold: float) -> int:
+    # LSH 的門檻約為 (1/b)^(1/r)，設在 threshold 之下以免漏掉重複的 chunk
+    target = threshold - 0.1
+    return min(
+        (b for b in range(1, num_perm + 1) if num_perm % b == 0),
+        key=lambda b: abs((1 / b) ** (b / num_perm) - target),
+    )
+
+
+class MinHashDeduplicator(PipelineStep):
+    """
+    Drop chunks whose text is an exact or near duplicate of an earlier chunk
+    of the run, before they are embedded.
+
+    Near duplicates are found with MinHash signatures over character
+    shingles, candidates come from LSH buckets so each chunk is only compared
+    with a few earlier ones. State is kept across calls, run the step with a
+    single worker.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        bands: int | None = None,
+        seed: int = 0,
+        stats: DedupStats | None = None,
+    ) -> None:
+        """
+        :param threshold: Estimated Jaccard similarity of the shingle sets
+        from which a chunk counts as a duplicate.
+        :param num_perm: Number of hash permutations of the signature.
+        :param shingle_size: Characters per shingle.
+        :param bands: LSH bands, must divide ``num_perm``. Chosen from
+        ``threshold`` by default.
+        :param stats: Shared counters, e.g. with a ``VectorDeduplicator``.
+        """
+        super().__init__()
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands = bands or _choose_bands(num_perm, threshold)
+        if num_perm % self.bands:
+            raise ValueError(f"bands must divide num_perm ({num_perm})")
+        self.rows = num_perm // self.bands
+        # multiply-shift 雜湊 (a * x + b) >> 32 作為排列，a 須為奇數
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(
+            0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64
+        ) | np.uint64(1))[:, None]
+        self._b = rng.integers(
+            0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64
+        )[:, None]
+        self.stats = stats or DedupStats()
+        self._lock = threading.Lock()
+        self._digests: tp.Set[bytes] = set()
+        self._signatures: tp.List[np.ndarray] = []
+        self._buckets: tp.List[tp.Dict[bytes, tp.List[int]]] = [
+            {} for _ in range(self.bands)
+        ]
+
+    @property
+    def input_class(self):
+        return TextDedupInput
+
+    @property
+    def output_class(self):
+        return TextDedupOutput
+
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        codes = np.frombuffer(
+            text.encode("utf-32-le"), dtype=np.uint32
+        ).astype(np.uint64)
+        width = min(self.shingle_size, len(codes))
+        hashes = np.zeros(len(codes) - width + 1, dtype=np.uint64)
+        # 以多項式滾動雜湊一次算出所有 shingle，溢位時自然取模 2^64
+        with np.errstate(over="ignore"):
+            for k in range(width):
+                hashes = hashes * _BASE + codes[k:k + len(hashes)]
+            hashes ^= hashes >> np.uint64(29)
+        return np.unique(hashes & _MASK)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self._shingle_hashes(text)[None, :]
+        permuted = (self._a * hashes + self._b) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> tp.List[bytes]:
+        return [
+            signature[i * self.rows:(i + 1) * self.rows].tobytes()
+            for i in range(self.bands)
+        ]
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        Check ``text`` against the chunks kept so far and remember it when it
+        is new.
+        """
+        normalized = _WHITESPACE.sub(" ", text).strip().lower()
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        with self._lock:
+            self.stats.seen += 1
+            if digest in self._digests:
+                self.stats.exact_duplicates += 1
+                self.stats.removed_chars += len(text)
+                return True
+
+            signature = self.signature(normalized or " ")
+            keys = self._band_keys(signature)
+            candidates = {
+                index
+                for band, key in enumerate(keys)
+                for index in self._buckets[band].get(key, ())
+            }
+            for index in candidates:
+                similarity = np.count_nonzero(
+                    self._signatures[index] == signature
+                ) / self.num_perm
+                if similarity >= self.threshold:
+                    self.stats.near_duplicates += 1
+                    self.stats.removed_chars += len(text)
+                    return True
+
+            index = len(self._signatures)
+            self._signatures.append(signature)
+            self._digests.add(digest)
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, []).append(index)
+            return False
+
+    def execute(self, inputs: TextDedupInput) -> TextDedupOutput:
+        return TextDedupOutput(chunks=[
+            chunk for chunk in inputs.chunks
+            if not self.is_duplicate(chunk["Text"])
+        ])
+
+
+class VectorDeduplicator(PipelineStep):
+    """
+    Drop embedded chunks whose cosine similarity with a recently kept chunk
+    reaches ``threshold``, catching reworded duplicates the text check
+    misses. Runs after embedding, so it saves index space but not embedding
+    calls. Only the last ``window`` kept vectors are compared.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.97,
+        window: int = 50_000,
+        stats: DedupStats | None = None,
+    ) -> None:
+        """
+        :param threshold: Cosine similarity from which a chunk counts as a
+        duplicate.
+        :param window: Number of kept vectors compared against.
+        :param stats: Counters shared with the ``MinHashDeduplicator`` of the
+        same run, the chunks are then already counted as seen.
+        """
+        super().__init__()
+        self.threshold = threshold
+        self.window = window
+        self._count_seen = stats is None
+        self.stats = stats or DedupStats()
+        self._lock = threading.Lock()
+        self._vectors: np.ndarray | None = None
+        self._count = 0  # 已保留的向量總數，環狀緩衝區的寫入位置取餘數
+
+    @property
+    def input_class(self):
+        return VectorDedupInput
+
+    @property
+    def output_class(self):
+        return VectorDedupOutput
+
+    def execute(self, inputs: VectorDedupInput) -> VectorDedupOutput:
+        if not inputs.chunks:
+            return VectorDedupOutput(chunks=[], embeddings=[])
+        vectors = np.asarray(inputs.embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        chunks, embeddings = [], []
+        with self._lock:
+            if self._count_seen:
+                self.stats.seen += len(inputs.chunks)
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.window, vectors.shape[1]), dtype=np.float32
+                )
+            filled = min(self._count, self.window)
+            # 先一次比對緩衝區內的向量，批次內的重複再逐一比對
+            previous = (
+                (vectors @ self._vectors[:filled].T).max(axis=1)
+                if filled else np.full(len(vectors), -1.0)
+            )
+            kept: tp.List[int] = []
+            for i, vector in enumerate(vectors):
+                similarity = previous[i]
+                if kept:
+                    similarity = max(
+                        similarity, float((vectors[kept] @ vector).max())
+                    )
+                if similarity >= self.threshold:
+                    self.stats.vector_duplicates += 1
+                    self.stats.removed_chars += len(inputs.chunks[i]["Text"])
+                    continue
+                kept.append(i)
+                chunks.append(inputs.chunks[i])
+                embeddings.append(inputs.embeddings[i])
+            for i in kept:
+                self._vectors[self._count % self.window] = vectors[i]
+                self._count += 1
+        return VectorDedupOutput(chunks=chunks, embeddings=embeddings)
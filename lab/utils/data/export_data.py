@@ -1,21 +1,45 @@
-
+import itertools
+import json
 import logging
-from typing import Dict, List
+import os
+from ast import literal_eval
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 
 from utils.opensearch_client import OpenSearchClient
 
+EMBEDDING_COLUMN = "Embedding"
+# 檔案 schema metadata 的 key，記錄匯出時 index 的 _meta 與 Metadata 欄位格式
+META_KEY = b"lab.index_meta"
+METADATA_FORMAT_KEY = b"lab.metadata_format"
+COLUMNAR_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
 
 def get_data(
-    client: OpenSearchClient, index: str, size: int | None = None
+    client: OpenSearchClient,
+    index: str,
+    size: int | None = None,
+    include_embeddings: bool = False,
 ) -> List[Dict[str, List[str] | str]]:
+    """
+    Chunks of an index, all of them unless ``size`` is given. Documents are
+    read with the scroll API, so exports are not capped by
+    ``max_result_window``.
+    """
     logging.debug("get_data: index=%s", index)
 
+    fields = ["text", "metadata"]
+    if include_embeddings:
+        fields.append("vector_field")
+    hits = client.scan(index, source=fields)
     if size:
-        data: List[Dict[str, List[str] | str]] = client.query_index(
-            index=index, query_type="match_all", size=size)
-    else:
-        data: List[Dict[str, List[str] | str]] = client.query_index(
-            index=index, query_type="match_all")
+        hits = itertools.islice(hits, size)
+    data: List[Dict[str, Any]] = list(hits)
 
     response = [
         {
@@ -23,7 +47,126 @@ def get_data(
             "Text": _data["_source"]["text"],
             "Metadata": _data["_source"]["metadata"],
             "Source": _data["_source"]["metadata"]["source_file"],
-        } 
+        }
         for _data in data
     ]
-    return response
\ No newline at end of file
+    if include_embeddings:
+        for record, _data in zip(response, data):
+            record[EMBEDDING_COLUMN] = _data["_source"]["vector_field"]
+    return response
+
+
+def to_arrow(
+    records: List[Dict[str, Any]], index_meta: Dict[str, Any] | None = None
+) -> pa.Table:
+    """
+    Convert exported chunks to an Arrow table. ``Metadata`` becomes a struct
+    column over the keys of all rows, a key missing from a row is stored as
+    null, and falls back to JSON strings only when the values of a key have
+    conflicting types. ``Embedding``, when present, becomes a fixed size
+    float32 list. The index ``_meta`` is kept in the schema metadata.
+    """
+    columns: Dict[str, pa.Array] = {
+        name: pa.array([record.get(name) for record in records], pa.string())
+        for name in ("Chunk Id", "Text", "Source")
+        if any(name in record for record in records)
+    }
+    metadata_format = b"struct"
+    metadata = [record.get("Metadata") or {} for record in records]
+    try:
+        # struct 欄位是所有 row 的 key 聯集，例如只有部分 chunk 有 tables
+        if not any(metadata):
+            raise pa.ArrowInvalid("Metadata has no keys")
+        columns["Metadata"] = pa.array(metadata)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # 同一個 key 的型別互相衝突時無法轉成 struct，改存 JSON 字串
+        metadata_format = b"json"
+        columns["Metadata"] = pa.array(
+            [json.dumps(item, ensure_ascii=False) for item in metadata],
+            pa.string(),
+        )
+
+    if records and EMBEDDING_COLUMN in records[0]:
+        embeddings = np.asarray(
+            [record[EMBEDDING_COLUMN] for record in records],
+            dtype=np.float32,
+        )
+        columns[EMBEDDING_COLUMN] = pa.FixedSizeListArray.from_arrays(
+            pa.array(embeddings.ravel()), embeddings.shape[1]
+        )
+
+    schema_metadata = {METADATA_FORMAT_KEY: metadata_format}
+    if index_meta is not None:
+        schema_metadata[META_KEY] = json.dumps(
+            index_meta, ensure_ascii=False
+        ).encode("utf-8")
+    table = pa.table(columns)
+    return table.replace_schema_metadata(schema_metadata)
+
+
+def write_chunks(
+    records: List[Dict[str, Any]],
+    path: str,
+    index_meta: Dict[str, Any] | None = None,
+) -> None:
+    """
+    Write exported chunks as Parquet (``.parquet``), Arrow IPC (``.arrow``,
+    ``.feather``) or the CSV layout of the chunk editor (``.csv``, without
+    embeddings).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        df = pd.DataFrame(records)
+        df = df.drop(columns=[EMBEDDING_COLUMN], errors="ignore")
+        df.to_csv(path, index=False)
+    elif extension == ".parquet":
+        pq.write_table(to_arrow(records, index_meta), path)
+    elif extension in (".arrow", ".feather"):
+        feather.write_feather(to_arrow(records, index_meta), path)
+    else:
+        raise ValueError(f"Unsupported export format: {path}")
+
+
+def read_chunks(
+    path: str,
+) -> Tuple[List[Dict[str, Any]], np.ndarray | None, Dict[str, Any]]:
+    """
+    Read chunks written by ``write_chunks`` or edited in the chunk CSV.
+
+    In a struct ``Metadata`` column every row has all the keys of the
+    export, keys a row did not have come back as None.
+
+    :return: The records with ``Text``, ``Metadata`` and ``Source``, the
+    float32 embedding matrix or None when the file has no embeddings, and
+    the index ``_meta`` recorded at export time.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        df = pd.read_csv(path)
+        df["Metadata"] = df["Metadata"].apply(literal_eval)
+        return df.to_dict("records"), None, {}
+    if extension == ".parquet":
+        table = pq.read_table(path)
+    elif extension in (".arrow", ".feather"):
+        table = feather.read_table(path)
+    else:
+        raise ValueError(f"Unsupported import format: {path}")
+
+    schema_metadata = table.schema.metadata or {}
+    index_meta = json.loads(schema_metadata.get(META_KEY, b"{}"))
+    embeddings = None
+    if EMBEDDING_COLUMN in table.column_names:
+        column = table.column(EMBEDDING_COLUMN).combine_chunks()
+        embeddings = column.flatten().to_numpy().reshape(
+            len(column), column.type.list_size
+        )
+        table = table.drop_columns([EMBEDDING_COLUMN])
+
+    records = table.to_pylist()
+    is_json = schema_metadata.get(METADATA_FORMAT_KEY) == b"json"
+    for record in records:
+        metadata = record.get("Metadata") or {}
+        record["Metadata"] = (
+            json.loads(metadata) if is_json else metadata
+        )
+    return records, embeddings, index_meta
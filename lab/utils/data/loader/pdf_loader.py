@@ -0,0 +1,192 @@
+import os
+import threading
+import typing as tp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .base_loader import BaseLoader
+
+TABLE_MARKER = "<表>"
+IMAGE_MARKER = "<圖>"
+
+
+@dataclass
+class PdfLoaderInput:
+    file_path: str
+
+
+@dataclass
+class PdfPage:
+    page_number: int  # 從 1 開始
+    text: str  # 頁面文字，表格與圖片以 <表>、<圖> 標示在原本的位置
+    metadata: tp.Dict[str, tp.Any] = field(default_factory=dict)
+
+
+@dataclass
+class PdfLoaderOutput:
+    pages: tp.Iterator[PdfPage]
+
+
+def _inside(obj: tp.Dict[str, tp.Any], bbox: tp.Tuple[float, ...]) -> bool:
+    x0, top, x1, bottom = bbox
+    return (
+        obj["x0"] >= x0 and obj["x1"] <= x1
+        and obj["top"] >= top and obj["bottom"] <= bottom
+    )
+
+
+def _extract_page(page: tp.Any, source_file: str) -> PdfPage:
+    tables = page.find_tables()
+    table_bboxes = [table.bbox for table in tables]
+    if table_bboxes:
+        text_page = page.filter(
+            lambda obj: obj.get("object_type") != "char"
+            or not any(_inside(obj, bbox) for bbox in table_bboxes)
+        )
+    else:
+        text_page = page
+
+    # 依垂直位置排列文字行、表格與圖片，讓標記出現在原本的位置
+    blocks: tp.List[tp.Tuple[float, str]] = [
+        (line["top"], line["text"])
+        for line in text_page.extract_text_lines()
+    ]
+    table_metadata = []
+    for i, table in enumerate(tables):
+        blocks.append((table.bbox[1], TABLE_MARKER))
+        table_metadata.append({
+            "index": i,
+            "bbox": list(table.bbox),
+            "rows": table.extract(),
+        })
+    image_metadata = []
+    for i, image in enumerate(page.images):
+        blocks.append((image["top"], IMAGE_MARKER))
+        image_metadata.append({
+            "index": i,
+            "bbox": [image["x0"], image["top"], image["x1"], image["bottom"]],
+        })
+    blocks.sort(key=lambda block: block[0])
+
+    return PdfPage(
+        page_number=page.page_number,
+        text="\n".join(text for _, text in blocks),
+        metadata={
+            "source_file": source_file,
+            "page": page.page_number,
+            "tables": table_metadata,
+            "images": image_metadata,
+        },
+    )
+
+
+def _extract_pages(file_path: str, start: int, stop: int) -> tp.List[PdfPage]:
+    # 模組層級函式，在子行程中各自開啟 PDF
+    import pdfplumber
+
+    source_file = os.path.basename(file_path)
+    with pdfplumber.open(file_path) as pdf:
+        pages = []
+        for index in range(start, stop):
+            page = pdf.pages[index]
+            pages.append(_extract_page(page, source_file))
+            # 釋放已解析頁面的快取，避免大型 PDF 佔用過多記憶體
+            page.close()
+        return pages
+
+
+def count_pages(file_path: str) -> int:
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+class PdfLoader(BaseLoader):
+    """
+    Extract text and tables of a PDF page by page across a process pool.
+
+    Pages are yielded in order as soon as their batch is done, at most
+    ``2 * processes`` batches per file are in flight so memory stays bounded
+    on large files. The pool is created on first use and shared by every
+    file the loader reads, so loading files from several threads never runs
+    more than ``processes`` processes; call ``close`` to shut it down.
+    """
+
+    def __init__(
+        self, processes: int | None = None, pages_per_task: int = 8
+    ) -> None:
+        super().__init__()
+        self.processes = processes or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> tp.Dict[str, tp.Any]:
+        # 行程池與 lock 無法 pickle，送進子行程時重新建立
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: tp.Dict[str, tp.Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def input_class(self):
+        return PdfLoaderInput
+
+    @property
+    def output_class(self):
+        return PdfLoaderOutput
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.processes)
+            return self._executor
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def iter_pages(self, file_path: str) -> tp.Iterator[PdfPage]:
+        total = count_pages(file_path)
+        ranges = [
+            (start, min(start + self.pages_per_task, total))
+            for start in range(0, total, self.pages_per_task)
+        ]
+        if self.processes == 1 or len(ranges) <= 1:
+            for start, stop in ranges:
+                yield from _extract_pages(file_path, start, stop)
+            return
+
+        executor = self._pool()
+        in_flight: deque = deque()
+        try:
+            pending = iter(ranges)
+            for start, stop in pending:
+                in_flight.append(
+                    executor.submit(_extract_pages, file_path, start, stop)
+                )
+                if len(in_flight) >= 2 * self.processes:
+                    break
+            while in_flight:
+                pages = in_flight.popleft().result()
+                next_range = next(pending, None)
+                if next_range is not None:
+                    in_flight.append(
+                        executor.submit(_extract_pages, file_path, *next_range)
+                    )
+                yield from pages
+        finally:
+            # 提前停止讀取時，不再解析剩下的頁面
+            for future in in_flight:
+                future.cancel()
+
+    def execute(self, inputs: PdfLoaderInput) -> PdfLoaderOutput:
+        return PdfLoaderOutput(pages=self.iter_pages(inputs.file_path))
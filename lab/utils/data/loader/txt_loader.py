@@ -1,4 +1,5 @@
 import html
+import typing as tp
 from dataclasses import dataclass
 
 from .base_loader import BaseLoader
@@ -14,9 +15,33 @@ class TxtLoaderOutput:
     document: str
 
 
+@dataclass
+class TxtStreamLoaderOutput:
+    segments: tp.Iterator[str]
+
+
 class TxtLoader(BaseLoader):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        block_size: int = 1 << 20,
+        output_format: tp.Literal["html", "text"] = "html",
+    ) -> None:
+        """
+        :param encoding: Encoding of the text files.
+        :param errors: How decoding errors are handled, see ``open``.
+        :param block_size: Characters read per block.
+        :param output_format: ``"html"`` escapes the text and turns line
+        breaks into ``<br>`` inside a ``<p>``, ``"text"`` keeps it as is.
+        """
         super().__init__()
+        if output_format not in ("html", "text"):
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.encoding = encoding
+        self.errors = errors
+        self.block_size = block_size
+        self.output_format = output_format
 
     @property
     def input_class(self):
@@ -26,10 +51,45 @@ class TxtLoader(BaseLoader):
     def output_class(self):
         return TxtLoaderOutput
 
+    def iter_segments(self, file_path: str) -> tp.Iterator[str]:
+        """
+        Read the file block by block and yield the converted segments, memory
+        use stays around one block whatever the file size.
+        """
+        is_html = self.output_format == "html"
+        if is_html:
+            yield "<p>"
+        with open(
+            file_path, "r", encoding=self.encoding, errors=self.errors
+        ) as f:
+            while block := f.read(self.block_size):
+                if is_html:
+                    # 逐字元轉換，區塊邊界不影響結果
+                    yield html.escape(block).replace("\n", "<br>")
+                else:
+                    yield block
+        if is_html:
+            yield "</p>"
+
     def execute(self, inputs: TxtLoaderInput) -> TxtLoaderOutput:
-        file_path = inputs.file_path
-        with open(file_path, "r") as f:
-            document = f.read()
-        document_html = html.escape(document).replace("\n", "<br>")
-        document_html = f"<p>{document_html}</p>"
-        return TxtLoaderOutput(document=document_html)
+        return TxtLoaderOutput(
+            document="".join(self.iter_segments(inputs.file_path))
+        )
+
+
+class TxtStreamLoader(TxtLoader):
+    """
+    Streaming variant of ``TxtLoader``, the output holds a lazy iterator of
+    segments instead of the whole document. The file is only opened once the
+    iterator is consumed, so run it on a thread executor, generators cannot
+    be sent across processes.
+    """
+
+    @property
+    def output_class(self):
+        return TxtStreamLoaderOutput
+
+    def execute(self, inputs: TxtLoaderInput) -> TxtStreamLoaderOutput:
+        return TxtStreamLoaderOutput(
+            segments=self.iter_segments(inputs.file_path)
+        )
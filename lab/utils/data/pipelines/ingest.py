@@ -0,0 +1,177 @@
+import os
+import typing as tp
+from dataclasses import dataclass
+
+from langchain_core.embeddings import Embeddings
+
+from ..base_pipe import PipelineStep
+from ..loader.pdf_loader import PdfLoader
+from ..loader.txt_loader import TxtLoader
+
+if tp.TYPE_CHECKING:
+    from utils.opensearch_client import OpenSearchClient
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+
+@dataclass
+class FileLoaderInput:
+    file_path: str
+
+
+@dataclass
+class FileLoaderOutput:
+    pages: tp.Iterator[tp.Any]
+
+
+@dataclass
+class EmbedderInput:
+    chunks: tp.List[tp.Dict[str, tp.Any]]
+
+
+@dataclass
+class EmbedderOutput:
+    embeddings: tp.List[tp.List[float]]
+
+
+@dataclass
+class BulkIndexerInput:
+    chunks: tp.List[tp.Dict[str, tp.Any]]
+    embeddings: tp.List[tp.List[float]]
+
+
+@dataclass
+class BulkIndexerOutput:
+    indexed: int
+
+
+class FileLoader(PipelineStep):
+    """
+    Stream the pages of a PDF or the text segments of a TXT file, the input
+    of ``SentenceChunker``. Nothing is read until the pages are iterated, so
+    a following chunker step splits the pages while they are extracted.
+    """
+
+    def __init__(
+        self, pdf_processes: int | None = None, encoding: str = "utf-8"
+    ) -> None:
+        super().__init__()
+        self.pdf_loader = PdfLoader(processes=pdf_processes)
+        self.txt_loader = TxtLoader(encoding=encoding, output_format="text")
+
+    @property
+    def input_class(self):
+        return FileLoaderInput
+
+    @property
+    def output_class(self):
+        return FileLoaderOutput
+
+    def close(self) -> None:
+        """
+        Shut down the process pool of the PDF loader.
+        """
+        self.pdf_loader.close()
+
+    def execute(self, inputs: FileLoaderInput) -> FileLoaderOutput:
+        file_path = inputs.file_path
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == ".pdf":
+            pages = self.pdf_loader.iter_pages(file_path)
+        elif extension == ".txt":
+            pages = self.txt_loader.iter_segments(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_path}")
+        return FileLoaderOutput(pages=pages)
+
+
+class Embedder(PipelineStep):
+    def __init__(self, client: Embeddings) -> None:
+        super().__init__()
+        self.client = client
+
+    @property
+    def input_class(self):
+        return EmbedderInput
+
+    @property
+    def output_class(self):
+        return EmbedderOutput
+
+    def execute(self, inputs: EmbedderInput) -> EmbedderOutput:
+        if not inputs.chunks:
+            # 整批都被去重時不呼叫 embedding API
+            return EmbedderOutput(embeddings=[])
+        embeddings = self.client.embed_documents(
+            [chunk["Text"] for chunk in inputs.chunks]
+        )
+        if len(embeddings) != len(inputs.chunks):
+            raise ValueError(
+                f"Got {len(embeddings)} embeddings for "
+                f"{len(inputs.chunks)} chunks"
+            )
+        return EmbedderOutput(embeddings=embeddings)
+
+
+class BulkIndexer(PipelineStep):
+    """
+    Bulk index embedded chunks without refreshing, call
+    ``OpenSearchClient.refresh`` once the load is done.
+    """
+
+    def __init__(self, client: "OpenSearchClient", index_name: str) -> None:
+        super().__init__()
+        self.client = client
+        self.index_name = index_name
+
+    @property
+    def input_class(self):
+        return BulkIndexerInput
+
+    @property
+    def output_class(self):
+        return BulkIndexerOutput
+
+    def execute(self, inputs: BulkIndexerInput) -> BulkIndexerOutput:
+        documents = [
+            {
+                "vector_field": embedding,
+                "text": chunk["Text"],
+                "metadata": chunk["Metadata"],
+            }
+            for chunk, embedding in zip(inputs.chunks, inputs.embeddings)
+        ]
+        if documents:
+            self.client.add_documents(
+                self.index_name, documents, refresh=False
+            )
+        return BulkIndexerOutput(indexed=len(documents))
+
+
+def iter_files(paths: tp.Iterable[str]) -> tp.Iterator[str]:
+    """
+    Supported files under the given files or directories, sorted per
+    directory so runs are reproducible.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_batches(
+    chunks: tp.Iterable[tp.Dict[str, tp.Any]], batch_size: int
+) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+    batch: tp.List[tp.Dict[str, tp.Any]] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield {"chunks": batch}
+            batch = []
+    if batch:
+        yield {"chunks": batch}
@@ -1,9 +1,12 @@
 from ..base_pipe import Pipeline
+from ..cache import DiskStepCache
 
 
-def get_txt_pipeline() -> Pipeline:
+def get_txt_pipeline(cache_dir: str | None = None) -> Pipeline:
     from ..loader.txt_loader import TxtLoader
 
     loader = TxtLoader()
     pipeline = Pipeline(load=loader)
+    if cache_dir:
+        pipeline.use_cache(DiskStepCache(cache_dir))
     return pipeline
@@ -0,0 +1,65 @@
+import os
+
+from langchain_community.vectorstores import OpenSearchVectorSearch
+from langchain_core.retrievers import BaseRetriever
+from langchain_openai import ChatOpenAI
+from utils.client.embedding import EmbeddingClient
+from utils.graphs.retrievers import FanOutRetriever
+from utils.metrics import tracked
+from utils.opensearch_client import OpenSearchClient
+
+
+def get_llm() -> ChatOpenAI:
+    return ChatOpenAI(
+        openai_api_base=os.getenv("VLLM_HOST", ""),
+        openai_api_key=os.getenv("VLLM_API_KEY", ""),
+        model_name=os.getenv("MODEL_NAME", ""),
+        stream_usage=True,
+    )
+
+
+def get_embedding_client() -> EmbeddingClient:
+    return EmbeddingClient(
+        embedding_api_path=os.getenv("EMBEDDING_HOST", ""),
+        request_timeout=600
+    )
+
+
+def get_vector_store(index: str | None = None) -> OpenSearchVectorSearch:
+    store = OpenSearchVectorSearch(
+        index_name=index or os.getenv("VECTORDB_INDEX", ""),
+        embedding_function=get_embedding_client(),
+        opensearch_url=os.getenv("VECTORDB_HOST", ""),
+    )
+    # 檢索走 langchain 自己的 OpenSearch client，計時它的查詢才涵蓋聊天頁面
+    store.client.search = tracked("opensearch")(store.client.search)
+    return store
+
+
+def get_fanout_retriever(
+    indices: str | None = None, tag: str | None = None
+) -> FanOutRetriever:
+    """
+    :param indices: Comma separated indices, defaults to \
+    ``VECTORDB_INDICES``.
+    :param tag: Retrieve from every index with this tag when no indices are \
+    given, defaults to ``VECTORDB_TAG``.
+    """
+    indices = indices or os.getenv("VECTORDB_INDICES", "")
+    tag = tag or os.getenv("VECTORDB_TAG", "")
+    opensearch = OpenSearchClient.from_url(os.getenv("VECTORDB_HOST", ""))
+    if indices:
+        return FanOutRetriever.from_indices(
+            opensearch, get_embedding_client(),
+            [index.strip() for index in indices.split(",") if index.strip()]
+        )
+    return FanOutRetriever.from_tag(opensearch, get_embedding_client(), tag)
+
+
+def get_retriever(index: str | None = None) -> BaseRetriever:
+    # 沒有指定 index 且設定了多個知識庫時，用 msearch 一次查詢全部
+    if index is None and (
+        os.getenv("VECTORDB_INDICES") or os.getenv("VECTORDB_TAG")
+    ):
+        return get_fanout_retriever()
+    return get_vector_store(index).as_retriever()
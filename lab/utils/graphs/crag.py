@@ -0,0 +1,276 @@
+from typing import TypedDict
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.retrievers import BaseRetriever
+from langgraph.graph import END, START, StateGraph
+from settings.configs.prompts import get_rag_prompt
+from utils.graphs.instrumentation import instrument_node, record_retrieval
+from utils.graphs.retrievers import order_documents
+from utils.metrics import RequestMetrics
+
+
+# ========================================
+#                   Data Model
+# ========================================
+class GradeDocuments(BaseModel):
+    """Binary score for relevance check on retrieved documents."""
+    binary_score: str = Field(
+        description="Documents are relevant to the question, 'yes' or 'no'"
+    )
+
+
+# ========================================
+#                   Graph state
+# ========================================
+class GraphState(TypedDict):
+    """
+    Represents the state of our graph.
+
+    Attributes:
+        question: question
+        generation: LLM generation
+        web_search: whether to add search
+        documents: list of documents
+        rewrite_question: rephrased question
+        rewrite_generation: LLM generation
+        rewrite_documents: list of documents
+    """
+
+    question: str
+    generation: str
+    transformed_question: str
+    documents: list[str]
+    rewrite_question: str
+    rewrite_generation: str
+    rewrite_documents: list[str]
+
+
+def build_graph(
+    llm: BaseChatModel,
+    retriever: BaseRetriever,
+    prompt_version: str | None = None,
+):
+    """
+    Compile the Corrective RAG graph: retrieve, grade the documents, and
+    either generate or rewrite the question and retrieve again.
+    """
+
+    # ========================================
+    #                   Chains
+    # ========================================
+    structured_llm_grader = llm.with_structured_output(GradeDocuments)
+    grade_prompt = ChatPromptTemplate.from_messages(
+        get_rag_prompt("grade", prompt_version)
+    )
+    retrieval_grader = grade_prompt | structured_llm_grader
+
+    prompt = ChatPromptTemplate.from_messages(
+        get_rag_prompt("generate", prompt_version)
+    )
+    rag_chain = prompt | llm | StrOutputParser()
+
+    re_write_prompt = ChatPromptTemplate.from_messages(
+        get_rag_prompt("rewrite", prompt_version)
+    )
+    question_rewriter = re_write_prompt | llm | StrOutputParser()
+
+    # ========================================
+    #                   Nodes
+    # ========================================
+    def retrieve(state):
+        """
+        Retrieve documents
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): New key added to state, documents, that contains retrieved documents
+        """
+        question = state["question"]
+
+        # Retrieval
+        documents = retriever.invoke(question)
+        return {"documents": documents, "question": question}
+
+    def extra_retrieve(state):
+        """
+        Retrieve documents
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): New key added to state, documents, that contains retrieved documents
+        """
+        question = state["rewrite_question"]
+
+        # Retrieval
+        documents = retriever.invoke(question)
+        return {"rewrite_documents": documents, "rewrite_question": question}
+
+    def generate(state):
+        """
+        Generate answer
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): New key added to state, generation, that contains LLM generation
+        """
+        question = state["question"]
+        documents = state["documents"]
+
+        # RAG generation
+        generation = rag_chain.invoke({
+            "context": order_documents(documents, prompt_version),
+            "question": question
+        })
+        return {
+            "documents": documents, "question": question,
+            "generation": generation
+        }
+
+    def extra_generate(state):
+        """
+        Generate answer
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): New key added to state, generation, that contains LLM generation
+        """
+        question = state["rewrite_question"]
+        documents = state["rewrite_documents"]
+
+        # RAG generation
+        generation = rag_chain.invoke({
+            "context": order_documents(documents, prompt_version),
+            "question": question
+        })
+        return {
+            "rewrite_documents": documents,
+            "rewrite_question": question,
+            "rewrite_generation": generation
+        }
+
+    def grade_documents(state):
+        """
+        Determines whether the retrieved documents are relevant to the question.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): Updates documents key with only filtered relevant documents
+        """
+
+        question = state["question"]
+        documents = state["documents"]
+
+        # Score each doc
+        filtered_docs = []
+        transformed_question = "Yes"
+        for d in documents:
+            score = retrieval_grader.invoke(
+                {"question": question, "document": d.page_content}
+            )
+            grade = score.binary_score
+            if grade == "yes":
+                transformed_question = "No"
+                filtered_docs.append(d)
+            else:
+                continue
+        return {
+            "documents": filtered_docs,
+            "question": question,
+            "transformed_question": transformed_question
+        }
+
+    def transform_query(state):
+        """
+        Transform the query to produce a better question.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): Updates question key with a re-phrased question
+        """
+
+        question = state["question"]
+        documents = state["documents"]
+
+        # Re-write question
+        better_question = question_rewriter.invoke({"question": question})
+        return {"documents": documents, "rewrite_question": better_question}
+
+    # ========================================
+    #                   Edges
+    # ========================================
+    def decide_to_generate(state):
+        """
+        Determines whether to generate an answer, or re-generate a question.
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            str: Binary decision for next node to call
+        """
+
+        transformed_question = state["transformed_question"]
+
+        if transformed_question == "Yes":
+            # All documents have been filtered check_relevance
+            # We will re-generate a new query
+
+            return "transform_query"
+        else:
+            # We have relevant documents, so generate answer
+            return "generate"
+
+    # ========================================
+    #                   Graph Init
+    # ========================================
+    workflow = StateGraph(GraphState)
+
+    def record_grader_calls(metrics: RequestMetrics, state, result):
+        metrics.record_grader_calls(len(state["documents"]))
+
+    # Define the nodes
+    for name, node, on_result in (
+        ("retrieve", retrieve, record_retrieval("documents")),
+        ("grade_documents", grade_documents, record_grader_calls),
+        ("generate", generate, None),
+        ("transform_query", transform_query, None),
+        (
+            "extra_retrieve", extra_retrieve,
+            record_retrieval("rewrite_documents")
+        ),
+        ("extra_generate", extra_generate, None),
+    ):
+        workflow.add_node(name, instrument_node(name, node, on_result))
+
+    # Build Graph
+    workflow.add_edge(START, "retrieve")
+    workflow.add_edge("retrieve", "grade_documents")
+    workflow.add_conditional_edges(
+        "grade_documents",
+        decide_to_generate,
+        {
+            "transform_query": "transform_query",
+            "generate": "generate",
+        },
+    )
+    workflow.add_edge("transform_query", "extra_retrieve")
+    workflow.add_edge("extra_retrieve", "extra_generate")
+    workflow.add_edge("extra_generate", END)
+
+    # Compile
+    return workflow.compile()
@@ -0,0 +1,102 @@
+import functools
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+from utils.metrics import RequestMetrics, bind_request
+
+
+def _token_usage(response: LLMResult) -> Tuple[int, int]:
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not (prompt_tokens or completion_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Record the token usage of every LLM call made within a request.
+    """
+
+    def __init__(self, metrics: RequestMetrics):
+        self.metrics = metrics
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.metrics.record_llm(*_token_usage(response))
+
+
+def get_request_metrics(config: RunnableConfig) -> RequestMetrics | None:
+    return (config.get("configurable") or {}).get("request_metrics")
+
+
+def request_config(metrics: RequestMetrics, **config) -> RunnableConfig:
+    """
+    Run config that collects metrics of a graph request into ``metrics``::
+
+        metrics = RequestMetrics("crag")
+        graph.invoke(inputs, request_config(metrics))
+        metrics.finish().log()
+    """
+    configurable = {
+        **config.pop("configurable", {}), "request_metrics": metrics
+    }
+    callbacks = list(config.pop("callbacks", None) or [])
+    callbacks.append(MetricsCallbackHandler(metrics))
+    return RunnableConfig(
+        configurable=configurable, callbacks=callbacks, **config
+    )
+
+
+def instrument_node(
+    name: str,
+    func: Callable[[Dict], Dict],
+    on_result: Callable[[RequestMetrics, Dict, Dict], None] | None = None,
+) -> Callable:
+    """
+    Wrap a graph node to record its wall time on the request metrics passed
+    with ``request_config``, and bind them so client calls made inside the
+    node are attributed to the request.
+
+    :param on_result: Called as ``on_result(metrics, state, result)`` to
+    record node specific measurements, e.g. the number of retrieved documents.
+    """
+
+    @functools.wraps(func)
+    def node(state: Dict, config: RunnableConfig) -> Any:
+        metrics = get_request_metrics(config)
+        if metrics is None:
+            return func(state)
+
+        start = time.perf_counter()
+        try:
+            with bind_request(metrics):
+                result = func(state)
+        finally:
+            metrics.record_stage(name, time.perf_counter() - start)
+        if on_result is not None:
+            on_result(metrics, state, result)
+        return result
+
+    # langgraph 依簽名決定是否傳入 config，不能沿用 func 的簽名 (__wrapped__)
+    del node.__wrapped__
+    return node
+
+
+def record_retrieval(key: str):
+    """
+    ``on_result`` hook recording the size of the documents list ``key``.
+    """
+    def hook(metrics: RequestMetrics, state: Dict, result: Dict) -> None:
+        metrics.record_retrieval(key, len(result.get(key) or []))
+    return hook
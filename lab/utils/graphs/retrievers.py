@@ -0,0 +1,162 @@
+import logging
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from settings.configs.prompts import RAG_PROMPT_VERSION, rag_context_order
+from utils.opensearch_client import OpenSearchClient
+
+
+def similarity(score: float, space_type: str) -> float:
+    """
+    Undo the k-NN plugin score transform so scores of different indices can
+    be compared: cosine similarity for ``cosinesimil``, the negative squared
+    distance for ``l2`` and the dot product for ``innerproduct``.
+    """
+    if space_type == "cosinesimil":
+        # score = 1 / (2 - cos)
+        return 2 - 1 / score
+    if space_type == "l2":
+        # score = 1 / (1 + d^2)
+        return 1 - 1 / score
+    if space_type == "innerproduct":
+        # score = 1 + dot (dot >= 0) 或 1 / (1 - dot) (dot < 0)
+        return score - 1 if score >= 1 else 1 - 1 / score
+    raise ValueError(f"Unsupported space type: {space_type}")
+
+
+def order_documents(
+    documents: List[Document], prompt_version: str | None = None
+) -> List[Document]:
+    """
+    Documents in the order they are put into the generation context. With
+    ``source`` ordering (see ``rag_context_order``) they are sorted by
+    source file, pages and text, so the same retrieved set always gives the
+    same context and its prefix stays cached.
+    """
+    if rag_context_order.get(
+        prompt_version or RAG_PROMPT_VERSION
+    ) != "source":
+        return documents
+    return sorted(documents, key=lambda document: (
+        str(document.metadata.get("index", "")),
+        str(document.metadata.get("source_file", "")),
+        document.metadata.get("pages") or [],
+        document.page_content,
+    ))
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Retrieve from several knowledge bases with one ``msearch`` request and
+    merge the hits into a single top-k.
+
+    Every index must be built with the same embedding model and space type,
+    as recorded in its mapping, otherwise their scores are not comparable.
+    An index whose search fails is logged and left out of the results.
+    """
+    opensearch: OpenSearchClient
+    embedding: Embeddings
+    indices: List[str]
+    space_types: Dict[str, str]
+    db_names: Dict[str, str]
+    k: int = 4
+
+    @classmethod
+    def from_indices(
+        cls,
+        opensearch: OpenSearchClient,
+        embedding: Embeddings,
+        indices: List[str],
+        k: int = 4,
+    ) -> "FanOutRetriever":
+        if not indices:
+            raise ValueError("No index to retrieve from.")
+        models, space_types, db_names = {}, {}, {}
+        for index in indices:
+            # 逐一查詢，index 也可以是 rebuild_index 建立的 alias
+            mapping = opensearch.get_mapping_info(index).get("mappings")
+            if mapping is None:
+                raise ValueError(f"Index '{index}' does not exist.")
+            meta = mapping.get("_meta", {})
+            models[index] = meta.get("embedding_model")
+            db_names[index] = meta.get("db_name", index)
+            space_types[index] = mapping["properties"]["vector_field"].get(
+                "method", {}
+            ).get("space_type", "l2")
+        if len(set(models.values())) > 1:
+            raise ValueError(
+                f"Indices use different embedding models: {models}"
+            )
+        if len(set(space_types.values())) > 1:
+            raise ValueError(
+                f"Indices use different space types: {space_types}"
+            )
+        return cls(
+            opensearch=opensearch,
+            embedding=embedding,
+            indices=list(indices),
+            space_types=space_types,
+            db_names=db_names,
+            k=k,
+        )
+
+    @classmethod
+    def from_tag(
+        cls,
+        opensearch: OpenSearchClient,
+        embedding: Embeddings,
+        tag: str,
+        k: int = 4,
+    ) -> "FanOutRetriever":
+        """
+        Retrieve from every knowledge base with ``tag``.
+        """
+        indices = sorted(opensearch.get_index_with_tag(tag).values())
+        if not indices:
+            raise ValueError(f"No index with tag '{tag}'.")
+        return cls.from_indices(opensearch, embedding, indices, k)
+
+    def _query(self, vector: List[float]) -> Dict[str, Any]:
+        # 每個 index 各取 k 筆，合併後的 top-k 必定在其中
+        return {
+            "size": self.k,
+            "_source": ["text", "metadata"],
+            "query": {
+                "knn": {"vector_field": {"vector": vector, "k": self.k}}
+            },
+        }
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        body = self._query(self.embedding.embed_query(query))
+        responses = self.opensearch.msearch(
+            [(index, body) for index in self.indices]
+        )
+        scored, failed = [], []
+        for index, response in zip(self.indices, responses):
+            if "error" in response:
+                logging.error(
+                    "Search of %s failed: %s", index, response["error"]
+                )
+                failed.append(index)
+                continue
+            for hit in response["hits"]["hits"]:
+                source = hit["_source"]
+                score = similarity(hit["_score"], self.space_types[index])
+                scored.append((score, Document(
+                    page_content=source.get("text", ""),
+                    metadata={
+                        **source.get("metadata", {}),
+                        "index": index,
+                        "db_name": self.db_names[index],
+                        "score": score,
+                    },
+                )))
+        if len(failed) == len(self.indices):
+            raise ValueError(f"Search of {failed} failed.")
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [document for _, document in scored[:self.k]]
@@ -0,0 +1,58 @@
+from typing import List, TypedDict
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langgraph.graph import START, StateGraph
+from settings.configs.prompts import get_rag_prompt
+from utils.graphs.instrumentation import instrument_node, record_retrieval
+from utils.graphs.retrievers import order_documents
+
+
+# Define state for application
+class State(TypedDict):
+    question: str
+    context: List[Document]
+    answer: str
+
+
+def build_graph(
+    llm: BaseChatModel,
+    retriever: BaseRetriever,
+    prompt_version: str | None = None,
+):
+    """
+    Compile the retrieve -> generate graph used by the simple RAG page.
+    """
+    prompt_template = ChatPromptTemplate.from_messages(
+        get_rag_prompt("generate", prompt_version)
+    )
+
+    # Define application steps
+    def retrieve(state: State):
+        retrieved_docs = retriever.invoke(state["question"])
+        return {"context": retrieved_docs}
+
+    def generate(state: State):
+        docs_content = "\n\n".join(
+            doc.page_content
+            for doc in order_documents(state["context"], prompt_version)
+        )
+        messages = prompt_template.invoke(
+            {"question": state["question"], "context": docs_content}
+        )
+        response = llm.invoke(messages)
+        return {"answer": response.content}
+
+    graph_builder = StateGraph(State).add_sequence([
+        (
+            "retrieve",
+            instrument_node(
+                "retrieve", retrieve, record_retrieval("context")
+            )
+        ),
+        ("generate", instrument_node("generate", generate)),
+    ])
+    graph_builder.add_edge(START, "retrieve")
+    return graph_builder.compile()
@@ -0,0 +1,314 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Tuple
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+SIZE_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+metrics_logger = logging.getLogger("metrics")
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, description: str, buckets=DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(
+                key, [0] * (len(self.buckets) + 1)
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += counts[-1]
+                labels = _format_labels(key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(
+                    f"{self.name}_sum{_format_labels(key)} {self._sums[key]}"
+                )
+                lines.append(
+                    f"{self.name}_count{_format_labels(key)} {cumulative}"
+                )
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, description))
+
+    def histogram(
+        self, name: str, description: str, buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(
+                name, Histogram(name, description, buckets)
+            )
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+client_seconds = registry.histogram(
+    "lab_client_request_seconds",
+    "Latency of calls to external services.",
+)
+node_seconds = registry.histogram(
+    "lab_graph_node_seconds", "Wall time of LangGraph nodes."
+)
+request_seconds = registry.histogram(
+    "lab_graph_request_seconds", "Wall time of whole graph requests."
+)
+llm_tokens = registry.counter(
+    "lab_llm_tokens_total", "LLM tokens used by graph requests."
+)
+llm_calls = registry.counter(
+    "lab_llm_calls_total", "LLM calls made by graph requests."
+)
+grader_calls = registry.counter(
+    "lab_grader_calls_total", "Document grader calls made by CRAG requests."
+)
+retrieval_size = registry.histogram(
+    "lab_retrieval_documents", "Documents returned per retrieval.",
+    SIZE_BUCKETS,
+)
+
+
+class RequestMetrics:
+    """
+    Measurements of a single graph request: node timings, external calls,
+    LLM token usage and retrieval sizes.
+    """
+
+    def __init__(self, graph: str, request_id: str | None = None):
+        self.graph = graph
+        self.request_id = request_id or uuid.uuid4().hex
+        self.stage_latencies: Dict[str, float] = defaultdict(float)
+        self.client_latencies: Dict[str, float] = defaultdict(float)
+        self.client_calls: Dict[str, int] = defaultdict(int)
+        self.retrieval_sizes: Dict[str, List[int]] = defaultdict(list)
+        self.llm_calls = 0
+        self.grader_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.total_seconds: float | None = None
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_latencies[stage] += seconds
+        node_seconds.observe(seconds, graph=self.graph, node=stage)
+
+    def record_client(self, client: str, seconds: float) -> None:
+        with self._lock:
+            self.client_latencies[client] += seconds
+            self.client_calls[client] += 1
+
+    def record_retrieval(self, stage: str, size: int) -> None:
+        with self._lock:
+            self.retrieval_sizes[stage].append(size)
+        retrieval_size.observe(size, graph=self.graph, node=stage)
+
+    def record_llm(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        llm_calls.inc(graph=self.graph)
+        llm_tokens.inc(prompt_tokens, graph=self.graph, type="prompt")
+        llm_tokens.inc(completion_tokens, graph=self.graph, type="completion")
+
+    def record_grader_calls(self, calls: int) -> None:
+        with self._lock:
+            self.grader_calls += calls
+        grader_calls.inc(calls, graph=self.graph)
+
+    def finish(self) -> "RequestMetrics":
+        self.total_seconds = time.perf_counter() - self._start
+        request_seconds.observe(self.total_seconds, graph=self.graph)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "request_id": self.request_id,
+                "graph": self.graph,
+                "total_seconds": self.total_seconds,
+                "stage_latencies": dict(self.stage_latencies),
+                "client_latencies": dict(self.client_latencies),
+                "client_calls": dict(self.client_calls),
+                "retrieval_sizes": dict(self.retrieval_sizes),
+                "llm_calls": self.llm_calls,
+                "grader_calls": self.grader_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+    def log(self) -> None:
+        """
+        Write the request metrics as one JSON line to the ``metrics`` logger.
+        """
+        if metrics_logger.isEnabledFor(logging.INFO):
+            metrics_logger.info(
+                json.dumps(self.to_dict(), ensure_ascii=False)
+            )
+
+
+current_request: contextvars.ContextVar[RequestMetrics | None] = (
+    contextvars.ContextVar("current_request", default=None)
+)
+
+
+@contextlib.contextmanager
+def bind_request(metrics: RequestMetrics | None) -> Iterator[None]:
+    token = current_request.set(metrics)
+    try:
+        yield
+    finally:
+        current_request.reset(token)
+
+
+@contextlib.contextmanager
+def track_client(client: str) -> Iterator[None]:
+    """
+    Time a call to an external service, recorded process wide and on the
+    request bound with ``bind_request``, if any.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        client_seconds.observe(seconds, client=client)
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.record_client(client, seconds)
+
+
+def tracked(client: str):
+    """
+    Decorator version of ``track_client``.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_client(client):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> None:
+    """
+    Serve ``/metrics`` for Prometheus scraping, only the first call in a
+    process starts the server.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        logging.info("Serving metrics on %s:%d/metrics", host, port)
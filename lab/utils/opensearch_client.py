@@ -1,7 +1,18 @@
-from typing import Any, Dict, List, Literal
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Literal, Tuple
+from urllib.parse import urlparse
 
+import numpy as np
 from opensearchpy import OpenSearch
-from opensearchpy.helpers import bulk
+from opensearchpy.helpers import bulk, scan
+from utils.metrics import tracked
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MANIFEST = "manifest.json"
+SNAPSHOT_RECORDS = "records.jsonl"
+SNAPSHOT_VECTORS = "vectors.f32"
 
 
 def get_mapping(
@@ -66,6 +77,17 @@ class OpenSearchClient:
             "match_all",
         }
 
+    @classmethod
+    def from_url(cls, url: str) -> "OpenSearchClient":
+        """
+        :param url: OpenSearch URL such as ``VECTORDB_HOST``, e.g.
+        ``http://opensearch-node1:9200``.
+        """
+        parsed_url = urlparse(url)
+        if not parsed_url.hostname:
+            raise ValueError(f"Invalid OpenSearch URL: '{url}'")
+        return cls(parsed_url.hostname, parsed_url.port or 9200)
+
     def create_index(
         self,
         index_name: str,
@@ -85,6 +107,7 @@ class OpenSearchClient:
         )
         self.client.indices.create(index=index_name, body=mapping)
 
+    @tracked("opensearch")
     def query_index(
         self,
         index: str,
@@ -151,8 +174,9 @@ class OpenSearchClient:
     
     def get_db_name(self, index_name: str) -> str | None:
         if self.is_index_exists(index_name):
-            mappings = self.client.indices.get_mapping()
-            mapping = mappings[index_name]
+            # 以 alias 查詢時，回傳的 key 是 alias 指向的 index
+            mappings = self.client.indices.get_mapping(index=index_name)
+            mapping = next(iter(mappings.values()))
             if (
                 "_meta" in mapping["mappings"]
                 and "db_name" in mapping["mappings"]["_meta"]
@@ -164,21 +188,29 @@ class OpenSearchClient:
         
     def get_mapping_info(self, index_name: str) -> Dict[str, Any]:
         if self.is_index_exists(index_name):
-            mappings = self.client.indices.get_mapping()
-            return mappings[index_name]
+            mappings = self.client.indices.get_mapping(index=index_name)
+            return next(iter(mappings.values()))
         else:
             return {}
         
     def get_index_count(self, index_name: str):
         return self.client.count(index=index_name)["count"]
 
-    def add_documents(self, index_name: str, documents: List[Dict[str, Any]]):
+    @tracked("opensearch")
+    def add_documents(
+        self,
+        index_name: str,
+        documents: List[Dict[str, Any]],
+        refresh: bool = True,
+    ):
         """
         add documents to the specified index.
 
         :param index_name: Name of the OpenSearch index.
         :param documents: List of documents to add, each represented as a \
         dictionary.
+        :param refresh: Refresh the index after the bulk request, bulk loads \
+        should pass False and call ``refresh`` once at the end.
         """
 
         actions = [
@@ -198,11 +230,32 @@ class OpenSearchClient:
             raise ValueError(f"Failed to add documents: {failed}")
 
         # Refresh the index to make documents searchable immediately
+        if refresh:
+            self.refresh(index_name)
+
+    def refresh(self, index_name: str):
         self.client.indices.refresh(index=index_name)
 
+    @tracked("opensearch")
     def search(self, index_name: str, query: dict):
         return self.client.search(index=index_name, body=query)
 
+    @tracked("opensearch")
+    def msearch(
+        self, searches: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run several searches in one round trip.
+
+        :param searches: ``(index_name, query)`` pairs.
+        :return: One response per search in the same order, a failed search \
+        has an ``error`` instead of ``hits``.
+        """
+        body = []
+        for index_name, query in searches:
+            body.extend([{"index": index_name}, query])
+        return self.client.msearch(body=body)["responses"]
+
     def delete_index(self, index_name: str):
         self.client.indices.delete(index=index_name)
 
@@ -217,3 +270,344 @@ class OpenSearchClient:
             ):
                 index[mapping["mappings"]["_meta"]["db_name"]] = index_name
         return index
+
+    def scan(
+        self,
+        index_name: str,
+        batch_size: int = 1000,
+        source: List[str] | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every document of the index with the scroll API, unlike
+        ``query_index`` it is not limited by ``max_result_window``.
+
+        :param source: Fields of ``_source`` to return, all when None.
+        """
+        query: Dict[str, Any] = {"query": {"match_all": {}}}
+        if source is not None:
+            query["_source"] = source
+        return scan(
+            self.client,
+            index=index_name,
+            query=query,
+            size=batch_size,
+            preserve_order=False,
+        )
+
+    def _knn_settings(self, index_name: str) -> Dict[str, Any]:
+        settings = next(iter(self.client.indices.get_settings(
+            index=index_name, flat_settings=True
+        ).values()))["settings"]
+        index_settings: Dict[str, Any] = {}
+        if "index.knn" in settings:
+            index_settings["knn"] = settings["index.knn"] == "true"
+        if "index.knn.algo_param.ef_search" in settings:
+            index_settings["knn.algo_param.ef_search"] = int(
+                settings["index.knn.algo_param.ef_search"]
+            )
+        return {"index": index_settings}
+
+    def get_knn_params(self, index_name: str) -> Dict[str, Any]:
+        """
+        HNSW parameters of the ``vector_field`` of an index, missing values
+        fall back to the OpenSearch defaults.
+
+        :return: ``dim``, ``space_type``, ``engine``, ``m``, \
+        ``ef_construction`` and ``ef_search``.
+        """
+        mappings = self.get_mapping_info(index_name).get("mappings")
+        if not mappings:
+            raise ValueError(f"Index '{index_name}' does not exist.")
+        field = mappings["properties"]["vector_field"]
+        method = field.get("method", {})
+        parameters = method.get("parameters", {})
+        settings = self._knn_settings(index_name)["index"]
+        return {
+            "dim": field["dimension"],
+            "space_type": method.get("space_type", "l2"),
+            "engine": method.get("engine", "nmslib"),
+            "m": parameters.get("m", 16),
+            "ef_construction": parameters.get("ef_construction", 100),
+            "ef_search": settings.get("knn.algo_param.ef_search", 100),
+        }
+
+    def set_ef_search(self, index_name: str, ef_search: int):
+        """
+        ``ef_search`` is a dynamic index setting, used by the nmslib and
+        faiss engines, and takes effect without rebuilding the graphs.
+        """
+        self.client.indices.put_settings(
+            index=index_name,
+            body={"index": {"knn.algo_param.ef_search": ef_search}},
+        )
+
+    def update_meta(self, index_name: str, **values) -> Dict[str, Any]:
+        """
+        Merge ``values`` into the ``_meta`` of an index.
+
+        :return: The new ``_meta``.
+        """
+        mappings = self.get_mapping_info(index_name).get("mappings")
+        if mappings is None:
+            raise ValueError(f"Index '{index_name}' does not exist.")
+        # put_mapping 會整個取代 _meta，先讀出既有欄位再合併
+        meta = {**mappings.get("_meta", {}), **values}
+        self.client.indices.put_mapping(
+            index=index_name, body={"_meta": meta}
+        )
+        return meta
+
+    def copy_index(
+        self,
+        index_name: str,
+        new_index_name: str,
+        m: int | None = None,
+        ef_construction: int | None = None,
+        keep_meta: bool = True,
+        timeout: int = 3600,
+    ):
+        """
+        Copy an index with the reindex API, building its HNSW graphs with
+        other ``m``/``ef_construction``. Vectors are copied from ``_source``
+        so no embedding call is made, document ids are kept.
+
+        :param keep_meta: Copy ``_meta`` too, a temporary copy should pass \
+        False so it is not listed as a second knowledge base.
+        :param timeout: Seconds to wait for the reindex.
+        """
+        mappings = self.get_mapping_info(index_name).get("mappings")
+        if not mappings:
+            raise ValueError(f"Index '{index_name}' does not exist.")
+        if self.is_index_exists(new_index_name):
+            raise ValueError(f"Index '{new_index_name}' already exists.")
+        mappings = json.loads(json.dumps(mappings))
+        if not keep_meta:
+            mappings.pop("_meta", None)
+        parameters = mappings["properties"]["vector_field"].setdefault(
+            "method", {"name": "hnsw"}
+        ).setdefault("parameters", {})
+        if m is not None:
+            parameters["m"] = m
+        if ef_construction is not None:
+            parameters["ef_construction"] = ef_construction
+
+        settings = self._knn_settings(index_name)
+        settings["index"]["refresh_interval"] = "-1"
+        self.client.indices.create(
+            index=new_index_name,
+            body={"settings": settings, "mappings": mappings},
+        )
+        response = self.client.reindex(
+            body={
+                "source": {"index": index_name},
+                "dest": {"index": new_index_name},
+            },
+            wait_for_completion=True,
+            request_timeout=timeout,
+        )
+        if response.get("failures"):
+            raise ValueError(
+                f"Failed to copy documents: {response['failures']}"
+            )
+        self.client.indices.put_settings(
+            index=new_index_name, body={"index": {"refresh_interval": None}}
+        )
+        self.refresh(new_index_name)
+
+    def resolve_index(self, index_name: str) -> str:
+        """
+        Name of the index behind ``index_name`` when it is an alias, e.g.
+        after ``rebuild_index``, otherwise ``index_name`` itself.
+        """
+        if self.client.indices.exists_alias(name=index_name):
+            return next(iter(self.client.indices.get_alias(name=index_name)))
+        return index_name
+
+    def rebuild_index(
+        self,
+        index_name: str,
+        m: int | None = None,
+        ef_construction: int | None = None,
+        timeout: int = 3600,
+    ) -> str:
+        """
+        Rebuild an index with other ``m``/``ef_construction``, which cannot
+        be changed on an existing index, without taking it offline.
+
+        The documents are copied to ``{index_name}-m{m}-efc{ef_construction}``
+        while the original keeps serving, then a single alias update deletes
+        the original and points an alias named ``index_name`` at the copy,
+        so searches by the old name never fail. A failed copy leaves the
+        original untouched.
+
+        :return: Name of the new index behind the alias.
+        """
+        current = self.resolve_index(index_name)
+        params = self.get_knn_params(current)
+        m = params["m"] if m is None else m
+        if ef_construction is None:
+            ef_construction = params["ef_construction"]
+        rebuilt = f"{index_name}-m{m}-efc{ef_construction}"
+        meta = self.get_mapping_info(current)["mappings"].get("_meta", {})
+        # 複製期間不帶 _meta，避免同一個知識庫被列出兩次
+        self.copy_index(
+            current, rebuilt, m, ef_construction,
+            keep_meta=False, timeout=timeout
+        )
+        if self.get_index_count(rebuilt) != self.get_index_count(current):
+            self.delete_index(rebuilt)
+            raise ValueError(f"Failed to copy '{current}' to '{rebuilt}'")
+        if meta:
+            self.update_meta(rebuilt, **meta)
+        self.client.indices.update_aliases(body={"actions": [
+            {"remove_index": {"index": current}},
+            {"add": {"index": rebuilt, "alias": index_name}},
+        ]})
+        return rebuilt
+
+    def snapshot(
+        self, index_name: str, directory: str, batch_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Dump an index to ``directory`` so it can be restored without calling
+        the embedding server.
+
+        Vectors go to ``vectors.f32``, a row-major float32 matrix that can be
+        opened with ``np.memmap``, texts and metadata to ``records.jsonl`` in
+        the same order, and the mapping, ``_meta``, dim and count to
+        ``manifest.json``.
+
+        :param index_name: Name of the OpenSearch index.
+        :param directory: Output directory, created if missing.
+        :param batch_size: Documents per scroll request.
+        :return: The manifest.
+        """
+        mappings = self.get_mapping_info(index_name).get("mappings")
+        if not mappings:
+            raise ValueError(f"Index '{index_name}' does not exist.")
+        dim = mappings["properties"]["vector_field"]["dimension"]
+        os.makedirs(directory, exist_ok=True)
+
+        count = skipped = 0
+        with open(
+            os.path.join(directory, SNAPSHOT_VECTORS), "wb"
+        ) as vectors, open(
+            os.path.join(directory, SNAPSHOT_RECORDS), "w", encoding="utf-8"
+        ) as records:
+            for hit in self.scan(index_name, batch_size):
+                source = hit["_source"]
+                vector = source.get("vector_field")
+                if vector is None or len(vector) != dim:
+                    skipped += 1
+                    continue
+                vectors.write(np.asarray(vector, dtype="<f4").tobytes())
+                records.write(json.dumps({
+                    "_id": hit["_id"],
+                    "text": source.get("text", ""),
+                    "metadata": source.get("metadata", {}),
+                }, ensure_ascii=False) + "\n")
+                count += 1
+        if skipped:
+            logging.warning(
+                "Skipped %d documents of %s without a valid vector",
+                skipped, index_name
+            )
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "index": index_name,
+            "count": count,
+            "dim": dim,
+            "dtype": "float32",
+            "vectors": SNAPSHOT_VECTORS,
+            "records": SNAPSHOT_RECORDS,
+            "_meta": mappings.get("_meta", {}),
+            "mappings": mappings,
+            "settings": self._knn_settings(index_name),
+        }
+        with open(
+            os.path.join(directory, SNAPSHOT_MANIFEST), "w", encoding="utf-8"
+        ) as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    def restore(
+        self,
+        directory: str,
+        index_name: str | None = None,
+        db_name: str | None = None,
+        batch_size: int = 500,
+    ) -> Dict[str, Any]:
+        """
+        Create an index from a ``snapshot`` directory and bulk load its
+        documents, keeping their ids, without any embedding call.
+
+        :param directory: Directory written by ``snapshot``.
+        :param index_name: New index name, defaults to the snapshot index.
+        :param db_name: New ``db_name`` in ``_meta``, needed when restoring \
+        next to the original index on the same cluster.
+        :param batch_size: Documents per bulk request.
+        :return: The manifest.
+        """
+        with open(
+            os.path.join(directory, SNAPSHOT_MANIFEST), encoding="utf-8"
+        ) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version: {manifest.get('version')}"
+            )
+        index_name = index_name or manifest["index"]
+        mappings = manifest["mappings"]
+        meta = mappings.setdefault("_meta", {})
+        if db_name:
+            meta["db_name"] = db_name
+        if self.is_index_exists(index_name):
+            raise ValueError(f"Index '{index_name}' already exists.")
+        if meta.get("db_name") and self.is_db_name_exists(
+            meta["db_name"], meta.get("tags")
+        ):
+            raise ValueError(f"Database '{meta['db_name']}' already exists.")
+
+        count, dim = manifest["count"], manifest["dim"]
+        vectors = np.memmap(
+            os.path.join(directory, manifest["vectors"]),
+            dtype="<f4", mode="r", shape=(count, dim),
+        ) if count else np.zeros((0, dim), dtype="<f4")
+
+        settings = manifest.get("settings", {"index": {"knn": True}})
+        # 載入期間關閉 refresh，完成後再恢復並 refresh 一次
+        settings["index"]["refresh_interval"] = "-1"
+        self.client.indices.create(
+            index=index_name, body={"settings": settings, "mappings": mappings}
+        )
+
+        def actions():
+            with open(
+                os.path.join(directory, manifest["records"]), encoding="utf-8"
+            ) as records:
+                for row, line in enumerate(records):
+                    record = json.loads(line)
+                    yield {
+                        "_index": index_name,
+                        "_id": record["_id"],
+                        "_source": {
+                            "vector_field": vectors[row].tolist(),
+                            "text": record["text"],
+                            "metadata": record["metadata"],
+                        },
+                    }
+
+        success, failed = bulk(self.client, actions(), chunk_size=batch_size)
+        if failed:
+            raise ValueError(f"Failed to restore documents: {failed}")
+        self.client.indices.put_settings(
+            index=index_name, body={"index": {"refresh_interval": None}}
+        )
+        self.refresh(index_name)
+        if success != count:
+            logging.warning(
+                "Restored %d of %d documents into %s", success, count,
+                index_name
+            )
+        return manifest